@@ -12,12 +12,11 @@ os.environ["no_proxy"] = "localhost, 127.0.0.1, ::1"
 import gradio as gr
 import numpy as np
 import torch
-from fairseq import checkpoint_utils
 
-from lib.model.models import SynthesizerTrnMs768NSFsid
-from lib.model.vc_infer_pipeline import VC
+from lib.model.infer_service import InferenceService
+from lib.model.voice_pool import VoicePool
+from lib.utils.bundle import BUNDLE_EXT, VoiceBundle
 from lib.utils.config import Config
-from lib.utils.misc_utils import load_audio, HUBERT_FPATH
 from lib.utils.process_ckpt import merge
 
 logging.getLogger("numba").setLevel(logging.WARNING)
@@ -34,40 +33,29 @@ warnings.filterwarnings("ignore")
 torch.manual_seed(114514)
 
 config = Config()
-
-
-hubert_model = None
-
-def load_hubert():
-  global hubert_model
-  models, _, _ = checkpoint_utils.load_model_ensemble_and_task(
-    # ["hubert_base.pt"],
-    [HUBERT_FPATH],
-    suffix="",
-  )
-  hubert_model = models[0]
-  hubert_model = hubert_model.to(config.device)
-  if config.is_half:
-    hubert_model = hubert_model.half()
-  else:
-    hubert_model = hubert_model.float()
-  hubert_model.eval()
+voice_pool = VoicePool(config, max_bytes=int(config.voice_pool_gb * 1024 ** 3))
+infer_service = InferenceService(voice_pool, trace_dir=config.trace_dir or None)
 
 
 weight_root = "weights"
 index_root = "logs"
 names = []
+index_paths = []
 for name in os.listdir(weight_root):
-  if name.endswith(".pth"):
+  if name.endswith(".pth") or name.endswith(BUNDLE_EXT):
     names.append(name)
-index_paths = []
+  if name.endswith(BUNDLE_EXT) and VoiceBundle("%s/%s" % (weight_root, name)).has_index:
+    index_paths.append("%s/%s" % (weight_root, name))
 for root, dirs, files in os.walk(index_root, topdown=False):
   for name in files:
     if name.endswith(".index") and "trained" not in name:
       index_paths.append("%s/%s" % (root, name))
+if config.preload is not None:  # models (and the voice) load while the UI starts
+  voice_pool.preload(os.path.join(weight_root, config.preload) if config.preload else None)
 
 
 def vc_single(
+        voice_name,
         sid,
         input_audio_path,
         f0_up_key,
@@ -80,45 +68,29 @@ def vc_single(
         resample_sr,
         rms_mix_rate,
         protect,
-):  # spk_item, input_audio0, vc_transform0,f0_file,f0method0
-  global tgt_sr, net_g, vc, hubert_model, version
+):  # sid0, spk_item, input_audio0, vc_transform0,f0_file,f0method0
   if input_audio_path is None:
     return "You need to upload an audio", None
+  if not voice_name:
+    return "You need to select a voice", None
   print(f"Inferring with sid: {sid} and from file index {file_index} with rate {index_rate}")
-  f0_up_key = int(f0_up_key)
   try:
-    audio = load_audio(input_audio_path, 16000)
-    audio_max = np.abs(audio).max() / 0.95
-    if audio_max > 1:
-      audio /= audio_max
-    times = [0, 0, 0]
-    if not hubert_model:
-      load_hubert()
-    if_f0 = cpt.get("f0", 1)
-    audio_opt = vc.pipeline(
-      hubert_model,
-      net_g,
-      sid,
-      audio,
+    # every request names its own voice, so concurrent requests don't depend on shared globals
+    tgt_sr, audio_opt, times = infer_service.convert(
+      "%s/%s" % (weight_root, voice_name),
       input_audio_path,
-      times,
-      f0_up_key,
-      f0_method,
-      file_index,
-      # file_big_npy,
-      index_rate,
-      if_f0,
-      filter_radius,
-      tgt_sr,
-      resample_sr,
-      rms_mix_rate,
-      version,
-      protect,
+      sid=sid,
+      f0_up_key=int(f0_up_key),
+      f0_method=f0_method,
+      file_index=file_index or "",
+      index_rate=index_rate,
+      filter_radius=filter_radius,
+      resample_sr=resample_sr,
+      rms_mix_rate=rms_mix_rate,
+      protect=protect,
       f0_file=f0_file,
     )
-    if tgt_sr != resample_sr >= 16000:
-      tgt_sr = resample_sr
-    index_info = "Using index:%s." % file_index if os.path.exists(file_index) else "Index not used."
+    index_info = "Using index:%s." % file_index if file_index and os.path.exists(file_index) else "Index not used."
     return "Success.\n %s\nTime:\n npy:%ss, f0:%ss, infer:%ss" % (index_info, times[0], times[1], times[2],), (tgt_sr, audio_opt)
   except:
     info = info = traceback.format_exc()
@@ -129,38 +101,17 @@ def vc_single(
 
 # 一个选项卡全局只能有一个音色
 def get_vc(sid, to_return_protect0, to_return_protect1):
-  global n_spk, tgt_sr, net_g, vc, cpt, version
   if sid == "" or sid == []:
-    global hubert_model
-    if hubert_model is not None:  # 考虑到轮询, 需要加个判断看是否 sid 是由有模型切换到无模型的
-      print("clean_empty_cache")
-      del net_g, n_spk, vc, hubert_model, tgt_sr  # ,cpt
-      hubert_model = net_g = n_spk = vc = hubert_model = tgt_sr = None
-
-      if torch.cuda.is_available():
-        torch.cuda.empty_cache()
-
-      ###楼下不这么折腾清理不干净
-      if_f0 = cpt.get("f0", 1)
-      version = cpt.get("version", "v2")
-      if if_f0 == 1:
-        net_g = SynthesizerTrnMs768NSFsid(*cpt["config"], is_half=config.is_half)
-      else:
-        breakpoint()
-        # net_g = SynthesizerTrnMs768NSFsid_nono(*cpt["config"])
-      del net_g, cpt
-
-      if torch.cuda.is_available():
-        torch.cuda.empty_cache()
-
-      cpt = None
+    print("clean_empty_cache")
+    voice_pool.release_models()
+    if torch.cuda.is_available():
+      torch.cuda.empty_cache()
     return {"visible": False, "__type__": "update"}
 
   person = "%s/%s" % (weight_root, sid)
   print("loading %s" % person)
-  cpt = torch.load(person, map_location="cpu")
-  tgt_sr = cpt["config"][-2]
-  cpt["config"][-4] = cpt["weight"]["emb_g.weight"].shape[0]  # n_spk
+  voice = voice_pool.get(person)  # loads only if not already resident
+  cpt, n_spk = voice.cpt, voice.n_spk
   if_f0 = cpt.get("f0", 1)
   if if_f0 == 0:
     to_return_protect0 = to_return_protect1 = {
@@ -179,26 +130,6 @@ def get_vc(sid, to_return_protect0, to_return_protect1):
       "value": to_return_protect1,
       "__type__": "update",
     }
-  version = cpt.get("version", "v2")
-  if if_f0 == 1:
-    net_g = SynthesizerTrnMs768NSFsid(*cpt["config"], is_half=config.is_half)
-  else:
-    breakpoint()
-    # net_g = SynthesizerTrnMs768NSFsid_nono(*cpt["config"])
-
-  del net_g.enc_q
-
-  print(net_g.load_state_dict(cpt["weight"], strict=False))
-  net_g.eval().to(config.device)
-  if config.is_half:
-    print("Net G init as FP16")
-    net_g = net_g.half()
-  else:
-    print("Net G init as FP32")
-    net_g = net_g.float()
-
-  vc = VC(tgt_sr, config)
-  n_spk = cpt["config"][-4]
   return (
     {"visible": True, "maximum": n_spk, "__type__": "update"},
     to_return_protect0,
@@ -208,10 +139,12 @@ def get_vc(sid, to_return_protect0, to_return_protect1):
 
 def change_choices():
   names = []
+  index_paths = []
   for name in os.listdir(weight_root):
-    if name.endswith(".pth"):
+    if name.endswith(".pth") or name.endswith(BUNDLE_EXT):
       names.append(name)
-  index_paths = []
+    if name.endswith(BUNDLE_EXT) and VoiceBundle("%s/%s" % (weight_root, name)).has_index:
+      index_paths.append("%s/%s" % (weight_root, name))
   for root, dirs, files in os.walk(index_root, topdown=False):
     for name in files:
       if name.endswith(".index") and "trained" not in name:
@@ -257,7 +190,7 @@ with gr.Blocks() as app:
             )
             f0method0 = gr.Radio(
               label="Pitch Extraction Algorithm",
-              choices=["pm", "harvest", "crepe", "mangio", "rmvpe"],
+              choices=["pm", "harvest", "crepe", "mangio", "rmvpe", "fcpe"],
               value="rmvpe",
               interactive=True,
             )
@@ -316,6 +249,7 @@ with gr.Blocks() as app:
           but0.click(
             vc_single,
             [
+              sid0,
               spk_item,
               input_audio0,
               vc_transform0,
@@ -4,9 +4,9 @@ import torch.nn.functional as F
 from torch.nn.utils import weight_norm
 import os
 import yaml
-from torchaudio.transforms import Resample
 import numpy as np
 
+from utils.resample import resample_torch
 from .pcmer import PCmer
 from .nvSTFT import STFT
 
@@ -86,17 +86,19 @@ class FCPE(nn.Module):
         self.dense_out = weight_norm(
             nn.Linear(n_chans, self.n_out))
 
-    def forward(self, mel, infer=True, gt_f0=None, return_hz_f0=False, cdecoder = "local_argmax"):
+    def forward(self, mel, infer=True, gt_f0=None, return_hz_f0=False, cdecoder = "local_argmax", threshold=None):
         """
         input:
             B x n_frames x n_unit
         return:
             dict of B x n_frames x feat
+        `threshold` (`self.threshold` if None) is the confidence below which frames are unvoiced; an argument rather
+        than an attribute, so concurrent callers sharing the model can use different ones
         """
         if cdecoder == "argmax":
-            self.cdecoder = self.cents_decoder
+            decoder = self.cents_decoder
         elif cdecoder == "local_argmax":
-            self.cdecoder = self.cents_local_decoder
+            decoder = self.cents_local_decoder
         if self.use_input_conv:
             x = self.stack(mel.transpose(1, 2)).transpose(1, 2)
         else:
@@ -114,27 +116,29 @@ class FCPE(nn.Module):
                 loss_all = loss_all + l2_regularization(model=self, l2_alpha=self.loss_l2_regularization_scale)
             x = loss_all
         if infer:
-            x = self.cdecoder(x)
+            x = decoder(x, threshold=threshold)
             x = self.cent_to_f0(x)
             if not return_hz_f0:
                 x = (1 + x / 700).log()
         return x
 
-    def cents_decoder(self, y, mask=True):
+    def cents_decoder(self, y, mask=True, threshold=None):
+        threshold = self.threshold if threshold is None else threshold
         B, N, _ = y.size()
         ci = self.cent_table[None, None, :].expand(B, N, -1)
         rtn = torch.sum(ci * y, dim=-1, keepdim=True) / torch.sum(y, dim=-1, keepdim=True)  # cents: [B,N,1]
         if mask:
             confident = torch.max(y, dim=-1, keepdim=True)[0]
             confident_mask = torch.ones_like(confident)
-            confident_mask[confident <= self.threshold] = float("-INF")
+            confident_mask[confident <= threshold] = float("-INF")
             rtn = rtn * confident_mask
         if self.confidence:
             return rtn, confident
         else:
             return rtn
         
-    def cents_local_decoder(self, y, mask=True):
+    def cents_local_decoder(self, y, mask=True, threshold=None):
+        threshold = self.threshold if threshold is None else threshold
         B, N, _ = y.size()
         ci = self.cent_table[None, None, :].expand(B, N, -1)
         confident, max_index = torch.max(y, dim=-1, keepdim=True)
@@ -146,7 +150,7 @@ class FCPE(nn.Module):
         rtn = torch.sum(ci_l * y_l, dim=-1, keepdim=True) / torch.sum(y_l, dim=-1, keepdim=True)  # cents: [B,N,1]
         if mask:
             confident_mask = torch.ones_like(confident)
-            confident_mask[confident <= self.threshold] = float("-INF")
+            confident_mask[confident <= threshold] = float("-INF")
             rtn = rtn * confident_mask
         if self.confidence:
             return rtn, confident
@@ -190,19 +194,49 @@ class FCPEInfer:
             confidence=self.args.model.confidence,
         )
         model.to(device)
+        # strict, so the performer projection matrices are the trained ones from the checkpoint rather than the random
+        # draws of `FastAttention.__init__`; nothing redraws them at inference
         model.load_state_dict(ckpt['model'])
         model.eval()
         self.model = model
-        self.wav2mel = Wav2Mel(self.args)
+        self.wav2mel = Wav2Mel(self.args, device=device)
+        # with `center=False` and the padding of `STFT.get_mel`, mel frame i is centered on sample
+        # i * hop_size + frame_offset; the input is shifted by that much so frame i is centered on i * hop_size
+        win_size, hop_size = self.args.mel.win_size, self.args.mel.hop_size
+        self.frame_offset = win_size // 2 - (win_size - hop_size) // 2
 
     @torch.no_grad()
-    def __call__(self, audio, sr):
+    def __call__(self, audio, sr, threshold=0.05):
         audio = torch.from_numpy(audio).float().unsqueeze(0).to(self.device)
-        mel = self.wav2mel(audio=audio, sample_rate=sr)
-        mel_f0 = self.model(mel=mel, infer=True, return_hz_f0=True)
-        # f0 = (mel_f0.exp() - 1) * 700
-        f0 = mel_f0
-        return f0
+        return self.infer(audio, sr, threshold=threshold)
+
+    @torch.no_grad()
+    def infer(self, audio, sr, threshold=0.05):
+        """f0 in Hz of the (B, T) tensor `audio`, as (B, n_frames, 1) with 0 where unvoiced; frame i is centered on
+        second i * hop_size / mel.sampling_rate, and n_frames counts the frames centered within the input"""
+        audio = resample_torch(audio, sr, self.wav2mel.sampling_rate, quality="high")
+        n_frames = audio.shape[1] // self.wav2mel.hop_size + 1
+        audio = F.pad(audio, (self.frame_offset, 0))
+        mel = self.wav2mel(audio=audio, sample_rate=self.wav2mel.sampling_rate)
+        f0 = self.model(mel=mel, infer=True, return_hz_f0=True, threshold=threshold)
+        return f0[:, :n_frames]
+
+    def batch(self, audios, sr, threshold=0.05, batch_size=16):
+        """f0 of each 1-D numpy array in `audios`, as a list of float32 arrays (see `infer`). clips of equal length go
+        through the model together, `batch_size` at a time; shorter clips aren't padded into a batch, as the input
+        GroupNorm and the global attention would see the padding"""
+        by_length = {}
+        for i, audio in enumerate(audios):
+            by_length.setdefault(audio.shape[0], []).append(i)
+        f0s = [None] * len(audios)
+        for idx in by_length.values():
+            for start in range(0, len(idx), batch_size):
+                chunk = idx[start:start + batch_size]
+                audio = torch.from_numpy(np.stack([audios[i] for i in chunk])).float().to(self.device)
+                f0 = self.infer(audio, sr, threshold=threshold)[:, :, 0].cpu().numpy()
+                for i, f in zip(chunk, f0):
+                    f0s[i] = f
+        return f0s
 
 
 class Wav2Mel:
@@ -222,7 +256,6 @@ class Wav2Mel:
             args.mel.fmin,
             args.mel.fmax
         )
-        self.resample_kernel = {}
 
     def extract_nvstft(self, audio, keyshift=0, train=False):
         mel = self.stft.get_mel(audio, keyshift=keyshift, train=train).transpose(1, 2)  # B, n_frames, bins
@@ -233,15 +266,12 @@ class Wav2Mel:
         if sample_rate == self.sampling_rate:
             audio_res = audio
         else:
-            key_str = str(sample_rate)
-            if key_str not in self.resample_kernel:
-                self.resample_kernel[key_str] = Resample(sample_rate, self.sampling_rate,
-                                                         lowpass_filter_width=128).to(self.device)
-            audio_res = self.resample_kernel[key_str](audio)
+            # polyphase kernels are cached per rate pair and device in `utils.resample`
+            audio_res = resample_torch(audio, sample_rate, self.sampling_rate, quality="high")
 
         # extract
         mel = self.extract_nvstft(audio_res, keyshift=keyshift, train=train)  # B, n_frames, bins
-        n_frames = int(audio.shape[1] // self.hop_size) + 1
+        n_frames = int(audio_res.shape[1] // self.hop_size) + 1
         if n_frames > int(mel.shape[1]):
             mel = torch.cat((mel, mel[:, -1:, :]), 1)
         if n_frames < int(mel.shape[1]):
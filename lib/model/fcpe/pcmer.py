@@ -3,7 +3,7 @@ import torch
 from torch import nn
 import math
 from functools import partial
-from einops import rearrange, repeat
+from einops import rearrange
 
 from local_attention import LocalAttention
 import torch.nn.functional as F
@@ -20,11 +20,11 @@ def softmax_kernel(data, *, projection_matrix, is_query, normalize_data=True, ep
     
     ratio = (projection_matrix.shape[0] ** -0.5)
 
-    projection = repeat(projection_matrix, 'j d -> b h j d', b = b, h = h)
-    projection = projection.type_as(data)
+    # the projection is broadcast over batch and heads rather than copied for each of them
+    projection = projection_matrix.type_as(data)
 
     #data_dash = w^T x
-    data_dash = torch.einsum('...id,...jd->...ij', (data_normalizer * data), projection)
+    data_dash = torch.einsum('...id,jd->...ij', (data_normalizer * data), projection)
 
     
     # diag_data = D**2 
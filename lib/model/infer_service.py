@@ -0,0 +1,263 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 5:10 AM
+"""thread-safe inference front end: CPU stages in a thread pool, GPU stages in a single worker
+
+a request goes through
+  1. (cpu pool) decode, voice lookup in the `VoicePool`, high-pass + split, and f0 for the CPU-bound methods
+  2. (gpu worker) f0 for the GPU methods, HuBERT, retrieval and the synthesizer. requests for the same voice with the
+     same conversion settings that arrive within `batch_window` seconds are converted together through `VC.vc_batch`
+  3. (cpu pool) volume envelope mix, resampling and int16 conversion
+so `submit` / `convert` can be called from any number of threads (e.g. gradio with `concurrency_count > 1`).
+with a `trace_dir`, the stages of each request are traced across those threads and written as a Chrome trace
+"""
+import itertools
+import logging
+import os
+import queue
+import threading
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import perf_counter, strftime
+
+import numpy as np
+import torch
+
+from model.vc_infer_pipeline import group_chunks
+from utils.misc_utils import load_audio
+from utils.tracing import Tracer, activate, span
+
+logger = logging.getLogger(__name__)
+
+GPU_F0_METHODS = ["crepe", "mangio", "rmvpe", "fcpe"]
+
+
+class InferenceRequest(object):
+  def __init__(self, voice_fpath, input_audio, sid, f0_up_key, f0_method, file_index, index_rate, filter_radius,
+               resample_sr, rms_mix_rate, protect, f0_file):
+    self.voice_fpath = voice_fpath
+    self.input_audio = input_audio
+    self.input_audio_path = input_audio if isinstance(input_audio, str) else None
+    self.sid = int(sid)
+    self.f0_up_key = int(f0_up_key)
+    self.f0_method = f0_method
+    self.file_index = file_index
+    self.index_rate = index_rate
+    self.filter_radius = filter_radius
+    self.resample_sr = resample_sr
+    self.rms_mix_rate = rms_mix_rate
+    self.protect = protect
+    self.f0_file = f0_file
+    self.future = Future()
+    self.times = [0, 0, 0]  # npy, f0, infer; like `VC.pipeline`
+    self.tracer = None
+    # filled in by `InferenceService.prepare`
+    self.voice = None
+    self.audio = self.audio_pad = self.segments = None
+    self.index = self.big_npy = None
+    self.pitch = self.pitchf = None
+    self.outputs = []
+
+  def batch_key(self):
+    """requests with the same key can share synthesizer batches"""
+    return id(self.voice), self.f0_method, self.file_index, self.index_rate, self.protect
+
+
+class InferenceService(object):
+  def __init__(self, voice_pool, max_batch_samples=None, batch_window=0.01, max_batch_requests=8, n_workers=None,
+               trace_dir=None):
+    """`max_batch_samples` caps the padded 16k samples per synthesizer batch; defaults to one `t_max` chunk so a
+    batch of short requests never needs more memory than a single long one. `batch_window` is how long the worker
+    waits for compatible requests after taking one off the queue. `trace_dir` gets a Chrome trace per request
+    """
+    self.voice_pool = voice_pool
+    self.config = voice_pool.config
+    self.max_batch_samples = max_batch_samples
+    self.batch_window = batch_window
+    self.max_batch_requests = max_batch_requests
+    self.cpu_pool = ThreadPoolExecutor(max_workers=n_workers or self.config.n_cpu)
+    # `finish` runs on its own pool, so `shutdown` can drain the prepare stage before the worker
+    self.finish_pool = ThreadPoolExecutor(max_workers=n_workers or self.config.n_cpu)
+    self.closed = False
+    self.submit_lock = threading.Lock()  # `closed` is checked and the request submitted atomically
+    self.jobs = queue.Queue()
+    self.pending = []  # taken off the queue while batching but incompatible; only touched by the worker
+    self.n_batches = 0
+    self.n_requests = 0
+    self.trace_dir = trace_dir
+    self.trace_ids = itertools.count()
+    if trace_dir:
+      os.makedirs(trace_dir, exist_ok=True)
+    self.worker = threading.Thread(target=self.run, daemon=True)
+    self.worker.start()
+
+  def submit(self, voice_fpath, input_audio, sid=0, f0_up_key=0, f0_method="rmvpe", file_index="", index_rate=0.,
+             filter_radius=3, resample_sr=0, rms_mix_rate=1., protect=0.33, f0_file=None):
+    """`input_audio` is a path or 16k float audio; returns a Future of (sr, int16 audio, times)"""
+    request = InferenceRequest(voice_fpath, input_audio, sid, f0_up_key, f0_method, file_index, index_rate,
+                               filter_radius, resample_sr, rms_mix_rate, protect, f0_file)
+    if self.trace_dir:
+      request.tracer = Tracer(self.config.device)
+    with self.submit_lock:
+      if self.closed:
+        raise RuntimeError("cannot submit to an inference service after shutdown")
+      self.cpu_pool.submit(self.guard, [request], self.prepare, request)
+    return request.future
+
+  def convert(self, *args, timeout=None, **kwargs):
+    return self.submit(*args, **kwargs).result(timeout=timeout)
+
+  @staticmethod
+  def guard(requests, fn, *args):
+    """runs `fn`, failing the futures of `requests` instead of losing the exception in a worker thread"""
+    try:
+      fn(*args)
+    except Exception as e:
+      logger.error(traceback.format_exc())
+      for request in requests:
+        if not request.future.done():
+          request.future.set_exception(e)
+
+  ### cpu stages
+  def prepare(self, request):
+    with activate(request.tracer):
+      if request.input_audio_path is not None:
+        with span("decode") as attrs:
+          audio = load_audio(request.input_audio_path, 16000)
+          attrs["samples"] = audio.shape[0]
+      else:
+        audio = np.asarray(request.input_audio, dtype=np.float32)
+      audio_max = np.abs(audio).max() / 0.95
+      if audio_max > 1:
+        audio = audio / audio_max
+
+      with span("voice"):
+        request.voice = voice = self.voice_pool.get(request.voice_fpath)
+      request.index, request.big_npy = voice.vc.load_index(request.file_index, request.index_rate)
+      request.audio, request.audio_pad, request.segments = voice.vc.split_audio(audio)
+      if voice.if_f0 == 1 and request.f0_method not in GPU_F0_METHODS:
+        self.compute_pitch(request)
+    self.jobs.put(request)
+
+  def compute_pitch(self, request):
+    t0 = perf_counter()
+    request.pitch, request.pitchf = request.voice.vc.get_pitch(
+      request.input_audio_path, request.audio_pad, request.f0_up_key, request.f0_method, request.filter_radius,
+      request.f0_file)
+    request.times[1] += perf_counter() - t0
+
+  def finish(self, request):
+    voice = request.voice
+    with activate(request.tracer):
+      audio_opt = voice.vc.postprocess(
+        request.audio, request.outputs, voice.tgt_sr, request.resample_sr, request.rms_mix_rate)
+    if request.tracer is not None:
+      trace_fpath = os.path.join(self.trace_dir, f"{strftime('%Y%m%d-%H%M%S')}-{next(self.trace_ids)}.json")
+      request.tracer.save(trace_fpath)
+      logger.info("wrote trace %s", trace_fpath)
+    sr = request.resample_sr if voice.tgt_sr != request.resample_sr >= 16000 else voice.tgt_sr
+    request.future.set_result((sr, audio_opt, request.times))
+
+  ### gpu worker
+  def next_batch(self):
+    request = self.pending.pop(0) if self.pending else self.jobs.get()
+    if request is None:
+      return None
+    key = request.batch_key()
+    batch = [x for x in self.pending if x is not None and x.batch_key() == key][:self.max_batch_requests - 1]
+    self.pending = [x for x in self.pending if all(x is not y for y in batch)]
+    batch.insert(0, request)
+
+    deadline = perf_counter() + self.batch_window
+    while len(batch) < self.max_batch_requests:
+      remaining = deadline - perf_counter()
+      if remaining <= 0:
+        break
+      try:
+        request = self.jobs.get(timeout=remaining)
+      except queue.Empty:
+        break
+      if request is not None and request.batch_key() == key:
+        batch.append(request)
+      else:
+        self.pending.append(request)
+        if request is None:
+          break
+    return batch
+
+  def run(self):
+    while True:
+      batch = self.next_batch()
+      if batch is None:
+        return
+      self.guard(batch, self.run_batch, batch)
+
+  def run_batch(self, batch):
+    # every request in the batch gets the spans of the whole batch
+    with activate(*[request.tracer for request in batch]), span("gpu_batch", requests=len(batch)):
+      self.convert_batch(batch)
+
+  def convert_batch(self, batch):
+    voice = batch[0].voice
+    vc = voice.vc
+    hubert_model = self.voice_pool.hubert_model
+    max_batch_samples = self.max_batch_samples or vc.t_max + vc.t_pad2
+
+    # (request idx, audio chunk, pitch chunk, pitchf chunk)
+    chunks = []
+    for i, request in enumerate(batch):
+      pitch = pitchf = None
+      if voice.if_f0 == 1:
+        if request.pitch is None:
+          self.compute_pitch(request)
+        pitch, pitchf = vc.pitch_to_tensors(request.pitch, request.pitchf)
+      for audio_slice, pitch_slice in request.segments:
+        chunks.append((
+          i,
+          request.audio_pad[audio_slice],
+          pitch[:, pitch_slice] if pitch is not None else None,
+          pitchf[:, pitch_slice] if pitchf is not None else None,
+        ))
+
+    # batch timings are shared by every request in it
+    times = [0, 0, 0]
+    request = batch[0]
+    for group in group_chunks([chunk[1].shape[0] for chunk in chunks], max_batch_samples):
+      sid = torch.tensor([batch[chunks[j][0]].sid for j in group], device=vc.device).long()
+      outs = vc.vc_batch(
+        hubert_model, voice.net_g, sid, [chunks[j][1] for j in group], [chunks[j][2] for j in group],
+        [chunks[j][3] for j in group], times, request.index, request.big_npy, request.index_rate, voice.version,
+        request.protect)
+      for j, out in zip(group, outs):
+        batch[chunks[j][0]].outputs.append(out[vc.t_pad_tgt:-vc.t_pad_tgt])
+
+    self.n_batches += 1
+    self.n_requests += len(batch)
+    for request in batch:
+      request.times[0] += times[0]
+      request.times[2] += times[2]
+      self.finish_pool.submit(self.guard, [request], self.finish, request)
+
+  def stats(self):
+    return {
+      "batches": self.n_batches,
+      "requests": self.n_requests,
+      "mean_batch_size": self.n_requests / self.n_batches if self.n_batches else 0.,
+      "queued": self.jobs.qsize() + len(self.pending),
+    }
+
+  def shutdown(self):
+    """converts every request already submitted, then stops; later submits raise"""
+    with self.submit_lock:
+      self.closed = True
+    self.cpu_pool.shutdown(wait=True)  # every prepared request is queued before the sentinel
+    self.jobs.put(None)
+    self.worker.join()
+    self.finish_pool.shutdown(wait=True)
+    # nothing should be left behind the sentinel, but a future that never resolves hangs its caller
+    leftover = self.pending + [self.jobs.get_nowait() for _ in range(self.jobs.qsize())]
+    for request in leftover:
+      if request is not None and not request.future.done():
+        request.future.set_exception(RuntimeError("inference service shut down before the request was converted"))
+    self.pending = []
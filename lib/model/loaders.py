@@ -0,0 +1,134 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 3:40 AM
+"""model loading shared by the webUI and the headless scripts"""
+import json
+import logging
+import os
+import threading
+
+import torch
+
+from model.models import FrozenSynthesizer, SynthesizerTrnMs768NSFsid
+from model.onnx_backend import ONNX_EXT, OnnxSynthesizer
+from model.quantize import INT8_EXT, load_int8, quantize_hubert
+from utils.bundle import VoiceBundle, is_bundle
+from utils.misc_utils import FCPE_FPATH, HUBERT_FPATH, RMVPE_FPATH, RMVPE_ONNX_FPATH
+
+logger = logging.getLogger(__name__)
+
+# models that don't depend on the voice are loaded once per (device, precision) and shared by every voice / request
+shared_models = {}
+shared_models_lock = threading.Lock()
+
+
+def load_hubert_model(device, is_half, fpath=HUBERT_FPATH, quantize=False):
+  """`quantize` (CPU only): dynamic int8 linears, see `model.quantize`"""
+  from fairseq import checkpoint_utils
+
+  models, _, _ = checkpoint_utils.load_model_ensemble_and_task([fpath], suffix="")
+  hubert_model = models[0].to(device)
+  if quantize:
+    assert str(device) == "cpu" and not is_half, "int8 quantization is CPU fp32 only"
+    hubert_model = quantize_hubert(hubert_model)
+  else:
+    hubert_model = hubert_model.half() if is_half else hubert_model.float()
+  # identifies this model's outputs in `vc_infer_pipeline.feature_cache`
+  hubert_model.feature_cache_id = (os.path.basename(fpath), os.path.getsize(fpath), os.path.getmtime(fpath), quantize)
+  return hubert_model.eval()
+
+
+def load_synthesizer(fpath, device, is_half, freeze=True, backend="torch", quantize=False):
+  """returns (net_g, cpt) for an exported voice checkpoint (see `utils.process_ckpt`) or a voice bundle
+
+  `cpt["config"][-4]` is corrected to the actual number of speakers and `enc_q`, which only training needs, is dropped.
+  with `freeze`, `net_g` is a `FrozenSynthesizer` (weight norm folded in fp32 before any cast to half).
+  with the onnx `backend` (or an `.onnx` fpath), `net_g` is an `OnnxSynthesizer` on CPU loaded from the `.onnx` export
+  next to the voice (see `scripts/export_onnx.py`) and `cpt` has no `weight`.
+  with `quantize` (CPU only), the int8 calibration saved next to the voice (see `scripts/quantize_voice.py`) is loaded
+  into the frozen synthesizer when there is one
+  """
+  if backend == "onnx" and not fpath.endswith(ONNX_EXT):
+    fpath = os.path.splitext(fpath.rstrip("/"))[0] + ONNX_EXT
+    if not os.path.exists(fpath):
+      raise FileNotFoundError(f"`{fpath}` not found, export it first with `scripts/export_onnx.py`")
+  if fpath.endswith(ONNX_EXT):
+    net_g = OnnxSynthesizer(fpath)
+    return net_g, dict(net_g.cpt)
+
+  # bundle tensors are views of a memory map, so only `load_state_dict` below actually reads them
+  cpt = VoiceBundle(fpath).cpt() if is_bundle(fpath) else torch.load(fpath, map_location="cpu")
+  cpt["config"][-4] = cpt["weight"]["emb_g.weight"].shape[0]  # n_spk
+  if cpt.get("f0", 1) != 1:
+    raise NotImplementedError(f"`{fpath}` has no pitch guidance, which is not supported")
+
+  net_g = SynthesizerTrnMs768NSFsid(*cpt["config"], is_half=is_half)
+  del net_g.enc_q
+  logger.info("loading %s: %s", fpath, net_g.load_state_dict(cpt["weight"], strict=False))
+  net_g.eval()
+  if freeze:
+    net_g = FrozenSynthesizer(net_g).eval()
+  if quantize:
+    assert freeze and str(device) == "cpu" and not is_half, "int8 quantization is CPU fp32 only, on a frozen synthesizer"
+    int8_fpath = os.path.splitext(fpath.rstrip("/"))[0] + INT8_EXT
+    if os.path.exists(int8_fpath):
+      return load_int8(net_g, int8_fpath), cpt
+    logger.warning("no int8 calibration `%s` for %s, running it in fp32", int8_fpath, fpath)
+  net_g.to(device)
+  net_g = net_g.half() if is_half else net_g.float()
+  return net_g, cpt
+
+
+def build_synthesizer(config_fpath, is_half=False):
+  """(net_g, config) of a random-weight synthesizer without `enc_q`, for a model config such as `configs/40k.json`
+
+  `config` is the list `utils.process_ckpt.savee` exports, so `net_g`'s weights saved with it load like a trained voice;
+  for benchmarks and parity checks without one
+  """
+  with open(config_fpath) as f:
+    hps = json.load(f)
+  data, model = hps["data"], hps["model"]
+  config = [
+    data["filter_length"] // 2 + 1, 32, model["inter_channels"], model["hidden_channels"], model["filter_channels"],
+    model["n_heads"], model["n_layers"], model["kernel_size"], model["p_dropout"], model["resblock"],
+    model["resblock_kernel_sizes"], model["resblock_dilation_sizes"], model["upsample_rates"],
+    model["upsample_initial_channel"], model["upsample_kernel_sizes"], model["spk_embed_dim"], model["gin_channels"],
+    data["sampling_rate"], model["snake"],
+  ]
+  net_g = SynthesizerTrnMs768NSFsid(*config, is_half=is_half)
+  del net_g.enc_q
+  return net_g.eval(), config
+
+
+def get_shared_model(name, device, is_half, load_fn):
+  key = (name, str(device), is_half)
+  with shared_models_lock:
+    if key not in shared_models:
+      logger.info("loading shared %s model on %s", name, device)
+      shared_models[key] = load_fn()
+    return shared_models[key]
+
+
+def get_hubert_model(device, is_half, quantize=False):
+  name = "hubert_int8" if quantize else "hubert"
+  return get_shared_model(name, device, is_half, lambda: load_hubert_model(device, is_half, quantize=quantize))
+
+
+def get_rmvpe_model(device, is_half, backend="torch"):
+  from model.rmvpe import RMVPE
+
+  if backend == "onnx":
+    return get_shared_model("rmvpe_onnx", "cpu", False, lambda: RMVPE(RMVPE_ONNX_FPATH, is_half=False, device="cpu"))
+  return get_shared_model("rmvpe", device, is_half, lambda: RMVPE(RMVPE_FPATH, is_half=is_half, device=device))
+
+
+def get_fcpe_model(device):
+  from model.fcpe.model import FCPEInfer
+
+  return get_shared_model("fcpe", device, False, lambda: FCPEInfer(FCPE_FPATH, device=device))
+
+
+def release_shared_models():
+  with shared_models_lock:
+    shared_models.clear()
@@ -96,13 +96,16 @@ class ResidualCouplingBlock(nn.Module):
       )
       self.flows.append(modules.Flip())
 
-  def forward(self, x, x_mask, g=None, reverse=False):
+  def forward(self, x, x_mask, g=None, reverse=False, g_conds=None):
+    """`g_conds` optionally holds the precomputed `enc.cond_layer(g)` of each coupling layer"""
+    if g_conds is None:
+      g_conds = [None] * self.n_flows
     if not reverse:
-      for flow in self.flows:
-        x, _ = flow(x, x_mask, g=g, reverse=reverse)
+      for i, flow in enumerate(self.flows):
+        x, _ = flow(x, x_mask, g=g, reverse=reverse, g_cond=g_conds[i // 2])
     else:
-      for flow in reversed(self.flows):
-        x = flow(x, x_mask, g=g, reverse=reverse)
+      for i, flow in reversed(list(enumerate(self.flows))):
+        x = flow(x, x_mask, g=g, reverse=reverse, g_cond=g_conds[i // 2])
     return x
 
   def remove_weight_norm(self):
@@ -187,6 +190,7 @@ class SineGen(torch.nn.Module):
     self.sampling_rate = samp_rate
     self.voiced_threshold = voiced_threshold
     self.flag_for_pulse = flag_for_pulse
+    self.add_noise = True  # off only for deterministic comparisons, e.g. onnx parity checks
 
   def _f02uv(self, f0):
     # generate uv signal
@@ -232,7 +236,7 @@ class SineGen(torch.nn.Module):
       uv = self._f02uv(f0)
       uv = F.interpolate(uv.transpose(2, 1), scale_factor=upp, mode="nearest").transpose(2, 1)
       noise_amp = uv * self.noise_std + (1 - uv) * self.sine_amp / 3
-      noise = noise_amp * torch.randn_like(sine_waves)
+      noise = noise_amp * torch.randn_like(sine_waves) if self.add_noise else torch.zeros_like(sine_waves)
       sine_waves = sine_waves * uv + noise
     return sine_waves, uv, noise
 
@@ -365,11 +369,13 @@ class GeneratorNSF(torch.nn.Module):
 
     self.upp = np.prod(upsample_rates)
 
-  def forward(self, x, f0, g=None):
+  def forward(self, x, f0, g=None, g_cond=None):
     har_source, noi_source, uv = self.m_source(f0, self.upp)
     har_source = har_source.transpose(1, 2)
     x = self.conv_pre(x)
-    if g is not None:
+    if g_cond is not None:  # precomputed `cond(g)`
+      x = x + g_cond
+    elif g is not None:
       x = x + self.cond(g)
 
     for i in range(self.num_upsamples):
@@ -533,3 +539,46 @@ class SynthesizerTrnMs768NSFsid(nn.Module):
     return o, x_mask, (z, z_p, m_p, logs_p)
 
 
+class FrozenSynthesizer(nn.Module):
+  """inference-only `SynthesizerTrnMs768NSFsid`
+
+  folds weight norm in `dec` and `flow` and precomputes the speaker conditioning (`emb_g` followed by every flow's
+  `cond_layer` and `dec.cond`) for all speaker ids, then drops those layers along with `enc_q`. `infer` takes the same
+  arguments and returns the same outputs as `SynthesizerTrnMs768NSFsid.infer`. `net_g` is modified in place
+  """
+  def __init__(self, net_g):
+    super().__init__()
+    net_g.dec.remove_weight_norm()
+    net_g.flow.remove_weight_norm()  # also folds the flows' `cond_layer`
+    with torch.no_grad():
+      g = net_g.emb_g.weight.unsqueeze(-1)  # [n_spk, gin_channels, 1]
+      g_flow = torch.stack([net_g.flow.flows[i * 2].enc.cond_layer(g) for i in range(net_g.flow.n_flows)], 1)
+      g_dec = net_g.dec.cond(g)
+    self.register_buffer("g_flow", g_flow)  # [n_spk, n_flows, 2 * hidden_channels * n_layers, 1]
+    self.register_buffer("g_dec", g_dec)  # [n_spk, upsample_initial_channel, 1]
+
+    for i in range(net_g.flow.n_flows):
+      del net_g.flow.flows[i * 2].enc.cond_layer
+    del net_g.dec.cond
+    self.enc_p = net_g.enc_p
+    self.flow = net_g.flow
+    self.dec = net_g.dec
+    self.spk_embed_dim = net_g.spk_embed_dim
+
+  def infer(self, phone, phone_lengths, pitch, nsff0, sid, rate=None, clip_audio=True):
+    m_p, logs_p, x_mask = self.enc_p(phone, pitch, phone_lengths)
+    z_p = (m_p + torch.exp(logs_p) * torch.randn_like(m_p) * 0.66666) * x_mask
+    if rate:
+      head = int(z_p.shape[2] * rate)
+      z_p = z_p[:, :, -head:]
+      x_mask = x_mask[:, :, -head:]
+      nsff0 = nsff0[:, -head:]
+    z = self.flow(z_p, x_mask, reverse=True, g_conds=self.g_flow[sid].unbind(1))
+    o = self.dec(z * x_mask, nsff0, g_cond=self.g_dec[sid])
+
+    if clip_audio:
+      max_val = 32768.0
+      o = max_val * o
+      o = o.clamp(min=-max_val, max=max_val-1)
+
+    return o, x_mask, (z, z_p, m_p, logs_p)
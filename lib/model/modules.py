@@ -76,11 +76,14 @@ class WN(torch.nn.Module):
       res_skip_layer = torch.nn.utils.weight_norm(res_skip_layer, name="weight")
       self.res_skip_layers.append(res_skip_layer)
 
-  def forward(self, x, x_mask, g=None, **kwargs):
+  def forward(self, x, x_mask, g=None, g_cond=None, **kwargs):
+    """`g_cond` is a precomputed `cond_layer(g)`, see `models.FrozenSynthesizer`"""
     output = torch.zeros_like(x)
     n_channels_tensor = torch.IntTensor([self.hidden_channels])
 
-    if g is not None:
+    if g_cond is not None:
+      g = g_cond
+    elif g is not None:
       g = self.cond_layer(g)
 
     for i in range(self.n_layers):
@@ -220,10 +223,10 @@ class ResidualCouplingLayer(nn.Module):
     self.post.weight.data.zero_()
     self.post.bias.data.zero_()
 
-  def forward(self, x, x_mask, g=None, reverse=False):
+  def forward(self, x, x_mask, g=None, reverse=False, g_cond=None):
     x0, x1 = torch.split(x, [self.half_channels] * 2, 1)
     h = self.pre(x0) * x_mask
-    h = self.enc(h, x_mask, g=g)
+    h = self.enc(h, x_mask, g=g, g_cond=g_cond)
     stats = self.post(h) * x_mask
     if not self.mean_only:
       m, logs = torch.split(stats, [self.half_channels] * 2, 1)
@@ -0,0 +1,134 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 7:30 AM
+"""onnx export of the synthesizer and RMVPE's `E2E`, and their onnxruntime execution for CPU-only inference
+
+the exported synthesizer runs `FrozenSynthesizer.infer` with the prior noise as an explicit `rnd` input and the
+checkpoint metadata (everything but `weight`) stored as json in the model's `cpt` metadata entry, so an `.onnx` voice
+loads without its `.pth`. batch and time axes are dynamic in both models; RMVPE's time axis must stay a multiple of 32,
+which `RMVPE.mel2hidden` already pads to
+"""
+import json
+import logging
+import os
+
+import numpy as np
+import torch
+from torch import nn
+
+logger = logging.getLogger(__name__)
+
+ONNX_EXT = ".onnx"
+DEFAULT_OPSET = 17
+DEFAULT_PROVIDERS = ["CPUExecutionProvider"]
+
+
+def make_session(fpath, providers=None, n_threads=0):
+  """onnxruntime session with full graph optimization; `n_threads` <= 0 leaves intra-op threads to onnxruntime"""
+  import onnxruntime as ort
+
+  options = ort.SessionOptions()
+  options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+  if n_threads > 0:
+    options.intra_op_num_threads = n_threads
+  return ort.InferenceSession(fpath, sess_options=options, providers=providers or DEFAULT_PROVIDERS)
+
+
+class SynthesizerExport(nn.Module):
+  """`FrozenSynthesizer.infer` with the prior noise as an input and the audio as the only output"""
+  def __init__(self, net_g):
+    super().__init__()
+    self.net_g = net_g
+
+  def forward(self, phone, phone_lengths, pitch, pitchf, sid, rnd):
+    net_g = self.net_g
+    m_p, logs_p, x_mask = net_g.enc_p(phone, pitch, phone_lengths)
+    z_p = (m_p + torch.exp(logs_p) * rnd * 0.66666) * x_mask
+    z = net_g.flow(z_p, x_mask, reverse=True, g_conds=net_g.g_flow[sid].unbind(1))
+    o = net_g.dec(z * x_mask, pitchf, g_cond=net_g.g_dec[sid])
+    return (32768.0 * o).clamp(min=-32768.0, max=32767.0)
+
+
+def export_synthesizer(net_g, cpt, out_fpath, opset=DEFAULT_OPSET):
+  """exports a fp32 `FrozenSynthesizer` (see `model.loaders.load_synthesizer`) with its checkpoint metadata"""
+  import onnx
+
+  n_frames = 200
+  inputs = (
+    torch.randn(1, n_frames, net_g.enc_p.emb_phone.in_features),
+    torch.LongTensor([n_frames]),
+    torch.randint(1, 255, (1, n_frames)).long(),
+    torch.rand(1, n_frames) * 300 + 80,
+    torch.LongTensor([0]),
+    torch.randn(1, net_g.enc_p.out_channels, n_frames),
+  )
+  with torch.no_grad():
+    torch.onnx.export(
+      SynthesizerExport(net_g).eval(), inputs, out_fpath, opset_version=opset, do_constant_folding=True,
+      input_names=["phone", "phone_lengths", "pitch", "pitchf", "sid", "rnd"], output_names=["audio"],
+      dynamic_axes={
+        "phone": {0: "batch", 1: "frames"},
+        "phone_lengths": {0: "batch"},
+        "pitch": {0: "batch", 1: "frames"},
+        "pitchf": {0: "batch", 1: "frames"},
+        "sid": {0: "batch"},
+        "rnd": {0: "batch", 2: "frames"},
+        "audio": {0: "batch", 2: "samples"},
+      })
+
+  model = onnx.load(out_fpath)
+  meta = model.metadata_props.add()
+  meta.key = "cpt"
+  meta.value = json.dumps({k: v for k, v in cpt.items() if k != "weight"})
+  onnx.save(model, out_fpath)
+  return out_fpath
+
+
+def export_rmvpe(model, out_fpath, opset=DEFAULT_OPSET):
+  """exports RMVPE's `E2E` (or the fpath of its state dict) as fp32 mel (B, 128, T) -> salience (B, T, 360), with T a
+  multiple of 32
+  """
+  if isinstance(model, str):
+    from model.rmvpe import E2E
+
+    state_dict = torch.load(model, map_location="cpu")
+    model = E2E(4, 1, (2, 2))
+    model.load_state_dict(state_dict)
+  with torch.no_grad():
+    torch.onnx.export(
+      model.float().eval(), (torch.randn(1, 128, 128),), out_fpath, opset_version=opset, do_constant_folding=True,
+      input_names=["mel"], output_names=["hidden"],
+      dynamic_axes={"mel": {0: "batch", 2: "frames"}, "hidden": {0: "batch", 1: "frames"}})
+  return out_fpath
+
+
+class OnnxSynthesizer(object):
+  """onnxruntime stand-in for `net_g`: `infer` takes the same arguments as `FrozenSynthesizer.infer` and returns the
+  audio as a cpu float tensor in the same (audio, x_mask, stats) tuple, with only the audio filled in
+  """
+  def __init__(self, fpath, providers=None, n_threads=0):
+    self.fpath = fpath
+    self.session = make_session(fpath, providers=providers, n_threads=n_threads)
+    self.inter_channels = self.session.get_inputs()[5].shape[1]
+    self.cpt = json.loads(self.session.get_modelmeta().custom_metadata_map["cpt"])
+    self.nbytes = os.path.getsize(fpath)
+
+  @staticmethod
+  def to_numpy(x, dtype):
+    return x.detach().cpu().numpy().astype(dtype, copy=False) if torch.is_tensor(x) else np.asarray(x, dtype=dtype)
+
+  def infer(self, phone, phone_lengths, pitch, nsff0, sid, rate=None, clip_audio=True):
+    if rate or not clip_audio:
+      raise NotImplementedError("the exported synthesizer always decodes whole chunks with clipped audio")
+    batch_size, n_frames = phone.shape[:2]
+    sid = self.to_numpy(sid, np.int64)
+    audio = self.session.run(["audio"], {
+      "phone": self.to_numpy(phone, np.float32),
+      "phone_lengths": self.to_numpy(phone_lengths, np.int64),
+      "pitch": self.to_numpy(pitch, np.int64),
+      "pitchf": self.to_numpy(nsff0, np.float32),
+      "sid": np.broadcast_to(sid, (batch_size,)).copy(),
+      "rnd": np.random.randn(batch_size, self.inter_channels, n_frames).astype(np.float32),
+    })[0]
+    return torch.from_numpy(audio), None, None
@@ -0,0 +1,111 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 8:40 AM
+"""int8 CPU inference for HuBERT and the synthesizer
+
+- HuBERT: dynamic int8 `Linear`s (weights int8 per channel, activations quantized on the fly), except the attention
+  projections, which fairseq's `MultiheadAttention` reads as raw `.weight`s
+- synthesizer stages (`enc_p`, `flow`, `dec` of a `FrozenSynthesizer`): static int8 `Conv1d`s, each wrapped in its
+  own quant / dequant pair so everything in between (activations, gates, residuals, `ConvTranspose1d`) stays fp32.
+  activation ranges come from a calibration pass over reference clips (`calibrate_synthesizer`), and only convs with
+  at least `MIN_CONV_MACS` input channels x taps are converted, since fbgemm's int8 conv is slower than fp32 below that
+  (and uses far more memory on the long, narrow decoder tails). remaining large `Linear`s are dynamic int8
+
+calibrated synthesizers are saved next to the voice as `<name>.int8.pt` (see `save_int8`) and picked up by
+`model.loaders.load_synthesizer(..., quantize=True)`
+"""
+import logging
+
+import torch
+import torch.ao.nn.quantized.dynamic as nnqd
+from torch import nn
+from torch.ao.quantization import QuantWrapper, convert, get_default_qconfig, per_channel_dynamic_qconfig, prepare
+
+logger = logging.getLogger(__name__)
+
+INT8_EXT = ".int8.pt"  # not `.pth`, so it isn't listed as a voice
+SYNTH_STAGES = ["enc_p", "flow", "dec"]
+MIN_CONV_MACS = 768  # in_channels // groups * kernel_size
+
+
+def quantize_linears(module, min_features=MIN_CONV_MACS, skip_parents=("MultiheadAttention",)):
+  """replaces `nn.Linear`s with at least `min_features` inputs by dynamic int8 ones, in place"""
+  for name, child in list(module.named_children()):
+    if type(child) is nn.Linear and child.in_features >= min_features:
+      if type(module).__name__ not in skip_parents:
+        child.qconfig = per_channel_dynamic_qconfig
+        setattr(module, name, nnqd.Linear.from_float(child))
+    else:
+      quantize_linears(child, min_features=min_features, skip_parents=skip_parents)
+  return module
+
+
+def quantize_hubert(hubert_model):
+  return quantize_linears(hubert_model.float().eval())
+
+
+def wrap_convs(module, qconfig, min_macs=MIN_CONV_MACS):
+  """wraps every eligible `nn.Conv1d` in a `QuantWrapper` carrying `qconfig`, in place"""
+  for name, child in list(module.named_children()):
+    if type(child) is nn.Conv1d:
+      if child.padding_mode == "zeros" and child.in_channels // child.groups * child.kernel_size[0] >= min_macs:
+        wrapper = QuantWrapper(child)
+        wrapper.qconfig = qconfig
+        setattr(module, name, wrapper)
+    elif not isinstance(child, QuantWrapper):
+      wrap_convs(child, qconfig, min_macs=min_macs)
+  return module
+
+
+def prepare_synthesizer(net_g, stages=SYNTH_STAGES):
+  """inserts observers into the convs of `stages`; run the model on calibration inputs, then `convert_synthesizer`"""
+  assert all(stage in SYNTH_STAGES for stage in stages), f"unknown stages {stages}, expected some of {SYNTH_STAGES}"
+  qconfig = get_default_qconfig(torch.backends.quantized.engine)
+  net_g = net_g.float().eval()
+  for stage in stages:
+    wrap_convs(getattr(net_g, stage), qconfig)
+  return prepare(net_g, inplace=True)
+
+
+def convert_synthesizer(net_g, stages=SYNTH_STAGES):
+  net_g = convert(net_g, inplace=True)
+  for stage in stages:
+    quantize_linears(getattr(net_g, stage))
+  return net_g
+
+
+def calibrate_synthesizer(net_g, run_fn, stages=SYNTH_STAGES):
+  """int8 `net_g` (modified in place) with activation ranges observed while `run_fn(net_g)` runs reference inputs"""
+  prepare_synthesizer(net_g, stages)
+  with torch.no_grad():
+    run_fn(net_g)
+  return convert_synthesizer(net_g, stages)
+
+
+def save_int8(net_g, cpt, stages, fpath):
+  ckpt = {k: v for k, v in cpt.items() if k != "weight"}
+  ckpt.update(weight=net_g.state_dict(), stages=list(stages))
+  torch.save(ckpt, fpath)
+  return fpath
+
+
+def load_int8(net_g, fpath):
+  """rebuilds the int8 structure saved by `save_int8` on a fp32 `FrozenSynthesizer` and loads its weights/ranges"""
+  ckpt = torch.load(fpath, map_location="cpu")
+  stages = ckpt["stages"]
+  prepare_synthesizer(net_g, stages)
+  with torch.no_grad():  # observers have seen nothing yet; the loaded state replaces their placeholder ranges
+    convert_synthesizer(net_g, stages)
+  net_g.load_state_dict(ckpt["weight"])
+  return net_g
+
+
+def mel_distance(ref, out, sr):
+  """mean absolute log-mel difference between two int16 (or float) numpy signals, over their common length"""
+  from model.mel_processing import mel_spectrogram_torch  # pulls in librosa
+
+  ref, out = [torch.as_tensor(x).float().reshape(1, -1) / (32768. if x.dtype.kind == "i" else 1.) for x in (ref, out)]
+  n = min(ref.shape[1], out.shape[1])
+  mels = [mel_spectrogram_torch(x[:, :n], 1024, 80, sr, 256, 1024, 0, None) for x in (ref, out)]
+  return (mels[0] - mels[1]).abs().mean().item()
@@ -0,0 +1,211 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/17/26 11:35 PM
+import logging
+import os
+import threading
+
+import numpy as np
+import torch
+
+from utils.bundle import VoiceBundle, get_mtime, is_bundle
+from utils.cache_utils import LRUCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_CACHE_BYTES = 4 * 1024 ** 3
+TORCH_RETRIEVAL_DEVICES = ("cuda", "mps")
+SCORE_BLOCK_ELEMENTS = 2 ** 25  # query rows x index rows scored at once
+
+
+def is_compressed(index):
+  """whether `index` stores lossy codes (IVF-PQ, OPQ+IVF-PQ) rather than the raw float32 vectors"""
+  import faiss
+
+  try:
+    index_ivf = faiss.extract_index_ivf(index)
+  except RuntimeError:  # flat / hnsw
+    return False
+  return index_ivf.code_size < 4 * index_ivf.d
+
+
+def set_search_params(index, nprobe=0, ef_search=0):
+  """sets `nprobe` (IVF types) / `efSearch` (hnsw) on `index`, also under an OPQ transform; 0 keeps the stored value"""
+  import faiss
+
+  params = faiss.ParameterSpace()
+  for name, value in (("nprobe", nprobe), ("efSearch", ef_search)):
+    if value > 0:
+      try:
+        params.set_index_parameter(index, name, value)
+      except RuntimeError:  # not applicable to this index type
+        pass
+
+
+def blend_neighbours(vectors, ix, weight):
+  """`sum_k weight[:, k] * vectors[ix[:, k]]`, one neighbour rank at a time instead of gathering (N, k, C) at once"""
+  out = np.zeros((ix.shape[0], vectors.shape[1]), dtype=np.float32)
+  for k in range(ix.shape[1]):
+    rows = np.asarray(vectors[ix[:, k]], dtype=np.float32)  # fancy indexing copies, even from a memory map
+    rows *= weight[:, k:k + 1]
+    out += rows
+  return out
+
+
+class IndexVectors(object):
+  """stands in for `big_npy` on compressed indexes: `vectors[ix]` decodes only the rows in `ix` from the PQ codes
+
+  reconstructing every vector up front would bring back the float32 (ntotal, 768) matrix the codes were meant to
+  replace; the decoded rows are the same either way
+  """
+  def __init__(self, index):
+    import faiss
+
+    faiss.extract_index_ivf(index).make_direct_map()
+    self.index = index
+    self.shape = (index.ntotal, index.d)
+    self.nbytes = 8 * index.ntotal  # the direct map
+
+  def __len__(self):
+    return self.shape[0]
+
+  def __getitem__(self, ix):
+    ix = np.asarray(ix, dtype=np.int64)
+    # -1 marks a missing neighbour (fewer than k hits in the probed lists); its weight is ~0 anyway
+    rows = self.index.reconstruct_batch(np.maximum(ix.ravel(), 0))
+    return rows.reshape(ix.shape + (self.shape[1],))
+
+
+class TorchRetrieval(object):
+  """exact top-k retrieval and blending on the inference device, for indexes small enough to keep there
+
+  `big_npy` is copied to the device once (fp16 on GPUs), so HuBERT features never leave it: squared L2 distances come
+  from one matmul per block of queries (same metric as the faiss indexes), `torch.topk` picks the neighbours and the
+  inverse-square blend is accumulated rank by rank as in `blend_neighbours`. the search is exhaustive, so it finds
+  the true neighbours where IVF with a small `nprobe` may miss some
+  """
+  def __init__(self, big_npy, device):
+    self.device = torch.device(device)
+    self.dtype = torch.float32 if self.device.type == "cpu" else torch.float16
+    big_npy = np.asarray(big_npy, dtype=np.float32)
+    self.vectors = torch.from_numpy(big_npy).to(self.device, self.dtype)
+    self.sq_norms = torch.from_numpy(np.square(big_npy).sum(axis=1)).to(self.device)
+    self.shape = tuple(big_npy.shape)
+    self.nbytes = self.vectors.element_size() * self.vectors.nelement() + 4 * self.shape[0]
+    self.block_rows = max(1, SCORE_BLOCK_ELEMENTS // self.shape[0])
+
+  def search(self, x, k=8):
+    """(scores, ids) of the `k` nearest rows to each row of the (N, C) tensor `x`, like `faiss.Index.search`"""
+    scores, ids = [], []
+    for i in range(0, x.shape[0], self.block_rows):
+      q = x[i:i + self.block_rows].to(self.device, self.dtype)
+      dist = torch.matmul(q, self.vectors.T).float().mul_(-2)
+      dist += q.float().square().sum(dim=1, keepdim=True)
+      dist += self.sq_norms
+      score, ix = torch.topk(dist, min(k, self.shape[0]), dim=1, largest=False)
+      scores.append(score)
+      ids.append(ix)
+    return torch.cat(scores), torch.cat(ids)
+
+  def blend(self, feats, index_rate, k=8):
+    """`feats` (N, C) blended with the inverse-square weighted mean of their `k` neighbours, as in `VC.blend_index`"""
+    score, ix = self.search(feats, k=k)
+    weight = score.clamp_min_(1e-8).square_().reciprocal_()  # fp16 rounding can take an exact match below 0
+    weight /= weight.sum(dim=1, keepdim=True)
+    npy = torch.zeros(feats.shape, dtype=torch.float32, device=self.device)
+    for j in range(ix.shape[1]):
+      npy += self.vectors[ix[:, j]].float() * weight[:, j:j + 1]
+    return npy.to(feats.dtype) * index_rate + (1 - index_rate) * feats
+
+
+class IndexRegistry(object):
+  """process-wide cache of faiss indexes and their reconstructed feature matrices
+
+  entries are keyed by (abspath, mtime) so re-training an index in place invalidates the old entry. the size
+  budget counts both the index (approximated by its file size) and `big_npy`. `file_index` may also be a voice
+  bundle (see `utils.bundle`), whose memory-mapped `big_npy` lives in the page cache and is not counted. compressed
+  (PQ) indexes get an `IndexVectors` as their `big_npy`. device copies for `TorchRetrieval` are cached alongside,
+  under the same path and mtime
+  """
+  def __init__(self, max_bytes=DEFAULT_INDEX_CACHE_BYTES):
+    self.cache = LRUCache(max_bytes)
+    self.load_lock = threading.Lock()
+
+  @staticmethod
+  def make_key(file_index):
+    file_index = os.path.abspath(file_index)
+    return file_index, get_mtime(file_index)
+
+  def get(self, file_index, nprobe=0, ef_search=0):
+    """returns (index, big_npy), shared by every caller; `big_npy` is read-only. non-zero `nprobe` / `ef_search` are
+    applied to the shared index (see `set_search_params`)"""
+    index, big_npy = self.load(file_index)
+    if nprobe > 0 or ef_search > 0:
+      set_search_params(index, nprobe=nprobe, ef_search=ef_search)
+    return index, big_npy
+
+  def get_torch(self, file_index, device):
+    """returns (TorchRetrieval, big_npy) on `device`, shared by every caller"""
+    index, big_npy = self.load(file_index)
+    key = self.make_key(file_index) + (str(device),)
+    entry = self.cache.get(key)
+    if entry is not None:
+      return entry
+
+    with self.load_lock:
+      if key in self.cache:
+        return self.cache.get(key)
+      retrieval = TorchRetrieval(big_npy, device)
+      logger.info("copied index %s to %s (%.1fMB)", key[0], device, retrieval.nbytes / 1024 ** 2)
+      return self.cache.put(key, (retrieval, big_npy), retrieval.nbytes)
+
+  def load(self, file_index):
+    key = self.make_key(file_index)
+    entry = self.cache.get(key)
+    if entry is not None:
+      return entry
+
+    with self.load_lock:
+      # another thread may have loaded it while we were waiting
+      if key in self.cache:
+        return self.cache.get(key)
+
+      # drop stale versions of the same file
+      for old_key in self.cache.keys():
+        if old_key[0] == key[0] and old_key[1] != key[1]:
+          self.cache.pop(old_key)
+
+      if is_bundle(key[0]):
+        bundle = VoiceBundle(key[0])
+        if not bundle.has_index:
+          raise ValueError(f"bundle {key[0]} has no index")
+        index, big_npy = bundle.load_index()
+        nbytes = os.path.getsize(os.path.join(key[0], bundle.meta["index"]))
+      else:
+        import faiss  # only once an index is actually used
+
+        index = faiss.read_index(key[0])
+        if is_compressed(index):
+          big_npy = IndexVectors(index)
+        else:
+          big_npy = index.reconstruct_n(0, index.ntotal)
+          big_npy.flags.writeable = False
+        nbytes = os.path.getsize(key[0]) + big_npy.nbytes
+      logger.info("loaded index %s (ntotal=%d, %.1fMB)", key[0], index.ntotal, nbytes / 1024 ** 2)
+      return self.cache.put(key, (index, big_npy), nbytes)
+
+  def evict(self, file_index=None):
+    if file_index is None:
+      self.cache.clear()
+      return
+    file_index = os.path.abspath(file_index)
+    for key in self.cache.keys():
+      if key[0] == file_index:
+        self.cache.pop(key)
+
+  def stats(self):
+    return self.cache.stats()
+
+
+index_registry = IndexRegistry()
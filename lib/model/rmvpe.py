@@ -563,7 +563,10 @@ class MelSpectrogram(torch.nn.Module):
 
 
 class RMVPE:
-    def __init__(self, model_path, is_half, device=None):
+    def __init__(self, model_path, is_half, device=None, providers=None, n_threads=0):
+        """an `.onnx` `model_path` (see `model.onnx_backend.export_rmvpe`) runs `E2E` in onnxruntime with `providers`
+        (CPU by default), while the mel and the decoding stay in torch / numpy on `device`
+        """
         self.resample_kernel = {}
         self.resample_kernel = {}
         self.is_half = is_half
@@ -573,13 +576,15 @@ class RMVPE:
         self.mel_extractor = MelSpectrogram(
             is_half, 128, 16000, 1024, 160, None, 30, 8000
         ).to(device)
-        if "privateuseone" in str(device):
-            import onnxruntime as ort
-
-            ort_session = ort.InferenceSession(
-                "rmvpe.onnx", providers=["DmlExecutionProvider"]
-            )
-            self.model = ort_session
+        self.use_onnx = model_path.endswith(".onnx") or "privateuseone" in str(device)
+        if self.use_onnx:
+            from model.onnx_backend import make_session
+
+            if "privateuseone" in str(device):
+                providers = providers or ["DmlExecutionProvider"]
+                if not model_path.endswith(".onnx"):
+                    model_path = "rmvpe.onnx"
+            self.model = make_session(model_path, providers=providers, n_threads=n_threads)
         else:
             model = E2E(4, 1, (2, 2))
             ckpt = torch.load(model_path, map_location="cpu")
@@ -598,7 +603,7 @@ class RMVPE:
             mel = F.pad(
                 mel, (0, 32 * ((n_frames - 1) // 32 + 1) - n_frames), mode="reflect"
             )
-            if "privateuseone" in str(self.device):
+            if self.use_onnx:
                 onnx_input_name = self.model.get_inputs()[0].name
                 onnx_outputs_names = self.model.get_outputs()[0].name
                 hidden = self.model.run(
@@ -616,7 +621,12 @@ class RMVPE:
         # f0 = np.array([10 * (2 ** (cent_pred / 1200)) if cent_pred else 0 for cent_pred in cents_pred])
         return f0
 
-    def infer_from_audio(self, audio, thred=0.03):
+    def infer_from_audio(self, audio, thred=0.03, window=0, overlap=256, batch_size=1):
+        """`window` > 0 (in frames) switches to the bounded-memory windowed mode, see `infer_from_audio_windowed`"""
+        if window > 0:
+            return self.infer_from_audio_windowed(
+                audio, thred=thred, window=window, overlap=overlap, batch_size=batch_size
+            )
         # torch.cuda.synchronize()
         t0 = ttime()
         mel = self.mel_extractor(
@@ -629,12 +639,13 @@ class RMVPE:
         # torch.cuda.synchronize()
         t2 = ttime()
         # print(234234,hidden.device.type)
-        if "privateuseone" not in str(self.device):
-            hidden = hidden.squeeze(0).cpu().numpy()
+        if not self.use_onnx:
+            # stays on device, only the local windows are copied back in decode
+            hidden = hidden.squeeze(0)
         else:
             hidden = hidden[0]
-        if self.is_half == True:
-            hidden = hidden.astype("float32")
+            if self.is_half == True:
+                hidden = hidden.astype("float32")
 
         f0 = self.decode(hidden, thred=thred)
         # torch.cuda.synchronize()
@@ -642,31 +653,104 @@ class RMVPE:
         # print("hmvpe:%s\t%s\t%s\t%s"%(t1-t0,t2-t1,t3-t2,t3-t0))
         return f0
 
+    def window_mel(self, audio, start, end):
+        """mel frames [start, end) of the whole-signal mel, computed from just enough audio around them
+
+        the margin is a whole number of hops >= n_fft // 2, so every kept frame sees exactly the same samples as in
+        the single-pass mel; reflect padding only happens at the true ends of the signal, as in the single pass
+        """
+        hop = self.mel_extractor.hop_length
+        margin = hop * ((self.mel_extractor.n_fft // 2 - 1) // hop + 1)
+        chunk_start = max(start * hop - margin, 0)
+        chunk = audio[chunk_start : end * hop + margin]
+        mel = self.mel_extractor(
+            torch.from_numpy(chunk).float().to(self.device).unsqueeze(0), center=True
+        )
+        offset = start - chunk_start // hop
+        return mel[:, :, offset : offset + end - start]
+
+    def infer_from_audio_windowed(self, audio, thred=0.03, window=4096, overlap=256, batch_size=1):
+        """runs mel -> E2E -> decode over overlapping windows so peak memory no longer grows with the input
+
+        each window keeps `window` frames and sees `overlap` extra frames of context on both sides (both rounded up
+        to multiples of 32). every window starts on a multiple of 32 frames, so the U-Net pooling grid lines up with
+        the single pass; the last one, which ends with the signal, is up to 31 frames longer than the others and is
+        reflect-padded to a multiple of 32 as in the single pass. `batch_size` windows of equal length go through the
+        model at once. only the BiGRU's long-range context is truncated, so the f0 matches the single pass up to the
+        rare frames where more than `overlap` frames of context matter
+        """
+        n_frames = audio.shape[0] // self.mel_extractor.hop_length + 1
+        window = 32 * ((window - 1) // 32 + 1)
+        overlap = 32 * ((overlap - 1) // 32 + 1) if overlap > 0 else 0
+        length = window + 2 * overlap
+        if n_frames <= length:
+            return self.infer_from_audio(audio, thred=thred)
+
+        spans = []  # (kept start, kept end, input start, input end)
+        for start in range(0, n_frames, window):
+            end = min(start + window, n_frames)
+            in_start = 32 * (min(max(start - overlap, 0), n_frames - length) // 32)
+            in_end = n_frames if in_start + length + 32 > n_frames else in_start + length
+            spans.append((start, end, in_start, in_end))
+
+        batches = []
+        for span in spans:
+            if (batches and len(batches[-1]) < batch_size
+                    and batches[-1][0][3] - batches[-1][0][2] == span[3] - span[2]):
+                batches[-1].append(span)
+            else:
+                batches.append([span])
+
+        f0 = []
+        for batch in batches:
+            mel = torch.cat(
+                [self.window_mel(audio, in_start, in_end) for _, _, in_start, in_end in batch]
+            )
+            hidden = self.mel2hidden(mel)
+            for (start, end, in_start, _), h in zip(batch, hidden):
+                h = h[start - in_start : end - in_start]
+                if self.use_onnx and self.is_half == True:
+                    h = h.astype("float32")
+                f0.append(self.decode(h, thred=thred))
+            del mel, hidden
+        return np.concatenate(f0)
+
     def to_local_average_cents(self, salience, thred=0.05):
-        # t0 = ttime()
-        center = np.argmax(salience, axis=1)  # 帧长#index
-        salience = np.pad(salience, ((0, 0), (4, 4)))  # 帧长,368
-        # t1 = ttime()
-        center += 4
-        todo_salience = []
-        todo_cents_mapping = []
-        starts = center - 4
-        ends = center + 5
-        for idx in range(salience.shape[0]):
-            todo_salience.append(salience[:, starts[idx] : ends[idx]][idx])
-            todo_cents_mapping.append(self.cents_mapping[starts[idx] : ends[idx]])
-        # t2 = ttime()
-        todo_salience = np.array(todo_salience)  # 帧长，9
-        todo_cents_mapping = np.array(todo_cents_mapping)  # 帧长，9
-        product_sum = np.sum(todo_salience * todo_cents_mapping, 1)
-        weight_sum = np.sum(todo_salience, 1)  # 帧长
-        devided = product_sum / weight_sum  # 帧长
-        # t3 = ttime()
-        maxx = np.max(salience, axis=1)  # 帧长
-        devided[maxx <= thred] = 0
-        # t4 = ttime()
-        # print("decode:%s\t%s\t%s\t%s" % (t1 - t0, t2 - t1, t3 - t2, t4 - t3))
-        return devided
+        return to_local_average_cents(salience, self.cents_mapping, thred=thred)
+
+
+def gather_local_salience(salience):
+    """picks the 9-bin window around the argmax of every frame, on whatever device `salience` lives
+
+    returns (center, todo_salience, maxx) as host arrays, so only (N, 9) + 2N values cross to the host
+    instead of the whole (N, 360) salience matrix. bins outside [0, 360) are zero, as with the padded numpy version
+    """
+    if torch.is_tensor(salience):
+        maxx, center = torch.max(salience, dim=1)
+        idx = center.unsqueeze(1) + torch.arange(-4, 5, device=salience.device)  # 帧长，9
+        todo_salience = torch.gather(salience, 1, idx.clamp(0, salience.shape[1] - 1))
+        todo_salience = todo_salience.masked_fill((idx < 0) | (idx >= salience.shape[1]), 0)
+        # np.max over the zero-padded salience never goes below 0
+        maxx = maxx.clamp(min=0)
+        return center.cpu().numpy(), todo_salience.float().cpu().numpy(), maxx.float().cpu().numpy()
+
+    center = np.argmax(salience, axis=1)  # 帧长#index
+    idx = center[:, None] + np.arange(-4, 5)  # 帧长，9
+    todo_salience = np.take_along_axis(salience, idx.clip(0, salience.shape[1] - 1), axis=1)
+    todo_salience[(idx < 0) | (idx >= salience.shape[1])] = 0
+    maxx = np.maximum(np.take_along_axis(salience, center[:, None], axis=1)[:, 0], 0)  # 帧长
+    return center, todo_salience, maxx
+
+
+def to_local_average_cents(salience, cents_mapping, thred=0.05):
+    """vectorized local-average decode; `cents_mapping` is the 4-bin zero-padded (368,) cents table"""
+    center, todo_salience, maxx = gather_local_salience(salience)
+    todo_cents_mapping = cents_mapping[center[:, None] + np.arange(9)]  # 帧长，9
+    product_sum = np.sum(todo_salience * todo_cents_mapping, 1)
+    weight_sum = np.sum(todo_salience, 1)  # 帧长
+    devided = product_sum / weight_sum  # 帧长
+    devided[maxx <= thred] = 0
+    return devided
 
 
 if __name__ == "__main__":
@@ -6,49 +6,110 @@ import traceback
 from functools import lru_cache
 from time import time as ttime
 
-import faiss
-import librosa
 import numpy as np
-import parselmouth
-import pyworld
 import torch
 import torch.nn.functional as F
-import torchcrepe
-from scipy import signal
 
-from utils.misc_utils import RMVPE_FPATH
+from model.loaders import get_fcpe_model, get_rmvpe_model
+from model.retrieval import TORCH_RETRIEVAL_DEVICES, IndexVectors, TorchRetrieval, blend_neighbours, index_registry
+from model.world_f0 import segmented_f0
+from utils.cache_utils import ArrayCache, hash_array
+from utils.resample import resample
+from utils.tracing import activate, span
 
-bh, ah = signal.butter(N=5, Wn=48, btype="high", fs=16000)
-input_audio_path2wav = {}
+F0_CACHE_BYTES = 256 * 1024 ** 2
+FEATURE_CACHE_BYTES = 512 * 1024 ** 2
+POSTPROCESS_BLOCK = 2 ** 16  # samples per block of the volume envelope mix / int16 conversion
+# f0 depends only on the audio and the extraction settings, so re-runs with another transpose / index rate reuse it;
+# the disk side is set up from `Config` (`--f0_cache_dir`)
+f0_cache = ArrayCache(F0_CACHE_BYTES)
+# so do HuBERT features (per chunk), which also don't depend on the voice; the disk side is set up from `Config`
+feature_cache = ArrayCache(FEATURE_CACHE_BYTES)
 
 
-@lru_cache
-def cache_harvest_f0(input_audio_path, fs, f0max, f0min, frame_period):
-  audio = input_audio_path2wav[input_audio_path]
-  f0, t = pyworld.harvest(
-    audio,
-    fs=fs,
-    f0_ceil=f0max,
-    f0_floor=f0min,
-    frame_period=frame_period,
-  )
-  f0 = pyworld.stonemask(audio, f0, t, fs)
-  return f0
+# scipy.signal and the f0 libraries (parselmouth, pyworld, torchcrepe) are imported on first use, not with this module;
+# `model.voice_pool.VoicePool.preload` can pay for that (and model loading) in the background at startup
+
+
+@lru_cache(maxsize=None)
+def highpass_filter():
+  """(b, a) of the 48Hz high-pass applied to every input"""
+  from scipy import signal
+
+  return signal.butter(N=5, Wn=48, btype="high", fs=16000)
+
+
+def frame_rms(x, sr):
+  """`librosa.feature.rms(y=x, frame_length=sr // 2 * 2, hop_length=sr // 2)[0]` from sums of squares per hop
+
+  every centered frame spans exactly two hops, so a single pass over `x` (in float64, a block at a time) is enough
+  """
+  hop = sr // 2
+  block = hop * max(1, POSTPROCESS_BLOCK // hop)
+  sums = [np.zeros(1)]
+  for i in range(0, x.shape[0], block):
+    seg = np.square(x[i:i + block], dtype=np.float64)
+    sums.append(np.add.reduceat(seg, np.arange(0, seg.shape[0], hop)))
+  sums.append(np.zeros(1))
+  sums = np.concatenate(sums)
+  return np.sqrt((sums[:-1] + sums[1:])[:x.shape[0] // hop + 1] / (2 * hop))
 
 
 def change_rms(data1, sr1, data2, sr2, rate):  # 1是输入音频，2是输出音频,rate是2的占比
-  # print(data1.max(),data2.max())
-  rms1 = librosa.feature.rms(y=data1, frame_length=sr1 // 2 * 2, hop_length=sr1 // 2)
-  rms2 = librosa.feature.rms(y=data2, frame_length=sr2 // 2 * 2, hop_length=sr2 // 2)
-  rms1 = torch.from_numpy(rms1)
-  rms1 = F.interpolate(rms1.unsqueeze(0), size=data2.shape[0], mode="linear").squeeze()
-  rms2 = torch.from_numpy(rms2)
-  rms2 = F.interpolate(rms2.unsqueeze(0), size=data2.shape[0], mode="linear").squeeze()
-  rms2 = torch.max(rms2, torch.zeros_like(rms2) + 1e-6)
-  data2 *= (torch.pow(rms1, torch.tensor(1 - rate)) * torch.pow(rms2, torch.tensor(rate - 1))).numpy()
+  """scales `data2` in place by rms1 ** (1 - rate) * rms2 ** (rate - 1), both envelopes linearly interpolated to its
+  length (as `F.interpolate(mode="linear")` would), one block at a time from the frame-rate envelopes"""
+  rms1 = frame_rms(data1, sr1)
+  rms2 = frame_rms(data2, sr2)
+  n = data2.shape[0]
+  for i in range(0, n, POSTPROCESS_BLOCK):
+    t = np.arange(i, min(i + POSTPROCESS_BLOCK, n)) + 0.5
+    # source positions with align_corners=False; np.interp clamps at both ends just like it
+    gain = np.interp(t * (rms1.shape[0] / n) - 0.5, np.arange(rms1.shape[0]), rms1)
+    gain /= np.maximum(np.interp(t * (rms2.shape[0] / n) - 0.5, np.arange(rms2.shape[0]), rms2), 1e-6)
+    data2[i:i + POSTPROCESS_BLOCK] *= gain ** (1 - rate)
   return data2
 
 
+def find_split_points(audio, window, t_center, t_query):
+  """quietest split point near every multiple of `t_center`
+
+  for each t, picks the first argmin of |moving sum over `window` samples| within [t - t_query, t + t_query), where
+  the moving sum runs over the reflect-padded signal. the sums are built over just that query region, so nothing of
+  the signal's full length is allocated, by adding the `window` shifted slices in the original loop's order: a
+  cumulative sum would cancel away the tiny sums the high-pass leaves in digital silence. the split points are
+  identical to the original 160-shift loop's
+  """
+  half = window // 2
+  n = audio.shape[0]
+  opt_ts = []
+  for t in range(t_center, n, t_center):
+    lo, hi = t - t_query, min(t + t_query, n)
+    # padded[j:j + window] == audio[j - half:j - half + window], reflected at either end of the signal
+    start, end = lo - half, hi - half + window
+    seg = audio[max(start, 0):min(end, n)]
+    if start < 0 or end > n:
+      seg = np.pad(seg, (max(-start, 0), max(end - n, 0)), mode="reflect")
+    moving_sum = np.zeros(hi - lo, dtype=audio.dtype)
+    for i in range(window):
+      moving_sum += seg[i:i + hi - lo]
+    opt_ts.append(lo + int(np.argmin(np.abs(moving_sum))))
+  return opt_ts
+
+
+def group_chunks(lengths, max_samples):
+  """greedily groups consecutive chunks so that len(group) * max(chunk length) stays within `max_samples`"""
+  groups, group, longest = [], [], 0
+  for i, length in enumerate(lengths):
+    if group and (len(group) + 1) * max(longest, length) > max_samples:
+      groups.append(group)
+      group, longest = [], 0
+    group.append(i)
+    longest = max(longest, length)
+  if group:
+    groups.append(group)
+  return groups
+
+
 class VC(object):
   def __init__(self, tgt_sr, config):
     self.x_pad, self.x_query, self.x_center, self.x_max, self.is_half = (
@@ -67,24 +128,23 @@ class VC(object):
     self.t_center = self.sr * self.x_center  # 查询切点位置
     self.t_max = self.sr * self.x_max  # 免查询时长阈值
     self.device = config.device
-
-  def get_f0(
-          self,
-          input_audio_path,
-          x,
-          p_len,
-          f0_up_key,
-          f0_method,
-          filter_radius,
-          inp_f0=None,
-  ):
-    global input_audio_path2wav
+    self.n_cpu = config.n_cpu  # threads for the segments of harvest, see `model.world_f0`
+    self.backend = config.backend  # "onnx": RMVPE (and, via `load_synthesizer`, net_g) run in onnxruntime
+    self.index_nprobe, self.index_ef_search = config.index_nprobe, config.index_ef_search
+    self.index_device_rows = config.index_device_rows  # see `load_index`
+    if (config.feature_cache_dir or None) != feature_cache.cache_dir:
+      feature_cache.set_cache_dir(config.feature_cache_dir, max_disk_bytes=config.feature_cache_gb * 1024 ** 3)
+    if (config.f0_cache_dir or None) != f0_cache.cache_dir:
+      f0_cache.set_cache_dir(config.f0_cache_dir, max_disk_bytes=config.f0_cache_gb * 1024 ** 3)
+
+  def compute_f0(self, x, p_len, f0_method):
+    """raw f0 of `x` in Hz, before any filtering, transpose or f0-file replacement"""
     time_step = self.window / self.sr * 1000
     f0_min = 50
     f0_max = 1100
-    f0_mel_min = 1127 * np.log(1 + f0_min / 700)
-    f0_mel_max = 1127 * np.log(1 + f0_max / 700)
     if f0_method == "pm":
+      import parselmouth
+
       f0 = (
         parselmouth.Sound(x, self.sr)
         .to_pitch_ac(
@@ -99,11 +159,10 @@ class VC(object):
       if pad_size > 0 or p_len - len(f0) - pad_size > 0:
         f0 = np.pad(f0, [[pad_size, p_len - len(f0) - pad_size]], mode="constant")
     elif f0_method == "harvest":
-      input_audio_path2wav[input_audio_path] = x.astype(np.double)
-      f0 = cache_harvest_f0(input_audio_path, self.sr, f0_max, f0_min, 10)
-      if filter_radius > 2:
-        f0 = signal.medfilt(f0, 3)
+      f0 = segmented_f0(x.astype(np.double), self.sr, f0_min, f0_max, time_step, n_workers=self.n_cpu)
     elif f0_method == "crepe":
+      import torchcrepe
+
       model = "full"
       # Pick a batch size that doesn't cause memory errors on your gpu
       batch_size = 512
@@ -126,6 +185,8 @@ class VC(object):
       f0 = f0[0].cpu().numpy()
 
     elif f0_method in ['mangio', 'mangio-crepe']:
+      import torchcrepe
+
       # print("Performing crepe pitch extraction. (EXPERIMENTAL)")
       # print("CREPE PITCH EXTRACTION HOP LENGTH: " + str(crepe_hop_length))
       x = x.astype(np.float32)
@@ -167,31 +228,49 @@ class VC(object):
       )
       f0 = np.nan_to_num(target)
 
-    elif f0_method == 'fcpe':
-      _JUMP_SAFE_PAD = False
-      if not hasattr(self, "model_fcpe"):
-        from lib.model.fcpe.model import FCPEInfer
-        self.model_fcpe = FCPEInfer(model_path='pretrain/fcpe/fcpe.pt')
-      if _JUMP_SAFE_PAD:
-        raw_audio = audio
-      f0 = self.model_fcpe(audio=raw_audio, sr=self.sample_rate)
-      f0 = f0.transpose(1, 2)
-      if not _JUMP_SAFE_PAD:
-        f0 = torch.nn.functional.interpolate(f0, size=int(n_frames), mode='nearest')
-      f0 = f0.transpose(1, 2)
-      f0 = f0.squeeze().cpu().numpy()
-      if _JUMP_SAFE_PAD:
-        f0 = np.array(
-          [f0[int(min(int(np.round(n * self.hop_size / self.sample_rate / 0.01)), len(f0) - 1))] for n in range(n_frames - start_frame)])
-        f0 = np.pad(f0.astype('float'), (start_frame, n_frames - len(f0) - start_frame))
-
+    elif f0_method == "fcpe":
+      model_fcpe = get_fcpe_model(self.device)  # shared across voices
+      # frames are centered on multiples of `self.window`, like the other methods'; the one centered at the very end
+      # of `x` is dropped
+      f0 = model_fcpe.batch([x], self.sr)[0][:p_len]
 
     elif f0_method == "rmvpe":
-      if not hasattr(self, "model_rmvpe"):
-        from lib.model.rmvpe import RMVPE
-        print("loading rmvpe model")
-        self.model_rmvpe = RMVPE(RMVPE_FPATH, is_half=self.is_half, device=self.device)
-      f0 = self.model_rmvpe.infer_from_audio(x, thred=0.03)
+      model_rmvpe = get_rmvpe_model(self.device, self.is_half, backend=self.backend)  # shared across voices
+      # long inputs go through rmvpe in windows of `t_center` so its memory stays bounded like the synthesis chunks
+      window = self.t_center // self.window if x.shape[0] > self.t_max else 0
+      f0 = model_rmvpe.infer_from_audio(x, thred=0.03, window=window, overlap=256)
+    return f0
+
+  def get_f0(
+          self,
+          input_audio_path,
+          x,
+          p_len,
+          f0_up_key,
+          f0_method,
+          filter_radius,
+          inp_f0=None,
+          cache=True,
+  ):
+    """`cache=False` neither reads nor fills `f0_cache`, for audio that won't come again (e.g. streaming blocks)"""
+    f0_min = 50
+    f0_max = 1100
+    f0_mel_min = 1127 * np.log(1 + f0_min / 700)
+    f0_mel_max = 1127 * np.log(1 + f0_max / 700)
+    with span("f0", method=f0_method, samples=x.shape[0]) as attrs:
+      if cache:
+        key = hash_array(x, f0_method, p_len, self.sr, self.window, self.is_half, self.backend)
+        f0 = f0_cache.get(key)
+        attrs["cached"] = f0 is not None
+        if f0 is None:
+          f0 = f0_cache.put(key, self.compute_f0(x, p_len, f0_method))
+      else:
+        f0 = self.compute_f0(x, p_len, f0_method)
+    f0 = f0.copy()
+    if f0_method == "harvest" and filter_radius > 2:
+      from scipy import signal
+
+      f0 = signal.medfilt(f0, 3)
 
     f0 *= pow(2, f0_up_key / 12)
     # with open("test.txt","w")as f:f.write("\n".join([str(i)for i in f0.tolist()]))
@@ -242,29 +321,18 @@ class VC(object):
       "output_layer": 9 if version == "v1" else 12,
     }
 
+    def extract(audios):
+      with torch.no_grad():
+        logits = model.extract_features(**inputs)
+        return [model.final_proj(logits[0])[0] if version == "v1" else logits[0][0]]
+
     t0 = ttime()
-    with torch.no_grad():
-      logits = model.extract_features(**inputs)
-      feats = model.final_proj(logits[0]) if version == "v1" else logits[0]
+    feats = self.extract_features_cached(model, [audio0], version, extract)[0].unsqueeze(0)
 
     if protect < 0.5 and pitch != None and pitchf != None:
       feats0 = feats.clone()
     if isinstance(index, type(None)) == False and isinstance(big_npy, type(None)) == False and index_rate != 0:
-      npy = feats[0].cpu().numpy()
-      if self.is_half:
-        npy = npy.astype("float32")
-
-      # _, I = index.search(npy, 1)
-      # npy = big_npy[I.squeeze()]
-
-      score, ix = index.search(npy, k=8)
-      weight = np.square(1 / score)
-      weight /= weight.sum(axis=1, keepdims=True)
-      npy = np.sum(big_npy[ix] * np.expand_dims(weight, axis=2), axis=1)
-
-      if self.is_half:
-        npy = npy.astype("float16")
-      feats = torch.from_numpy(npy).unsqueeze(0).to(self.device) * index_rate + (1-index_rate) * feats
+      feats = self.blend_index(feats[0], index, big_npy, index_rate).unsqueeze(0)
 
     feats = F.interpolate(feats.permute(0, 2, 1), scale_factor=2).permute(0, 2, 1)
     if protect < 0.5 and pitch != None and pitchf != None:
@@ -287,7 +355,7 @@ class VC(object):
       feats = feats.to(feats0.dtype)
 
     p_len = torch.tensor([p_len], device=self.device).long()
-    with torch.no_grad():
+    with torch.no_grad(), span("synthesis", batch=1, frames=feats.shape[1]):
       if pitch != None and pitchf != None:
         audio1 = (net_g.infer(feats, p_len, pitch, pitchf, sid)[0][0,0]).data.cpu().float().numpy()
       else:
@@ -301,28 +369,172 @@ class VC(object):
     times[2] += t2 - t1
     return audio1
 
-  def pipeline(
+  def blend_index(self, feats, index, big_npy, index_rate):
+    """blends (N, C) content features with their top-8 neighbours from the retrieval index"""
+    with span("retrieval", frames=feats.shape[0], backend="torch" if isinstance(index, TorchRetrieval) else "faiss"):
+      if isinstance(index, TorchRetrieval):
+        return index.blend(feats, index_rate)
+
+      npy = feats.cpu().numpy()
+      if self.is_half:
+        npy = npy.astype("float32")
+
+      # _, I = index.search(npy, 1)
+      # npy = big_npy[I.squeeze()]
+
+      score, ix = index.search(npy, k=8)
+      weight = np.square(1 / score)
+      weight /= weight.sum(axis=1, keepdims=True)
+      npy = blend_neighbours(big_npy, ix, weight)
+
+      if self.is_half:
+        npy = npy.astype("float16")
+      return torch.from_numpy(npy).to(self.device) * index_rate + (1-index_rate) * feats
+
+  def feature_key(self, model, audio0, version):
+    """`feature_cache` key of a chunk: its content (so also its boundaries in the source), the HuBERT model and output
+    layer, and the precision / device; None for models without a `feature_cache_id` (see `model.loaders`)
+    """
+    model_id = getattr(model, "feature_cache_id", None)
+    if model_id is None:
+      return None
+    return hash_array(audio0, model_id, version, str(self.device), self.is_half)
+
+  def extract_features_cached(self, model, audios, version, extract_fn):
+    """(T, C) content features per chunk, from `feature_cache` where possible; `extract_fn(audios)` computes the
+    missing ones as a list of (T, C) tensors
+    """
+    keys = [self.feature_key(model, audio0, version) for audio0 in audios]
+    feats = [None if key is None else feature_cache.get(key) for key in keys]
+    feats = [None if x is None else torch.from_numpy(np.array(x)).to(self.device) for x in feats]
+    missing = [i for i, x in enumerate(feats) if x is None]
+    if missing:
+      with span("hubert", chunks=len(missing), samples=sum(audios[i].shape[0] for i in missing)):
+        extracted = extract_fn([audios[i] for i in missing])
+      for i, x in zip(missing, extracted):
+        feats[i] = x
+        if keys[i] is not None:
+          feature_cache.put(keys[i], x.cpu().numpy())
+    return feats
+
+  def extract_features_batch(self, model, audios, version):
+    """runs HuBERT over several chunks at once, returning zero-padded (B, T, C) features and valid lengths
+
+    the conv feature extractor is run per chunk since its first GroupNorm normalizes over the whole time axis and
+    would otherwise see the padding; the transformer then runs on the padded batch with a proper padding mask.
+    this follows the body of fairseq `HubertModel.forward(features_only=True)`
+    """
+    dtype = torch.float16 if self.is_half else torch.float32
+    features = []
+    for audio0 in audios:
+      source = torch.from_numpy(audio0).to(dtype)
+      if source.dim() == 2:  # double channels
+        source = source.mean(-1)
+      source = source.view(1, -1).to(self.device)
+      features.append(model.forward_features(source).transpose(1, 2)[0])
+    lengths = [x.shape[0] for x in features]
+    features = torch.nn.utils.rnn.pad_sequence(features, batch_first=True)
+    padding_mask = torch.arange(features.shape[1], device=self.device)[None] >= torch.tensor(lengths, device=self.device)[:, None]
+
+    features = model.layer_norm(features)
+    if model.post_extract_proj is not None:
+      features = model.post_extract_proj(features)
+    features = model.dropout_input(features)
+    feats, _ = model.encoder(features, padding_mask=padding_mask, layer=(9 if version == "v1" else 12) - 1)
+    if version == "v1":
+      feats = model.final_proj(feats)
+    return feats, lengths
+
+  def vc_batch(
           self,
           model,
           net_g,
           sid,
-          audio,
-          input_audio_path,
+          audios,
+          pitches,
+          pitchfs,
           times,
-          f0_up_key,
-          f0_method,
-          file_index,
-          # file_big_npy,
+          index,
+          big_npy,
           index_rate,
-          if_f0,
-          filter_radius,
-          tgt_sr,
-          resample_sr,
-          rms_mix_rate,
           version,
           protect,
-          f0_file=None,
   ):
+    """batched `vc` over several chunks, padded to a common length and trimmed back afterwards
+
+    every stage is masked per chunk, so results match the sequential path (up to the random noise drawn inside
+    `net_g.infer`); the unmasked decoder convs only touch the last few frames of each chunk, which fall inside the
+    `t_pad_tgt` region that the caller trims anyway
+    """
+    if len(audios) == 1:
+      return [self.vc(model, net_g, sid, audios[0], pitches[0], pitchfs[0], times, index, big_npy, index_rate, version, protect)]
+
+    def extract(audios):
+      with torch.no_grad():
+        feats, lengths = self.extract_features_batch(model, audios, version)
+      return [x[:length] for x, length in zip(feats, lengths)]
+
+    use_pitch = pitches[0] is not None and pitchfs[0] is not None
+    t0 = ttime()
+    feats = self.extract_features_cached(model, audios, version, extract)
+    lengths = [x.shape[0] for x in feats]
+    feats = torch.nn.utils.rnn.pad_sequence(feats, batch_first=True)
+
+    if protect < 0.5 and use_pitch:
+      feats0 = feats.clone()
+    if isinstance(index, type(None)) == False and isinstance(big_npy, type(None)) == False and index_rate != 0:
+      # one search over the valid frames of every chunk
+      valid = torch.cat([feats[i, :length] for i, length in enumerate(lengths)])
+      valid = self.blend_index(valid, index, big_npy, index_rate)
+      for i, chunk_feats in enumerate(torch.split(valid, lengths)):
+        feats[i, :lengths[i]] = chunk_feats
+
+    feats = F.interpolate(feats.permute(0, 2, 1), scale_factor=2).permute(0, 2, 1)
+    if protect < 0.5 and use_pitch:
+      feats0 = F.interpolate(feats0.permute(0, 2, 1), scale_factor=2).permute(0, 2, 1)
+
+    t1 = ttime()
+    p_lens = [min(audio0.shape[0] // self.window, 2 * length) for audio0, length in zip(audios, lengths)]
+    if use_pitch:
+      pitch = torch.zeros(len(audios), feats.shape[1], dtype=pitches[0].dtype, device=self.device)
+      pitchf = torch.zeros(len(audios), feats.shape[1], dtype=pitchfs[0].dtype, device=self.device)
+      for i, p_len in enumerate(p_lens):
+        pitch[i, :p_len] = pitches[i][0, :p_len]
+        pitchf[i, :p_len] = pitchfs[i][0, :p_len]
+
+    if protect < 0.5 and use_pitch:
+      pitchff = pitchf.clone()
+      pitchff[pitchf > 0] = 1
+      pitchff[pitchf < 1] = protect
+      pitchff = pitchff.unsqueeze(-1)
+      feats = feats * pitchff + feats0 * (1 - pitchff)
+      feats = feats.to(feats0.dtype)
+
+    p_len = torch.tensor(p_lens, device=self.device).long()
+    sid = sid.expand(len(audios))
+    with torch.no_grad(), span("synthesis", batch=len(audios), frames=feats.shape[1]):
+      if use_pitch:
+        audio1 = net_g.infer(feats, p_len, pitch, pitchf, sid)[0][:, 0]
+      else:
+        audio1 = net_g.infer(feats, p_len, sid)[0][:, 0]
+    upp = audio1.shape[-1] // feats.shape[1]
+    audio1 = audio1.data.cpu().float().numpy()
+    audio1 = [audio1[i, :2 * length * upp] for i, length in enumerate(lengths)]
+
+    del feats, p_len
+    if torch.cuda.is_available():
+      torch.cuda.empty_cache()
+    t2 = ttime()
+    times[0] += t1 - t0
+    times[2] += t2 - t1
+    return audio1
+
+  def load_index(self, file_index, index_rate):
+    """returns the shared (index, big_npy) for `file_index`, or (None, None) if retrieval is off or loading fails
+
+    on GPUs, uncompressed indexes of at most `index_device_rows` rows come back as a `TorchRetrieval` in place of the
+    faiss index, so `blend_index` stays on the device
+    """
     if (
             file_index != ""
             # and file_big_npy != ""
@@ -331,35 +543,46 @@ class VC(object):
             and index_rate != 0
     ):
       try:
-        index = faiss.read_index(file_index)
         # big_npy = np.load(file_big_npy)
-        big_npy = index.reconstruct_n(0, index.ntotal)
+        with span("load_index"):
+          index, big_npy = index_registry.get(file_index, nprobe=self.index_nprobe, ef_search=self.index_ef_search)
+          if (
+                  str(self.device).split(":")[0] in TORCH_RETRIEVAL_DEVICES
+                  and not isinstance(big_npy, IndexVectors)
+                  and big_npy.shape[0] <= self.index_device_rows
+          ):
+            return index_registry.get_torch(file_index, self.device)
+          return index, big_npy
       except:
         traceback.print_exc()
-        index = big_npy = None
-    else:
-      index = big_npy = None
-    audio = signal.filtfilt(bh, ah, audio)
-    audio_pad = np.pad(audio, (self.window // 2, self.window // 2), mode="reflect")
+    return None, None
+
+  def split_audio(self, audio):
+    """high-passes `audio` and cuts it at quiet points
+
+    returns (audio, audio_pad, segments), where each segment is an (audio_pad slice, pitch slice) pair
+    """
+    from scipy import signal
+
+    with span("highpass", samples=audio.shape[0]):
+      audio = signal.filtfilt(*highpass_filter(), audio)
     opt_ts = []
-    if audio_pad.shape[0] > self.t_max:
-      audio_sum = np.zeros_like(audio)
-      for i in range(self.window):
-        audio_sum += audio_pad[i : i - self.window]
-      for t in range(self.t_center, audio.shape[0], self.t_center):
-        opt_ts.append(
-          t
-          - self.t_query
-          + np.where(
-            np.abs(audio_sum[t - self.t_query : t + self.t_query])
-            == np.abs(audio_sum[t - self.t_query : t + self.t_query]).min()
-          )[0][0]
-        )
+    if audio.shape[0] + self.window // 2 * 2 > self.t_max:  # length of the reflect-padded signal
+      with span("split_search", samples=audio.shape[0]):
+        opt_ts = find_split_points(audio, self.window, self.t_center, self.t_query)
+    audio_pad = np.pad(audio, (self.t_pad, self.t_pad), mode="reflect")
     s = 0
-    audio_opt = []
     t = None
-    t1 = ttime()
-    audio_pad = np.pad(audio, (self.t_pad, self.t_pad), mode="reflect")
+    segments = []
+    for t in opt_ts:
+      t = t // self.window * self.window
+      segments.append((slice(s, t + self.t_pad2 + self.window), slice(s // self.window, (t + self.t_pad2) // self.window)))
+      s = t
+    segments.append((slice(t, None), slice(t // self.window if t is not None else None, None)))
+    return audio, audio_pad, segments
+
+  def get_pitch(self, input_audio_path, audio_pad, f0_up_key, f0_method, filter_radius, f0_file=None):
+    """(pitch, pitchf) numpy arrays over the frames of `audio_pad`, with an optional f0 curve file applied"""
     p_len = audio_pad.shape[0] // self.window
     inp_f0 = None
     if hasattr(f0_file, "name") == True:
@@ -372,113 +595,128 @@ class VC(object):
         inp_f0 = np.array(inp_f0, dtype="float32")
       except:
         traceback.print_exc()
-    sid = torch.tensor(sid, device=self.device).unsqueeze(0).long()
-    pitch, pitchf = None, None
-    if if_f0 == 1:
-      pitch, pitchf = self.get_f0(
-        input_audio_path,
-        audio_pad,
-        p_len,
-        f0_up_key,
-        f0_method,
-        filter_radius,
-        inp_f0,
-      )
-      pitch = pitch[:p_len]
-      pitchf = pitchf[:p_len]
-      if self.device == "mps":
-        pitchf = pitchf.astype(np.float32)
-      pitch = torch.tensor(pitch, device=self.device).unsqueeze(0).long()
-      pitchf = torch.tensor(pitchf, device=self.device).unsqueeze(0).float()
-    t2 = ttime()
-    times[1] += t2 - t1
-    for t in opt_ts:
-      t = t // self.window * self.window
-      if if_f0 == 1:
-        audio_opt.append(
-          self.vc(
-            model,
-            net_g,
-            sid,
-            audio_pad[s : t + self.t_pad2 + self.window],
-            pitch[:,s//self.window:(t+self.t_pad2)//self.window],
-            pitchf[:,s//self.window:(t+self.t_pad2)//self.window],
-            times,
-            index,
-            big_npy,
-            index_rate,
-            version,
-            protect,
-          )[self.t_pad_tgt:-self.t_pad_tgt]
-        )
-      else:
-        audio_opt.append(
-          self.vc(
-            model,
-            net_g,
-            sid,
-            audio_pad[s:t+self.t_pad2+self.window],
-            None,
-            None,
-            times,
-            index,
-            big_npy,
-            index_rate,
-            version,
-            protect,
-          )[self.t_pad_tgt : -self.t_pad_tgt]
-        )
-      s = t
-    if if_f0 == 1:
-      audio_opt.append(
-        self.vc(
+    pitch, pitchf = self.get_f0(
+      input_audio_path,
+      audio_pad,
+      p_len,
+      f0_up_key,
+      f0_method,
+      filter_radius,
+      inp_f0,
+    )
+    return pitch[:p_len], pitchf[:p_len]
+
+  def pitch_to_tensors(self, pitch, pitchf):
+    if self.device == "mps":
+      pitchf = pitchf.astype(np.float32)
+    pitch = torch.tensor(pitch, device=self.device).unsqueeze(0).long()
+    pitchf = torch.tensor(pitchf, device=self.device).unsqueeze(0).float()
+    return pitch, pitchf
+
+  def convert_segments(
+          self,
           model,
           net_g,
           sid,
-          audio_pad[t:],
-          pitch[:,t//self.window:] if t is not None else pitch,
-          pitchf[:,t//self.window:] if t is not None else pitchf,
+          audio_pad,
+          pitch,
+          pitchf,
+          segments,
           times,
           index,
           big_npy,
           index_rate,
           version,
           protect,
-        )[self.t_pad_tgt:-self.t_pad_tgt]
-      )
+          max_batch_samples=0,
+  ):
+    """runs `vc_batch` over the segments of `split_audio`; returns the outputs with their `t_pad_tgt` trimmed"""
+    if max_batch_samples > 0:
+      groups = group_chunks([audio_pad[a].shape[0] for a, _ in segments], max_batch_samples)
     else:
-      audio_opt.append(
-        self.vc(
-          model,
-          net_g,
-          sid,
-          audio_pad[t:],
-          None,
-          None,
-          times,
-          index,
-          big_npy,
-          index_rate,
-          version,
-          protect,
-        )[self.t_pad_tgt:-self.t_pad_tgt]
-      )
+      groups = [[i] for i in range(len(segments))]
+    audio_opt = []
+    for group in groups:
+      audios = [audio_pad[segments[i][0]] for i in group]
+      if pitch is not None:
+        pitches = [pitch[:, segments[i][1]] for i in group]
+        pitchfs = [pitchf[:, segments[i][1]] for i in group]
+      else:
+        pitches = pitchfs = [None] * len(group)
+      outs = self.vc_batch(model, net_g, sid, audios, pitches, pitchfs, times, index, big_npy, index_rate, version, protect)
+      audio_opt.extend(out[self.t_pad_tgt:-self.t_pad_tgt] for out in outs)
+    return audio_opt
+
+  def postprocess(self, audio, audio_opt, tgt_sr, resample_sr, rms_mix_rate):
+    """joins the converted segments, applies the volume envelope mix and resampling, and converts to int16
 
+    each step runs block by block, so besides the joined output, the resampled one (if resampling) and the int16
+    result, nothing of full length gets allocated
+    """
     audio_opt = np.concatenate(audio_opt)
     if rms_mix_rate != 1:
-      audio_opt = change_rms(audio, 16000, audio_opt, tgt_sr, rms_mix_rate)
+      with span("rms_mix", samples=audio_opt.shape[0]):
+        change_rms(audio, 16000, audio_opt, tgt_sr, rms_mix_rate)
 
     if resample_sr >= 16000 and tgt_sr != resample_sr:
-      audio_opt = librosa.resample(audio_opt, orig_sr=tgt_sr, target_sr=resample_sr)
+      with span("resample", samples=audio_opt.shape[0], orig_sr=tgt_sr, target_sr=resample_sr):
+        audio_opt = resample(audio_opt, tgt_sr, resample_sr)
 
-    audio_max = np.abs(audio_opt).max() / 0.99
-    max_int16 = 32768
-    if audio_max > 1:
-      max_int16 /= audio_max
+    with span("quantize", samples=audio_opt.shape[0]):
+      blocks = [slice(i, i + POSTPROCESS_BLOCK) for i in range(0, audio_opt.shape[0], POSTPROCESS_BLOCK)]
+      audio_max = max(np.abs(audio_opt[block]).max() for block in blocks) / 0.99
+      max_int16 = 32768
+      if audio_max > 1:
+        max_int16 /= audio_max
 
-    audio_opt = (audio_opt * max_int16).astype(np.int16)
-    del pitch, pitchf, sid
+      out = np.empty(audio_opt.shape, dtype=np.int16)
+      for block in blocks:
+        out[block] = audio_opt[block] * max_int16
+    return out
 
-    if torch.cuda.is_available():
-      torch.cuda.empty_cache()
-    return audio_opt
+  def pipeline(
+          self,
+          model,
+          net_g,
+          sid,
+          audio,
+          input_audio_path,
+          times,
+          f0_up_key,
+          f0_method,
+          file_index,
+          # file_big_npy,
+          index_rate,
+          if_f0,
+          filter_radius,
+          tgt_sr,
+          resample_sr,
+          rms_mix_rate,
+          version,
+          protect,
+          f0_file=None,
+          max_batch_samples=0,
+          tracer=None,
+  ):
+    """`max_batch_samples` > 0 runs the chunks in padded batches of at most that many (padded) 16k samples; the stages
+    are recorded into `tracer` (a `utils.tracing.Tracer`) if given, besides the totals in `times`"""
+    with activate(tracer), span("pipeline", samples=audio.shape[0], f0_method=f0_method if if_f0 == 1 else None):
+      index, big_npy = self.load_index(file_index, index_rate)
+      audio, audio_pad, segments = self.split_audio(audio)
+      t1 = ttime()
+      sid = torch.tensor(sid, device=self.device).unsqueeze(0).long()
+      pitch, pitchf = None, None
+      if if_f0 == 1:
+        pitch, pitchf = self.pitch_to_tensors(
+          *self.get_pitch(input_audio_path, audio_pad, f0_up_key, f0_method, filter_radius, f0_file))
+      t2 = ttime()
+      times[1] += t2 - t1
+      audio_opt = self.convert_segments(
+        model, net_g, sid, audio_pad, pitch, pitchf, segments, times, index, big_npy, index_rate, version, protect,
+        max_batch_samples=max_batch_samples)
+      audio_opt = self.postprocess(audio, audio_opt, tgt_sr, resample_sr, rms_mix_rate)
+      del pitch, pitchf, sid
+
+      if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+      return audio_opt
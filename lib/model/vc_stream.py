@@ -0,0 +1,206 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 12:40 AM
+"""block-wise real-time voice conversion on top of `SynthesizerTrnMs768NSFsid.infer(rate=...)`
+
+follows the layout of RVC's realtime GUI: a rolling 16k context buffer is shifted by one block per call, HuBERT runs
+over the bounded context, f0 is only computed for the newest block (plus a little context) and rolled into a cache,
+and the synthesizer only decodes the tail of `z_p`. consecutive outputs are aligned with SOLA and crossfaded
+"""
+import logging
+from time import perf_counter
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from model.onnx_backend import OnnxSynthesizer
+from model.vc_infer_pipeline import VC
+
+logger = logging.getLogger(__name__)
+
+STREAM_F0_METHODS = ["pm", "crepe", "rmvpe"]
+
+
+class StreamVC(object):
+  def __init__(
+          self,
+          hubert_model,
+          net_g,
+          tgt_sr,
+          config,
+          sid=0,
+          f0_up_key=0,
+          f0_method="rmvpe",
+          block_time=0.25,
+          crossfade_time=0.05,
+          extra_time=2.0,
+          index=None,
+          big_npy=None,
+          index_rate=0.,
+          version="v2",
+  ):
+    assert f0_method in STREAM_F0_METHODS, f"f0 method `{f0_method}` not supported for streaming"
+    if isinstance(net_g, OnnxSynthesizer):
+      # `synthesize` decodes only the tail of `z_p` (`rate`) and keeps the audio unclipped, which the export can't
+      raise ValueError(f"streaming needs a torch synthesizer; got the onnx export {net_g.fpath}")
+    self.hubert_model = hubert_model
+    self.net_g = net_g
+    self.tgt_sr = tgt_sr
+    self.vc = VC(tgt_sr, config)
+    self.device = config.device
+    self.is_half = config.is_half
+    self.sid = torch.tensor([sid], device=self.device).long()
+    self.f0_up_key = f0_up_key
+    self.f0_method = f0_method
+    self.index = index
+    self.big_npy = big_npy
+    self.index_rate = index_rate
+    self.version = version
+
+    # all lengths are multiples of the 10ms hop, in 16k samples
+    self.window = 160
+    self.block_frame = int(np.round(block_time * 16000 / self.window)) * self.window
+    self.crossfade_frame = int(np.round(crossfade_time * 16000 / self.window)) * self.window
+    self.sola_search_frame = self.window
+    self.extra_frame = int(np.round(extra_time * 16000 / self.window)) * self.window
+    self.f0_extractor_frame = self.block_frame + 800
+    self.input_wav = np.zeros(
+      self.extra_frame + self.crossfade_frame + self.sola_search_frame + self.block_frame, dtype=np.float32)
+
+    n_frames = self.input_wav.shape[0] // self.window
+    self.cache_pitch = np.ones(n_frames, dtype=np.int64)
+    self.cache_pitchf = np.zeros(n_frames, dtype=np.float32)
+
+    # same lengths at the target rate
+    zc = tgt_sr // 100
+    self.block_tgt = self.block_frame // self.window * zc
+    self.crossfade_tgt = self.crossfade_frame // self.window * zc
+    self.sola_search_tgt = self.sola_search_frame // self.window * zc
+    self.return_frame = (self.block_frame + self.crossfade_frame + self.sola_search_frame) // self.window
+    self.sola_buffer = torch.zeros(self.crossfade_tgt, device=self.device)
+    self.fade_in_window = torch.sin(0.5 * np.pi * torch.linspace(0., 1., self.crossfade_tgt, device=self.device)) ** 2
+    self.fade_out_window = 1 - self.fade_in_window
+
+    self.timings = []
+
+  @property
+  def latency(self):
+    """algorithmic latency in seconds (block + crossfade + SOLA search), excluding compute time"""
+    return (self.block_frame + self.crossfade_frame + self.sola_search_frame) / 16000
+
+  def sync(self):
+    if str(self.device).startswith("cuda"):
+      torch.cuda.synchronize()
+
+  def extract_features(self):
+    feats = torch.from_numpy(self.input_wav)
+    feats = feats.half() if self.is_half else feats.float()
+    feats = feats.view(1, -1).to(self.device)
+    padding_mask = torch.BoolTensor(feats.shape).to(self.device).fill_(False)
+    logits = self.hubert_model.extract_features(
+      source=feats, padding_mask=padding_mask, output_layer=9 if self.version == "v1" else 12)
+    feats = self.hubert_model.final_proj(logits[0]) if self.version == "v1" else logits[0]
+
+    if self.index is not None and self.big_npy is not None and self.index_rate != 0:
+      feats = self.vc.blend_index(feats[0], self.index, self.big_npy, self.index_rate).unsqueeze(0)
+
+    feats = F.interpolate(feats.permute(0, 2, 1), scale_factor=2).permute(0, 2, 1)
+    p_len = self.input_wav.shape[0] // self.window
+    if feats.shape[1] < p_len:
+      feats = torch.cat([feats, feats[:, -1:].expand(-1, p_len - feats.shape[1], -1)], 1)
+    return feats[:, :p_len]
+
+  def update_f0(self):
+    """computes f0 for the newest block only and rolls it into the pitch caches"""
+    tail = self.input_wav[-self.f0_extractor_frame:].copy()
+    # every block's audio is new, so it would only crowd other requests' f0 out of `f0_cache`
+    pitch, pitchf = self.vc.get_f0(
+      None, tail, self.f0_extractor_frame // self.window + 1, self.f0_up_key, self.f0_method, 3, cache=False)
+    shift = self.block_frame // self.window
+    self.cache_pitch[:-shift] = self.cache_pitch[shift:]
+    self.cache_pitchf[:-shift] = self.cache_pitchf[shift:]
+    # the first and last f0 frames only see reflect padding
+    self.cache_pitch[4 - pitch.shape[0]:] = pitch[3:-1]
+    self.cache_pitchf[4 - pitchf.shape[0]:] = pitchf[3:-1]
+
+  def synthesize(self, feats):
+    p_len = feats.shape[1]
+    # decode only the tail; +.5 keeps int(p_len * rate) from flooring below `return_frame`
+    rate = (self.return_frame + 0.5) / p_len
+    pitch = torch.from_numpy(self.cache_pitch).to(self.device).unsqueeze(0)
+    pitchf = torch.from_numpy(self.cache_pitchf).to(self.device).unsqueeze(0)
+    p_len = torch.tensor([p_len], device=self.device).long()
+    infer_wav = self.net_g.infer(feats, p_len, pitch, pitchf, self.sid, rate=rate, clip_audio=False)[0][0, 0]
+    return infer_wav.float()
+
+  def crossfade(self, infer_wav):
+    """SOLA: aligns the new output with the previous tail at the point of maximum normalized correlation"""
+    conv_input = infer_wav[None, None, :self.crossfade_tgt + self.sola_search_tgt]
+    cor_nom = F.conv1d(conv_input, self.sola_buffer[None, None, :])
+    cor_den = torch.sqrt(
+      F.conv1d(conv_input ** 2, torch.ones(1, 1, self.crossfade_tgt, device=self.device)) + 1e-8)
+    sola_offset = int(torch.argmax(cor_nom[0, 0] / cor_den[0, 0]))
+
+    infer_wav = infer_wav[sola_offset:]
+    infer_wav[:self.crossfade_tgt] *= self.fade_in_window
+    infer_wav[:self.crossfade_tgt] += self.sola_buffer * self.fade_out_window
+    self.sola_buffer[:] = infer_wav[self.block_tgt:self.block_tgt + self.crossfade_tgt]
+    return infer_wav[:self.block_tgt]
+
+  def process(self, block):
+    """converts one 16k block of `block_frame` samples; returns `block_tgt` samples at `tgt_sr`"""
+    assert block.shape[0] == self.block_frame, (block.shape[0], self.block_frame)
+    t0 = perf_counter()
+    self.input_wav[:-self.block_frame] = self.input_wav[self.block_frame:]
+    self.input_wav[-self.block_frame:] = block
+
+    with torch.no_grad():
+      feats = self.extract_features()
+      self.sync()
+      t1 = perf_counter()
+      self.update_f0()
+      t2 = perf_counter()
+      infer_wav = self.synthesize(feats)
+      self.sync()
+      t3 = perf_counter()
+      out = self.crossfade(infer_wav).cpu().numpy()
+    t4 = perf_counter()
+
+    block_time = self.block_frame / 16000
+    self.timings.append({
+      "hubert": t1 - t0,
+      "f0": t2 - t1,
+      "synth": t3 - t2,
+      "sola": t4 - t3,
+      "total": t4 - t0,
+      "rtf": (t4 - t0) / block_time,
+    })
+    return out
+
+  def reset(self):
+    self.input_wav[:] = 0
+    self.cache_pitch[:] = 1
+    self.cache_pitchf[:] = 0
+    self.sola_buffer[:] = 0
+    self.timings = []
+
+  def stats(self):
+    """aggregates per-block timings; keeps up with real time when `max_rtf` stays below 1"""
+    if not self.timings:
+      return {}
+    totals = np.array([t["total"] for t in self.timings])
+    rtfs = np.array([t["rtf"] for t in self.timings])
+    out = {
+      "blocks": len(self.timings),
+      "block_time": self.block_frame / 16000,
+      "latency": self.latency,
+      "mean_total": float(totals.mean()),
+      "p95_total": float(np.percentile(totals, 95)),
+      "mean_rtf": float(rtfs.mean()),
+      "max_rtf": float(rtfs.max()),
+    }
+    for key in ["hubert", "f0", "synth", "sola"]:
+      out[f"mean_{key}"] = float(np.mean([t[key] for t in self.timings]))
+    return out
@@ -0,0 +1,157 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 4:30 AM
+import logging
+import os
+import threading
+from time import perf_counter
+
+import numpy as np
+import torch
+
+from model.loaders import get_fcpe_model, get_hubert_model, get_rmvpe_model, load_synthesizer, release_shared_models
+from model.vc_infer_pipeline import VC, highpass_filter
+from utils.bundle import get_mtime
+from utils.cache_utils import LRUCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VOICE_POOL_BYTES = 4 * 1024 ** 3
+WARMUP_SECONDS = 2.
+
+
+def module_nbytes(module):
+  if not isinstance(module, torch.nn.Module):  # e.g. `OnnxSynthesizer`
+    return module.nbytes
+  return sum(t.numel() * t.element_size() for t in list(module.parameters()) + list(module.buffers()))
+
+
+class Voice(object):
+  """a loaded voice: synthesizer (without `enc_q`), its checkpoint metadata and a `VC` pipeline for its sample rate"""
+  def __init__(self, fpath, net_g, cpt, config):
+    self.fpath = fpath
+    self.net_g = net_g
+    self.cpt = {k: v for k, v in cpt.items() if k != "weight"}  # weights already live in `net_g`
+    self.tgt_sr = cpt["config"][-2]
+    self.n_spk = cpt["config"][-4]
+    self.if_f0 = cpt.get("f0", 1)
+    self.version = cpt.get("version", "v2")
+    self.vc = VC(self.tgt_sr, config)
+    self.nbytes = module_nbytes(net_g)
+
+
+class VoicePool(object):
+  """keeps loaded voices resident under a memory budget, evicting the least recently used ones
+
+  voices are `.pth` checkpoints or bundles (see `utils.bundle`), keyed by (abspath, mtime) like `IndexRegistry`.
+  different voices load concurrently, while concurrent requests for the same voice wait for a single load. evicting a
+  voice only drops the pool's reference, so requests still holding it finish normally. HuBERT and RMVPE are shared by
+  all voices (see `model.loaders`)
+  """
+  def __init__(self, config, max_bytes=DEFAULT_VOICE_POOL_BYTES, max_voices=None):
+    self.config = config
+    self.cache = LRUCache(max_bytes)
+    self.max_voices = max_voices
+    self.load_locks = {}
+    self.lock = threading.Lock()
+
+  @property
+  def hubert_model(self):
+    return get_hubert_model(self.config.device, self.config.is_half, quantize="hubert" in self.config.quantize)
+
+  @staticmethod
+  def make_key(fpath):
+    fpath = os.path.abspath(fpath)
+    return fpath, get_mtime(fpath)
+
+  def get(self, fpath):
+    key = self.make_key(fpath)
+    voice = self.cache.get(key)
+    if voice is not None:
+      return voice
+
+    with self.lock:
+      load_lock = self.load_locks.setdefault(key[0], threading.Lock())
+    with load_lock:
+      # another thread may have loaded it while we were waiting
+      if key in self.cache:
+        return self.cache.get(key)
+
+      for old_key in self.cache.keys():
+        if old_key[0] == key[0]:
+          self.cache.pop(old_key)
+
+      net_g, cpt = load_synthesizer(key[0], self.config.device, self.config.is_half, backend=self.config.backend,
+                                    quantize="synth" in self.config.quantize)
+      voice = Voice(key[0], net_g, cpt, self.config)
+      evictions = self.cache.evictions
+      self.cache.put(key, voice, voice.nbytes)
+      if self.max_voices is not None:
+        with self.cache.lock:
+          while len(self.cache) > self.max_voices:
+            self.cache.pop(self.cache.keys()[0])
+            self.cache.evictions += 1
+      logger.info("loaded voice %s (%.1fMB, %d resident)", key[0], voice.nbytes / 1024 ** 2, len(self.cache))
+      if self.cache.evictions > evictions:
+        self.empty_cache()
+      return voice
+
+  def warmup(self, voice_fpath=None, f0_method="rmvpe"):
+    """loads HuBERT and the f0 model (RMVPE, or FCPE for `f0_method="fcpe"`) with the libraries they and the pipeline
+    import lazily, then runs a short conversion with the voice at `voice_fpath` if given, so the first request pays for
+    none of it"""
+    t0 = perf_counter()
+    import faiss  # noqa: F401, for the first retrieval
+
+    highpass_filter()  # scipy.signal
+    hubert_model = self.hubert_model
+    if f0_method == "fcpe":
+      get_fcpe_model(self.config.device)
+    else:
+      get_rmvpe_model(self.config.device, self.config.is_half, backend=self.config.backend)
+    if voice_fpath is not None:
+      voice = self.get(voice_fpath)
+      audio = np.random.RandomState(0).randn(int(16000 * WARMUP_SECONDS)).astype(np.float32) * 0.1
+      voice.vc.pipeline(hubert_model, voice.net_g, 0, audio, None, [0, 0, 0], 0, f0_method, "", 0, voice.if_f0, 3,
+                        voice.tgt_sr, 0, 1, voice.version, 0.33)
+    logger.info("warmed up%s in %.1fs", f" with {voice_fpath}" if voice_fpath else "", perf_counter() - t0)
+
+  def preload(self, voice_fpath=None, f0_method="rmvpe"):
+    """runs `warmup` on a background thread and returns it; requests in the meantime wait on the same loads"""
+    def run():
+      try:
+        self.warmup(voice_fpath, f0_method)
+      except Exception:
+        logger.exception("preload failed")
+
+    thread = threading.Thread(target=run, name="voice-pool-preload", daemon=True)
+    thread.start()
+    return thread
+
+  def evict(self, fpath=None):
+    if fpath is None:
+      self.cache.clear()
+    else:
+      fpath = os.path.abspath(fpath)
+      for key in self.cache.keys():
+        if key[0] == fpath:
+          self.cache.pop(key)
+    self.empty_cache()
+
+  def release_models(self):
+    """evicts every voice and drops the shared HuBERT / f0 models too; the next request loads them again. goes through
+    the same `model.loaders` as the loads, which a caller importing it as `lib.model.loaders` wouldn't"""
+    self.cache.clear()
+    release_shared_models()
+    self.empty_cache()
+
+  @staticmethod
+  def empty_cache():
+    if torch.cuda.is_available():
+      torch.cuda.empty_cache()
+
+  def stats(self):
+    out = self.cache.stats()
+    out["voices"] = [key[0] for key in self.cache.keys()]
+    return out
@@ -0,0 +1,80 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 12:05 PM
+"""pyworld f0 (harvest / dio, refined by stonemask) over long signals, cut into segments that run in parallel
+
+harvest runs at ~1x real time on one core, and a single call can't use more. `segmented_f0` cuts the signal at the
+quietest frame near every `segment_seconds`, extends each segment by `overlap_seconds` of context on either side (in
+whole frames, so the segments' frames land on the full signal's) and keeps only the frames between its cuts. the cuts
+fall in pauses wherever the signal has them, so the contours rarely notice; see `scripts/bench_f0.py` for how closely
+the result follows a single pass. pyworld releases the GIL, so the segments run on threads
+"""
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+SEGMENT_SECONDS = 8.
+OVERLAP_SECONDS = 1.
+SEARCH_SECONDS = 2.  # how far from every `segment_seconds` a cut may move to a quieter frame
+ENERGY_FRAMES = 5  # frames over which the energy of a candidate cut is summed
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(n_workers):
+  """a shared thread pool per worker count, so concurrent requests queue their segments instead of oversubscribing"""
+  with pools_lock:
+    if n_workers not in pools:
+      pools[n_workers] = ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="world_f0")
+    return pools[n_workers]
+
+
+def world_f0(x, fs, f0_min, f0_max, frame_period=10., method="harvest"):
+  """single-pass f0 of float64 `x`: `len(x) * 1000 // (fs * frame_period) + 1` frames"""
+  import pyworld
+
+  assert method in ["harvest", "dio"], f"unknown pyworld f0 method `{method}`"
+  f0, t = getattr(pyworld, method)(x, fs=fs, f0_ceil=f0_max, f0_floor=f0_min, frame_period=frame_period)
+  return pyworld.stonemask(x, f0, t, fs)
+
+
+def split_frames(x, hop, segment, search):
+  """frames at which to cut `x`, from 0 to its frame count: the quietest within `search` frames of every `segment`"""
+  n_frames = x.shape[0] // hop + 1
+  energy = np.square(x[:(n_frames - 1) * hop].reshape(-1, hop)).sum(1)
+  energy = np.convolve(energy, np.ones(ENERGY_FRAMES), mode="same")
+  cuts = [0]
+  while n_frames - cuts[-1] > segment + search:
+    lo = cuts[-1] + segment - search
+    cuts.append(lo + int(np.argmin(energy[lo:lo + 2 * search])))
+  cuts.append(n_frames)
+  return cuts
+
+
+def segmented_f0(x, fs, f0_min, f0_max, frame_period=10., method="harvest", n_workers=None,
+                 segment_seconds=SEGMENT_SECONDS, overlap_seconds=OVERLAP_SECONDS):
+  """`world_f0` of `x` over segments on `n_workers` threads (all cores by default); a single pass if `x` is short,
+  with one worker, or if a frame isn't a whole number of samples
+  """
+  n_workers = n_workers or os.cpu_count() or 1
+  hop = fs * frame_period / 1000
+  if n_workers <= 1 or hop != int(hop) or x.shape[0] <= (segment_seconds + SEARCH_SECONDS) * fs:
+    return world_f0(x, fs, f0_min, f0_max, frame_period, method)
+
+  hop = int(hop)
+  overlap = math.ceil(overlap_seconds * fs / hop)
+  cuts = split_frames(x, hop, int(segment_seconds * fs / hop), int(SEARCH_SECONDS * fs / hop))
+
+  def run(lo, hi):
+    start = max(lo - overlap, 0)
+    f0 = world_f0(x[start * hop:(hi + overlap) * hop], fs, f0_min, f0_max, frame_period, method)
+    return f0[lo - start:hi - start]
+
+  pool = get_pool(n_workers)
+  futures = [pool.submit(run, lo, hi) for lo, hi in zip(cuts[:-1], cuts[1:])]
+  return np.concatenate([future.result() for future in futures])
@@ -0,0 +1,148 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 6:50 AM
+"""memory-mapped voice bundles: a directory holding everything one voice needs for inference
+
+  <name>.rvc/
+    meta.json    checkpoint metadata (`config`, `sr`, `f0`, `version`, `info`) + the layout of `tensors.bin`
+    tensors.bin  synthesizer tensors as raw bytes, each aligned to `ALIGN` bytes
+    index.faiss  (optional) faiss index
+    big_npy.npy  (optional) the index's reconstructed feature matrix, for retrieval
+
+tensors and `big_npy` are memory-mapped, so opening a bundle reads no tensor data until it is touched; the OS page
+cache is shared across processes and survives voice switches. a bundle can be re-exported while processes have it
+mapped: every file is written under a temp name and renamed into place (`meta.json` last), so they keep reading the
+old files
+"""
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_EXT = ".rvc"
+BUNDLE_VERSION = 1
+ALIGN = 64
+META_FNAME = "meta.json"
+TENSORS_FNAME = "tensors.bin"
+INDEX_FNAME = "index.faiss"
+BIG_NPY_FNAME = "big_npy.npy"
+
+
+def is_bundle(path):
+  return os.path.isdir(path) and os.path.exists(os.path.join(path, META_FNAME))
+
+
+def get_mtime(path):
+  """mtime of a file, or of a bundle's `meta.json` (written last), for cache invalidation"""
+  return os.path.getmtime(os.path.join(path, META_FNAME) if is_bundle(path) else path)
+
+
+@contextmanager
+def replacing(fpath):
+  """yields a temp fpath next to `fpath` to write to, renamed over `fpath` once written. writing `fpath` in place
+  would truncate it under any process that has it memory-mapped, whose next read of it then dies of SIGBUS"""
+  tmp_fpath = f"{fpath}.{os.getpid()}.{threading.get_ident()}.tmp"
+  try:
+    yield tmp_fpath
+    os.replace(tmp_fpath, fpath)
+  finally:
+    if os.path.exists(tmp_fpath):
+      os.remove(tmp_fpath)
+
+
+def write_bundle(out_dir, cpt, index=None, big_npy=None):
+  """writes a checkpoint dict (as saved by `utils.process_ckpt.savee`) and optionally its faiss index"""
+  os.makedirs(out_dir, exist_ok=True)
+  layout = {}
+  offset = 0
+  with replacing(os.path.join(out_dir, TENSORS_FNAME)) as tmp_fpath, open(tmp_fpath, "wb") as f:
+    for name, tensor in cpt["weight"].items():
+      arr = tensor.detach().cpu().contiguous().numpy()
+      pad = -offset % ALIGN
+      f.write(b"\0" * pad)
+      offset += pad
+      f.write(arr.tobytes())
+      layout[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+      offset += arr.nbytes
+
+  meta = {k: v for k, v in cpt.items() if k != "weight"}
+  meta["bundle_version"] = BUNDLE_VERSION
+  meta["tensors"] = layout
+  meta["index"] = None
+  if index is not None:
+    import faiss
+
+    with replacing(os.path.join(out_dir, INDEX_FNAME)) as tmp_fpath:
+      faiss.write_index(index, tmp_fpath)
+    if big_npy is None:
+      big_npy = index.reconstruct_n(0, index.ntotal)
+    with replacing(os.path.join(out_dir, BIG_NPY_FNAME)) as tmp_fpath, open(tmp_fpath, "wb") as f:
+      np.save(f, np.ascontiguousarray(big_npy, dtype=np.float32))
+    meta["index"] = INDEX_FNAME
+  # last, so a reader never sees the new layout before the files it describes
+  with replacing(os.path.join(out_dir, META_FNAME)) as tmp_fpath, open(tmp_fpath, "w") as f:
+    json.dump(meta, f)
+  return out_dir
+
+
+def export_bundle(pth_fpath, out_dir, index_fpath=None):
+  """converts an exported `.pth` voice (plus its `.index`, if any) into a bundle"""
+  cpt = torch.load(pth_fpath, map_location="cpu")
+  index = None
+  if index_fpath:
+    import faiss
+
+    index = faiss.read_index(index_fpath)
+  return write_bundle(out_dir, cpt, index=index)
+
+
+class VoiceBundle(object):
+  def __init__(self, bundle_dir):
+    self.bundle_dir = bundle_dir
+    with open(os.path.join(bundle_dir, META_FNAME)) as f:
+      self.meta = json.load(f)
+    assert self.meta["bundle_version"] <= BUNDLE_VERSION, f"bundle version {self.meta['bundle_version']} not supported"
+    # copy-on-write: tensors are writable views of the page cache and nothing is read until touched
+    self.buffer = np.memmap(os.path.join(bundle_dir, TENSORS_FNAME), dtype=np.uint8, mode="c")
+
+  @property
+  def has_index(self):
+    return self.meta["index"] is not None
+
+  def state_dict(self):
+    """{name: cpu tensor} backed directly by the memory map"""
+    out = {}
+    for name, info in self.meta["tensors"].items():
+      dtype = np.dtype(info["dtype"])
+      count = int(np.prod(info["shape"], dtype=np.int64))
+      arr = np.frombuffer(self.buffer, dtype=dtype, count=count, offset=info["offset"]).reshape(info["shape"])
+      out[name] = torch.from_numpy(arr)
+    return out
+
+  def cpt(self):
+    """checkpoint dict in the same shape `torch.load` returns for the `.pth`"""
+    out = {k: v for k, v in self.meta.items() if k not in ("bundle_version", "tensors", "index")}
+    out["weight"] = self.state_dict()
+    return out
+
+  def load_index(self):
+    """returns (index, big_npy), with `big_npy` memory-mapped read-only; (None, None) if the bundle has no index"""
+    if not self.has_index:
+      return None, None
+    import faiss
+
+    index_fpath = os.path.join(self.bundle_dir, self.meta["index"])
+    try:
+      # IVF inverted lists can be mapped instead of read; other index types don't support it
+      index = faiss.read_index(index_fpath, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+      index = faiss.read_index(index_fpath)
+    big_npy = np.load(os.path.join(self.bundle_dir, BIG_NPY_FNAME), mmap_mode="r")
+    return index, big_npy
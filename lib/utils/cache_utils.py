@@ -0,0 +1,206 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/17/26 11:20 PM
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache(object):
+  """thread-safe LRU map bounded by a total size budget in bytes
+
+  each entry is stored with its own size; least recently used entries are evicted until the budget holds again.
+  an entry larger than the whole budget is not cached at all
+  """
+  def __init__(self, max_bytes):
+    self.max_bytes = int(max_bytes)
+    self.entries = OrderedDict()  # key -> (value, nbytes)
+    self.lock = threading.RLock()
+    self.nbytes = 0
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def get(self, key, default=None):
+    with self.lock:
+      if key in self.entries:
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return self.entries[key][0]
+      self.misses += 1
+      return default
+
+  def put(self, key, value, nbytes):
+    nbytes = int(nbytes)
+    with self.lock:
+      if key in self.entries:
+        self.nbytes -= self.entries.pop(key)[1]
+      if nbytes > self.max_bytes:
+        logger.debug("not caching %s (%d bytes > budget of %d bytes)", key, nbytes, self.max_bytes)
+        return value
+      self.entries[key] = (value, nbytes)
+      self.nbytes += nbytes
+      while self.nbytes > self.max_bytes:
+        old_key, (_, old_nbytes) = self.entries.popitem(last=False)
+        self.nbytes -= old_nbytes
+        self.evictions += 1
+        logger.debug("evicted %s (%d bytes)", old_key, old_nbytes)
+    return value
+
+  def pop(self, key, default=None):
+    with self.lock:
+      if key not in self.entries:
+        return default
+      value, nbytes = self.entries.pop(key)
+      self.nbytes -= nbytes
+      return value
+
+  def keys(self):
+    with self.lock:
+      return list(self.entries.keys())
+
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+      self.nbytes = 0
+
+  def stats(self):
+    with self.lock:
+      return {
+        "hits": self.hits,
+        "misses": self.misses,
+        "evictions": self.evictions,
+        "entries": len(self.entries),
+        "bytes": self.nbytes,
+        "max_bytes": self.max_bytes,
+      }
+
+  def __contains__(self, key):
+    with self.lock:
+      return key in self.entries
+
+  def __len__(self):
+    return len(self.entries)
+
+
+def hash_array(arr, *params):
+  """content hash of a numpy array plus any extra (repr-able) parameters"""
+  h = hashlib.blake2b(digest_size=16)
+  arr = np.ascontiguousarray(arr)
+  h.update(str((arr.dtype.str, arr.shape) + params).encode())
+  h.update(arr.view(np.uint8).reshape(-1))
+  return h.hexdigest()
+
+
+class ArrayCache(object):
+  """in-memory LRU of numpy arrays keyed by content hash, optionally backed by a directory of `<key>.npy` files
+
+  the directory is bounded by `max_disk_bytes` too (if given): least recently used files (by mtime, which disk hits
+  refresh) are removed first. arrays handed out are read-only and shared; copy before modifying
+  """
+  def __init__(self, max_bytes, cache_dir=None, max_disk_bytes=None):
+    self.memory = LRUCache(max_bytes)
+    self.disk_lock = threading.Lock()
+    self.disk_hits = 0
+    self.disk_evictions = 0
+    self.set_cache_dir(cache_dir, max_disk_bytes)
+
+  def set_cache_dir(self, cache_dir, max_disk_bytes=None):
+    """(re)points the disk side at `cache_dir` (None: memory only), trimming what's already there to the budget"""
+    with self.disk_lock:
+      self.cache_dir = cache_dir or None
+      self.max_disk_bytes = None if max_disk_bytes is None else int(max_disk_bytes)
+      self.disk_nbytes = sum(size for _, _, size in self.list_disk())
+    self.trim_disk()
+
+  def list_disk(self):
+    """[(mtime, fpath, size)] of the cached files"""
+    if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+      return []
+    out = []
+    for fname in os.listdir(self.cache_dir):
+      if fname.endswith(".npy"):
+        fpath = os.path.join(self.cache_dir, fname)
+        try:
+          stat = os.stat(fpath)
+        except FileNotFoundError:  # removed by another process
+          continue
+        out.append((stat.st_mtime, fpath, stat.st_size))
+    return out
+
+  def trim_disk(self):
+    with self.disk_lock:
+      if self.max_disk_bytes is None or self.disk_nbytes <= self.max_disk_bytes:
+        return
+      files = sorted(self.list_disk())
+      self.disk_nbytes = sum(size for _, _, size in files)
+      for _, fpath, size in files:
+        if self.disk_nbytes <= self.max_disk_bytes:
+          break
+        try:
+          os.remove(fpath)
+        except FileNotFoundError:
+          pass
+        self.disk_nbytes -= size
+        self.disk_evictions += 1
+
+  def get(self, key):
+    arr = self.memory.get(key)
+    if arr is not None or self.cache_dir is None:
+      return arr
+    fpath = os.path.join(self.cache_dir, f"{key}.npy")
+    if not os.path.exists(fpath):
+      return None
+    try:
+      arr = np.load(fpath, allow_pickle=False)
+      os.utime(fpath)  # most recently used
+    except (OSError, ValueError):
+      logger.warning("removing unreadable cache file %s", fpath)
+      os.remove(fpath)
+      return None
+    self.disk_hits += 1
+    arr.flags.writeable = False
+    return self.memory.put(key, arr, arr.nbytes)
+
+  def put(self, key, arr):
+    arr = np.array(arr)  # own copy, so callers can't modify the cached value
+    arr.flags.writeable = False
+    self.memory.put(key, arr, arr.nbytes)
+    if self.cache_dir is not None:
+      os.makedirs(self.cache_dir, exist_ok=True)
+      fpath = os.path.join(self.cache_dir, f"{key}.npy")
+      tmp_fpath = f"{fpath}.{os.getpid()}.{threading.get_ident()}.tmp"
+      with open(tmp_fpath, "wb") as f:
+        np.save(f, arr, allow_pickle=False)
+      existed = os.path.exists(fpath)
+      os.replace(tmp_fpath, fpath)
+      if not existed:
+        with self.disk_lock:
+          self.disk_nbytes += os.path.getsize(fpath)
+        self.trim_disk()
+    return arr
+
+  def clear(self, disk=False):
+    self.memory.clear()
+    if disk and self.cache_dir is not None and os.path.isdir(self.cache_dir):
+      for fname in os.listdir(self.cache_dir):
+        if fname.endswith(".npy"):
+          os.remove(os.path.join(self.cache_dir, fname))
+      with self.disk_lock:
+        self.disk_nbytes = 0
+
+  def stats(self):
+    out = self.memory.stats()
+    out["disk_hits"] = self.disk_hits
+    out["disk_evictions"] = self.disk_evictions
+    out["disk_bytes"] = self.disk_nbytes
+    out["max_disk_bytes"] = self.max_disk_bytes
+    out["cache_dir"] = self.cache_dir
+    return out
@@ -14,7 +14,9 @@ def use_fp32_config():
 
 
 class Config:
-    def __init__(self):
+    # known_only: ignore arguments this parser doesn't know, for CLIs that share argv with it (e.g.
+    # scripts/infer_batch.py, which checks the rest itself); otherwise they are an error, as for the webUI
+    def __init__(self, known_only=False):
         self.device = "cuda:0"
         self.is_half = True
         self.n_cpu = 0
@@ -26,13 +28,27 @@ class Config:
             self.iscolab,
             self.noparallel,
             self.noautoopen,
-        ) = self.arg_parse()
+            self.voice_pool_gb,
+            self.backend,
+            self.quantize,
+            self.feature_cache_dir,
+            self.feature_cache_gb,
+            self.f0_cache_dir,
+            self.f0_cache_gb,
+            self.index_nprobe,
+            self.index_ef_search,
+            self.index_device_rows,
+            self.preload,
+            self.trace_dir,
+        ) = self.arg_parse(known_only)
         self.x_pad, self.x_query, self.x_center, self.x_max = self.device_config()
 
     @staticmethod
-    def arg_parse() -> tuple:
+    def build_parser() -> argparse.ArgumentParser:
         exe = sys.executable or "python"
-        parser = argparse.ArgumentParser()
+        # no abbreviations: other CLIs' own flags (e.g. `--index` of scripts/infer_batch.py) would read as ambiguous
+        # prefixes of these
+        parser = argparse.ArgumentParser(allow_abbrev=False)
         parser.add_argument("--port", type=int, default=7865, help="Listen port")
         parser.add_argument("--pycmd", type=str, default=exe, help="Python command")
         parser.add_argument("--colab", action="store_true", help="Launch in colab")
@@ -44,7 +60,87 @@ class Config:
             action="store_true",
             help="Do not open in browser automatically",
         )
-        cmd_opts = parser.parse_args()
+        parser.add_argument(
+            "--voice_pool_gb",
+            type=float,
+            default=4.0,
+            help="Memory budget for voices kept loaded at once",
+        )
+        parser.add_argument(
+            "--backend",
+            choices=["torch", "onnx"],
+            default="torch",
+            help="Inference backend; onnx runs the synthesizer and RMVPE in onnxruntime on CPU",
+        )
+        parser.add_argument(
+            "--quantize",
+            type=str,
+            default="",
+            help="Comma-separated int8 CPU models: hubert and/or synth (uses each voice's calibrated .int8.pt)",
+        )
+        parser.add_argument(
+            "--feature_cache_dir",
+            type=str,
+            default="cache/hubert",
+            help="Directory for cached HuBERT features (empty to keep them in memory only)",
+        )
+        parser.add_argument(
+            "--feature_cache_gb",
+            type=float,
+            default=4.0,
+            help="Disk budget for cached HuBERT features",
+        )
+        parser.add_argument(
+            "--f0_cache_dir",
+            type=str,
+            default="",
+            help="Directory for cached f0 curves (empty to keep them in memory only)",
+        )
+        parser.add_argument(
+            "--f0_cache_gb",
+            type=float,
+            default=1.0,
+            help="Disk budget for cached f0 curves",
+        )
+        parser.add_argument(
+            "--index_nprobe",
+            type=int,
+            default=0,
+            help="IVF lists visited per retrieval search (0: the value stored in the index)",
+        )
+        parser.add_argument(
+            "--index_ef_search",
+            type=int,
+            default=0,
+            help="HNSW search depth for retrieval (0: the value stored in the index)",
+        )
+        parser.add_argument(
+            "--index_device_rows",
+            type=int,
+            default=100000,
+            help="Largest index (in rows) searched exactly on the GPU with torch instead of faiss (0: always faiss)",
+        )
+        parser.add_argument(
+            "--preload",
+            type=str,
+            nargs="?",
+            const="",
+            default=None,
+            help="Load HuBERT and RMVPE in the background at startup; with a voice name in weights/, also load and "
+            "warm up that voice",
+        )
+        parser.add_argument(
+            "--trace_dir",
+            type=str,
+            default="",
+            help="Write a Chrome trace (chrome://tracing) of the stages of every conversion into this dirpath",
+        )
+        return parser
+
+    @staticmethod
+    def arg_parse(known_only=False) -> tuple:
+        parser = Config.build_parser()
+        cmd_opts = parser.parse_known_args()[0] if known_only else parser.parse_args()
 
         cmd_opts.port = cmd_opts.port if 0 <= cmd_opts.port <= 65535 else 7865
 
@@ -54,6 +150,18 @@ class Config:
             cmd_opts.colab,
             cmd_opts.noparallel,
             cmd_opts.noautoopen,
+            cmd_opts.voice_pool_gb,
+            cmd_opts.backend,
+            [x for x in cmd_opts.quantize.split(",") if x],
+            cmd_opts.feature_cache_dir,
+            cmd_opts.feature_cache_gb,
+            cmd_opts.f0_cache_dir,
+            cmd_opts.f0_cache_gb,
+            cmd_opts.index_nprobe,
+            cmd_opts.index_ef_search,
+            cmd_opts.index_device_rows,
+            cmd_opts.preload,
+            cmd_opts.trace_dir,
         )
 
     # has_mps is only available in nightly pytorch (for now) and MasOS 12.3+.
@@ -8,11 +8,13 @@ import logging
 import os
 import sys
 
-import ffmpeg
 import numpy as np
+import soundfile as sf
 import torch
 from scipy.io.wavfile import read
 
+from utils.resample import StreamResampler, resample
+
 logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
 logger = logging
 
@@ -24,6 +26,8 @@ if not os.path.exists(PRETRAIN_DIR):
 assert os.path.exists(PRETRAIN_DIR)
 HUBERT_FPATH = f'{PRETRAIN_DIR}/hubert/hubert_base.pt'
 RMVPE_FPATH = f'{PRETRAIN_DIR}/rmvpe/model.pt'
+RMVPE_ONNX_FPATH = f'{PRETRAIN_DIR}/rmvpe/model.onnx'
+FCPE_FPATH = f'{PRETRAIN_DIR}/fcpe/fcpe.pt'
 
 
 def get_device():
@@ -36,21 +40,90 @@ def get_device():
   return device
 
 
-def load_audio(file, sr):
+def clean_path(file):
+  return file.strip(" ").strip('"').strip("\n").strip('"').strip(" ")
+
+
+def open_ffmpeg(file, sr):
+  """ffmpeg subprocess writing `file` as mono f32le at `sr` to its stdout"""
+  # https://github.com/openai/whisper/blob/main/whisper/audio.py#L26
+  # Requires the ffmpeg CLI and `ffmpeg-python` package to be installed.
+  import ffmpeg  # only needed for formats libsndfile can't read
+
+  return (
+    ffmpeg.input(file, threads=0)
+    .output("-", format="f32le", acodec="pcm_f32le", ac=1, ar=sr)
+    .global_args("-loglevel", "error")
+    .run_async(cmd=["ffmpeg", "-nostdin"], pipe_stdout=True)
+  )
+
+
+def ffmpeg_chunks(file, sr, chunk_bytes):
+  """raw f32le output of `open_ffmpeg`, `chunk_bytes` at a time"""
   try:
-    # https://github.com/openai/whisper/blob/main/whisper/audio.py#L26
-    # This launches a subprocess to decode audio while down-mixing and resampling as necessary.
-    # Requires the ffmpeg CLI and `ffmpeg-python` package to be installed.
-    file = file.strip(" ").strip('"').strip("\n").strip('"').strip(" ")
-    out, _ = (
-      ffmpeg.input(file, threads=0)
-      .output("-", format="f32le", acodec="pcm_f32le", ac=1, ar=sr)
-      .run(cmd=["ffmpeg", "-nostdin"], capture_stdout=True, capture_stderr=True)
-    )
+    process = open_ffmpeg(file, sr)
   except Exception as e:
     raise RuntimeError(f"Failed to load audio: {e}")
+  try:
+    while True:
+      chunk = process.stdout.read(chunk_bytes)
+      if not chunk:
+        break
+      yield chunk
+    if process.wait() != 0:
+      raise RuntimeError(f"Failed to load audio: ffmpeg exited with code {process.returncode} on {file}")
+  finally:
+    process.stdout.close()
+    if process.poll() is None:
+      process.kill()
+      process.wait()
 
-  return np.frombuffer(out, np.float32).flatten()
+
+def load_audio(file, sr):
+  """decodes `file` to mono float32 at `sr`
+
+  formats libsndfile reads (wav, flac, ogg, ...) are decoded in-process and resampled with `utils.resample`; anything
+  else goes through an ffmpeg subprocess, whose output is collected into a single growing buffer
+  """
+  file = clean_path(file)
+  try:
+    audio, file_sr = sf.read(file, dtype="float32", always_2d=True)
+  except RuntimeError:  # unsupported format (or missing file, which ffmpeg reports)
+    out = bytearray()
+    for chunk in ffmpeg_chunks(file, sr, 2 ** 22):
+      out += chunk
+    return np.frombuffer(out, np.float32)
+
+  audio = audio[:, 0] if audio.shape[1] == 1 else audio.mean(axis=1)  # ffmpeg's `ac=1` averages the channels too
+  if file_sr == sr:
+    return audio
+  return resample(audio, file_sr, sr)
+
+
+def iter_audio(file, sr, block_seconds=30.):
+  """yields `file` as mono float32 blocks of `block_seconds` at `sr` (the last one shorter), like `load_audio` but
+  decoding and resampling a block at a time, so long files never need their full decoded size in memory"""
+  file = clean_path(file)
+  block_size = int(block_seconds * sr)
+  try:
+    sound_file = sf.SoundFile(file)
+  except RuntimeError:
+    for chunk in ffmpeg_chunks(file, sr, block_size * 4):
+      yield np.frombuffer(chunk, np.float32).copy()
+    return
+
+  with sound_file:
+    resampler = StreamResampler(sound_file.samplerate, sr)
+    in_block_size = max(1, block_size * sound_file.samplerate // sr)
+    pending = np.zeros(0, dtype=np.float32)
+    for block in sound_file.blocks(blocksize=in_block_size, dtype="float32", always_2d=True):
+      pending = np.concatenate([pending, resampler.push(block.mean(axis=1))])
+      while pending.shape[0] >= block_size:
+        yield pending[:block_size]
+        pending = pending[block_size:]
+    pending = np.concatenate([pending, resampler.flush()])
+    for i in range(0, pending.shape[0], block_size):
+      yield pending[i:i + block_size]
 
 
 def load_checkpoint(checkpoint_path, model, optimizer=None, load_opt=1):
@@ -0,0 +1,154 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 9:35 AM
+"""band-limited resampling with cached rational-ratio polyphase kernels, in numpy and torch
+
+the ratio `target_sr / orig_sr` is reduced to `up / down` and a Kaiser-windowed sinc lowpass is designed once per
+(orig_sr, target_sr, quality). `quality="default"` is exactly the filter of `scipy.signal.resample_poly`. scipy.signal,
+slow to import, is only imported on first use
+
+- `resample`: numpy, over the last axis of `(..., T)` arrays (so a batch of equal-length signals at once), a block at
+  a time, so the upsampled intermediate of only one block exists at any moment
+- `resample_torch`: torch, over the last axis of `(..., T)` tensors on any device, as a single strided conv1d whose
+  `up` output channels are the filter's phases; matches `resample` up to float32 rounding
+- `StreamResampler`: numpy, over a signal decoded block by block (see `utils.misc_utils.iter_audio`)
+"""
+import math
+from functools import lru_cache
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+BLOCK_SIZE = 2 ** 16  # output samples per block
+QUALITIES = {  # zero crossings of the sinc on either side (per `max(up, down)`), Kaiser beta
+  "fast": (4, 5.0),
+  "default": (10, 5.0),
+  "high": (32, 8.6),
+}
+
+
+@lru_cache(maxsize=64)
+def polyphase_filter(orig_sr, target_sr, quality="default"):
+  """(up, down, taps) for `orig_sr` -> `target_sr`; `taps` is read-only and not yet scaled by `up`"""
+  from scipy import signal
+
+  assert quality in QUALITIES, f"unknown quality `{quality}`, expected one of {list(QUALITIES)}"
+  zero_crossings, beta = QUALITIES[quality]
+  gcd = math.gcd(int(orig_sr), int(target_sr))
+  up, down = int(target_sr) // gcd, int(orig_sr) // gcd
+  max_rate = max(up, down)
+  taps = signal.firwin(2 * zero_crossings * max_rate + 1, 1. / max_rate, window=("kaiser", beta))
+  taps.flags.writeable = False
+  return up, down, taps
+
+
+def output_length(n, orig_sr, target_sr):
+  gcd = math.gcd(int(orig_sr), int(target_sr))
+  return -(-n * (int(target_sr) // gcd) // (int(orig_sr) // gcd))
+
+
+def resample(x, orig_sr, target_sr, quality="default", block_size=BLOCK_SIZE):
+  """resamples the float array `x` over its last axis from `orig_sr` to `target_sr`, keeping its dtype"""
+  if orig_sr == target_sr:
+    return x.copy()
+  from scipy import signal
+
+  up, down, taps = polyphase_filter(orig_sr, target_sr, quality)
+
+  n_out = output_length(x.shape[-1], orig_sr, target_sr)
+  out = np.empty(x.shape[:-1] + (n_out,), dtype=x.dtype)
+  # blocks and their context start on multiples of `down` input samples, i.e. on whole output samples, so each block's
+  # output lines up with the full signal's; the context covers the filter's reach on either side
+  block_in = max(1, block_size // up) * down
+  margin = -(-(taps.shape[0] // up + 2) // down) * down
+  for start in range(0, x.shape[-1], block_in):
+    lo = max(start - margin, 0)
+    y = signal.resample_poly(x[..., lo:start + block_in + margin], up, down, axis=-1, window=taps)
+    o_start, offset = start * up // down, (start - lo) * up // down
+    n = min(block_in * up // down, n_out - o_start)
+    out[..., o_start:o_start + n] = y[..., offset:offset + n]
+  return out
+
+
+@lru_cache(maxsize=64)
+def polyphase_kernel(orig_sr, target_sr, quality="default"):
+  """(up, down, left, kernel) with `kernel[j, w]` weighting input `m * down + w - left` for output `m * up + j`"""
+  up, down, taps = polyphase_filter(orig_sr, target_sr, quality)
+  half_len = taps.shape[0] // 2
+  # output n reads input i through taps[n * down + half_len - i * up] (see `scipy.signal.resample_poly`)
+  r_lo = -(half_len // up)
+  r_hi = ((up - 1) * down + half_len) // up
+  j, r = np.meshgrid(np.arange(up), np.arange(r_lo, r_hi + 1), indexing="ij")
+  tap_idx = j * down + half_len - r * up
+  valid = (tap_idx >= 0) & (tap_idx < taps.shape[0])
+  kernel = np.where(valid, taps[np.clip(tap_idx, 0, taps.shape[0] - 1)] * up, 0.)
+  kernel.flags.writeable = False
+  return up, down, -r_lo, kernel
+
+
+@lru_cache(maxsize=64)
+def torch_kernel(orig_sr, target_sr, quality, device, dtype):
+  return torch.from_numpy(polyphase_kernel(orig_sr, target_sr, quality)[3].copy()).to(device, dtype).unsqueeze(1)
+
+
+def resample_torch(x, orig_sr, target_sr, quality="default"):
+  """`resample` for float tensors, over the last axis; the kernel is cached per device / dtype"""
+  if orig_sr == target_sr:
+    return x.clone()
+  up, down, left, _ = polyphase_kernel(orig_sr, target_sr, quality)
+  kernel = torch_kernel(orig_sr, target_sr, quality, x.device, x.dtype)
+  shape, n = x.shape[:-1], x.shape[-1]
+  n_out = output_length(n, orig_sr, target_sr)
+  n_blocks = -(-n_out // up)
+  right = max(0, (n_blocks - 1) * down + kernel.shape[-1] - left - n)
+  y = F.conv1d(F.pad(x.reshape(-1, 1, n), (left, right)), kernel, stride=down)  # (B, up, n_blocks)
+  y = y[..., :n_blocks].transpose(1, 2).reshape(-1, n_blocks * up)[:, :n_out]
+  return y.reshape(shape + (n_out,))
+
+
+class StreamResampler(object):
+  """`resample` of a signal that arrives in blocks: `push` returns the output samples whose filter reach is complete
+  so far, `flush` the rest at the end of the signal. the concatenated outputs equal `resample` of the whole input,
+  while only the filter's context is kept between blocks
+  """
+  def __init__(self, orig_sr, target_sr, quality="default"):
+    self.passthrough = orig_sr == target_sr
+    if not self.passthrough:
+      self.up, self.down, self.taps = polyphase_filter(orig_sr, target_sr, quality)
+    self.buf = np.zeros(0, dtype=np.float32)
+    self.offset = 0  # input index of `buf[0]`
+    self.n_in = 0
+    self.n_out = 0
+
+  def context_start(self):
+    """first input sample read by output `n_out`, rounded down to a multiple of `down` (i.e. to a whole output)"""
+    return max((self.n_out * self.down - self.taps.shape[0] // 2) // self.up // self.down * self.down, 0)
+
+  def emit(self, n_end):
+    if n_end <= self.n_out:
+      return self.buf[:0]
+    from scipy import signal
+
+    lo = self.context_start()
+    y = signal.resample_poly(self.buf[lo - self.offset:], self.up, self.down, window=self.taps)
+    start = self.n_out - lo * self.up // self.down
+    out = y[start:start + n_end - self.n_out].astype(self.buf.dtype)
+    self.n_out = n_end
+    lo = self.context_start()
+    self.buf, self.offset = self.buf[lo - self.offset:], lo
+    return out
+
+  def push(self, x):
+    if self.passthrough:
+      return x
+    self.buf = np.concatenate([self.buf, x])
+    self.n_in += x.shape[0]
+    # output n reads inputs up to (n * down + half_len) // up
+    return self.emit((self.n_in * self.up - self.taps.shape[0] // 2 - 1) // self.down + 1)
+
+  def flush(self):
+    if self.passthrough:
+      return self.buf[:0]
+    return self.emit(-(-self.n_in * self.up // self.down))
@@ -0,0 +1,149 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 11:05 AM
+"""per-stage spans of a conversion, exportable as JSON or as a Chrome trace (chrome://tracing, Perfetto)
+
+code marks its stages with `span(name, **attrs)`, which records into every `Tracer` activated in the current context
+(thread / task) and costs next to nothing when there is none. so a tracer follows a request through whichever threads
+run it (see `model.infer_service`), and stages that serve several requests at once (a synthesizer batch) are recorded
+into each of their tracers. the stages of `model.vc_infer_pipeline`:
+  load_index, highpass, split_search, f0, hubert, retrieval, synthesis, rms_mix, resample, quantize
+plus `decode` where the caller loads the input, all under one `pipeline` span
+
+with a device, every span boundary synchronizes it, so a span's duration is that of the kernels it launched rather than
+of queueing them. `profile=True` also runs `torch.profiler` while the tracer is active, with each span as a labelled
+range in it; meant for one request at a time
+"""
+import contextvars
+import json
+import threading
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+
+import torch
+
+active_tracers = contextvars.ContextVar("active_tracers", default=())
+parent_span = contextvars.ContextVar("parent_span", default=None)
+
+
+def synchronize(device):
+  device = str(device)
+  if device.startswith("cuda"):
+    torch.cuda.synchronize(device)
+  elif device.startswith("mps"):
+    torch.mps.synchronize()
+
+
+class Tracer(object):
+  def __init__(self, device=None, profile=False):
+    self.device = device
+    self.profile = profile
+    self.profiler = None
+    self.n_active = 0
+    self.lock = threading.Lock()
+    self.t0 = perf_counter()
+    self.spans = []  # dicts of name, start / end in seconds since `t0`, thread, parent, attrs
+
+  @contextmanager
+  def activate(self):
+    """records the spans of the current context until exit"""
+    with self.lock:
+      self.n_active += 1
+      if self.profile and self.profiler is None:
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+          activities.append(torch.profiler.ProfilerActivity.CUDA)
+        self.profiler = torch.profiler.profile(activities=activities, record_shapes=True)
+        self.profiler.__enter__()
+    token = active_tracers.set(active_tracers.get() + (self,))
+    try:
+      yield self
+    finally:
+      active_tracers.reset(token)
+      with self.lock:
+        self.n_active -= 1
+        if self.n_active == 0 and self.profiler is not None:
+          synchronize(self.device or "cpu")
+          self.profiler.__exit__(None, None, None)
+
+  def add(self, name, start, end, parent=None, **attrs):
+    """records a span measured elsewhere, from `perf_counter` values"""
+    thread = threading.current_thread()
+    with self.lock:
+      self.spans.append({"name": name, "start": start - self.t0, "end": end - self.t0, "thread": thread.ident,
+                         "thread_name": thread.name, "parent": parent, "attrs": attrs})
+
+  def summary(self):
+    """{name: {"count", "seconds"}} in order of first occurrence"""
+    out = {}
+    for s in self.spans:
+      x = out.setdefault(s["name"], {"count": 0, "seconds": 0.})
+      x["count"] += 1
+      x["seconds"] += s["end"] - s["start"]
+    return out
+
+  def to_json(self):
+    return {"device": str(self.device) if self.device is not None else None, "spans": self.spans,
+            "summary": self.summary()}
+
+  def to_chrome_trace(self):
+    events = []
+    for tid, name in {s["thread"]: s["thread_name"] for s in self.spans}.items():
+      events.append({"name": "thread_name", "ph": "M", "pid": 0, "tid": tid, "args": {"name": name}})
+    for s in self.spans:
+      events.append({"name": s["name"], "ph": "X", "pid": 0, "tid": s["thread"], "ts": s["start"] * 1e6,
+                     "dur": (s["end"] - s["start"]) * 1e6, "args": s["attrs"]})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+  def save(self, fpath, fmt="chrome"):
+    """writes the spans as a Chrome trace (`fmt="chrome"`) or as `to_json` (`fmt="json"`)"""
+    assert fmt in ["chrome", "json"], f"unknown trace format `{fmt}`"
+    with open(fpath, "w") as f:
+      json.dump(self.to_chrome_trace() if fmt == "chrome" else self.to_json(), f, default=str)
+
+  def save_profile(self, fpath):
+    """writes the `torch.profiler` capture as a Chrome trace"""
+    assert self.profiler is not None, "not profiled, see `profile`"
+    self.profiler.export_chrome_trace(fpath)
+
+
+def activate(*tracers):
+  """`Tracer.activate` for each of `tracers` that isn't None"""
+  tracers = [t for t in tracers if t is not None]
+  if not tracers:
+    return nullcontext()
+  if len(tracers) == 1:
+    return tracers[0].activate()
+
+  @contextmanager
+  def activate_all():
+    with tracers[0].activate():
+      with activate(*tracers[1:]):
+        yield
+
+  return activate_all()
+
+
+@contextmanager
+def span(name, **attrs):
+  """times the enclosed code as a `name` span in the active tracers; yields its attrs, which may still be added to"""
+  tracers = active_tracers.get()
+  if not tracers:
+    yield attrs
+    return
+  for device in {str(t.device) for t in tracers if t.device is not None}:
+    synchronize(device)
+  profiled = any(t.profile for t in tracers)
+  token = parent_span.set(name)
+  start = perf_counter()
+  try:
+    with torch.profiler.record_function(name) if profiled else nullcontext():
+      yield attrs
+  finally:
+    for device in {str(t.device) for t in tracers if t.device is not None}:
+      synchronize(device)
+    end = perf_counter()
+    parent_span.reset(token)
+    for tracer in tracers:
+      tracer.add(name, start, end, parent=parent_span.get(), **attrs)
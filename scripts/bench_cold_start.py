@@ -0,0 +1,88 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 10:20 AM
+"""import time and time-to-first-conversion of a fresh process, with and without `--preload`
+
+every run is a new interpreter (this script re-invoked with `--child`), so nothing is warm but the OS page cache.
+reported per run: seconds to import the inference modules, seconds until the preload thread is done (if any), and the
+latency of the first and second conversions of the same input, neither served from the f0 / feature caches. with
+`--idle` the first request arrives that many seconds after startup instead of once preloading is done, like a user
+picking a file in the UI
+"""
+import argparse
+import json
+import logging
+import subprocess
+import sys
+from time import perf_counter, sleep
+
+logger = logging.getLogger(__name__)
+
+
+def child(args):
+  t0 = perf_counter()
+  import numpy as np
+
+  from model.vc_infer_pipeline import f0_cache, feature_cache
+  from model.voice_pool import VoicePool
+  from utils.config import Config
+  from utils.misc_utils import load_audio
+  t_import = perf_counter() - t0
+
+  pool = VoicePool(Config(known_only=True))
+  result = {"import": t_import, "ready": None}
+  if args.preload:
+    thread = pool.preload(args.model, f0_method=args.f0_method)
+    if args.idle is None:
+      thread.join()
+      result["ready"] = perf_counter() - t0
+  if args.idle is not None:
+    sleep(max(0., args.idle - (perf_counter() - t0)))
+
+  if args.input:
+    audio = load_audio(args.input, 16000)
+  else:
+    audio = np.random.RandomState(1).randn(int(16000 * args.seconds)).astype(np.float32) * 0.1
+  for name in ["first", "second"]:
+    f0_cache.clear()  # the second conversion repeats all the work, with everything loaded and warm
+    feature_cache.clear()
+    t1 = perf_counter()
+    voice = pool.get(args.model)
+    voice.vc.pipeline(pool.hubert_model, voice.net_g, 0, audio, None, [0, 0, 0], 0, args.f0_method, args.index,
+                      0.75 if args.index else 0, voice.if_f0, 3, voice.tgt_sr, 0, 1, voice.version, 0.33)
+    result[name] = perf_counter() - t1
+  result["total"] = perf_counter() - t0
+  print(json.dumps(result))
+
+
+def main():
+  argparser = argparse.ArgumentParser()
+  argparser.add_argument('model', help='voice checkpoint (.pth) or bundle')
+  argparser.add_argument('-i', '--input', help='input audio fpath; random noise of `--seconds` if not given')
+  argparser.add_argument('-s', '--seconds', type=float, default=10.)
+  argparser.add_argument('-f', '--f0_method', default='rmvpe')
+  argparser.add_argument('--index', default='', help='retrieval index fpath')
+  argparser.add_argument('--idle', type=float, help='seconds after startup at which the first request arrives')
+  argparser.add_argument('-n', '--n_runs', type=int, default=2, help='runs per mode')
+  argparser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+  argparser.add_argument('--preload', action='store_true', help=argparse.SUPPRESS)
+  args, _ = argparser.parse_known_args()  # the rest goes to `Config`, e.g. `--backend onnx`
+  if args.child:
+    child(args)
+    return
+
+  print(f"{'mode':<10} {'import':>8} {'ready':>8} {'first':>8} {'second':>8} {'total':>8}")
+  for preload in [False, True]:
+    for _ in range(args.n_runs):
+      # no disk cache of HuBERT features, which would carry over from one child to the next
+      cmd = [sys.executable] + sys.argv + ["--child", "--feature_cache_dir", ""] + (["--preload"] if preload else [])
+      out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+      r = json.loads(out.strip().splitlines()[-1])
+      ready = f"{r['ready']:7.2f}s" if r["ready"] is not None else f"{'-':>8}"
+      print(f"{'preload' if preload else 'cold':<10} {r['import']:7.2f}s {ready} {r['first']:7.2f}s "
+            f"{r['second']:7.2f}s {r['total']:7.2f}s")
+
+
+if __name__ == '__main__':
+  main()
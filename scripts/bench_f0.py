@@ -0,0 +1,132 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 10:45 AM
+"""speed and accuracy of the f0 methods of `VC.compute_f0`, on CPU by default (FCPE vs RMVPE and harvest)
+
+the input is a synthetic harmonic voice with a known contour (glides with vibrato, separated by unvoiced gaps) plus
+noise, or audio files with `-i`, for which `--reference` stands in for the truth. each method runs on the whole signal
+and on the same audio cut into equal 3.7s slices (as `scripts/preprocess.py` writes them), the latter also through
+`FCPEInfer.batch` for FCPE, and harvest (segmented over `--workers` threads in `VC.compute_f0`) also in a single
+pyworld pass. reported: real-time factor, raw pitch accuracy (voiced frames within 50 cents), voicing decision error and
+the median error in cents over frames voiced in both; then how far segmented harvest strays from the single pass
+"""
+import argparse
+import logging
+from time import perf_counter
+
+import numpy as np
+
+from model.loaders import get_fcpe_model
+from model.vc_infer_pipeline import VC
+from model.world_f0 import world_f0
+from utils.config import Config
+from utils.misc_utils import load_audio
+
+logger = logging.getLogger(__name__)
+
+SR = 16000
+HOP = 160
+SLICE_SECONDS = 3.7
+
+
+def synth_voice(seconds, snr_db, seed=0):
+  """(audio, f0 per 10ms frame): 1.5s voiced notes gliding over 100-400Hz with 5.5Hz vibrato, 0.3s of silence apart"""
+  rng = np.random.default_rng(seed)
+  t = np.arange(int(SR * seconds)) / SR
+  f0 = np.zeros_like(t)
+  for start in np.arange(0.3, seconds - 1.5, 1.8):
+    lo, hi = rng.uniform(100, 250), rng.uniform(150, 400)
+    note = (t >= start) & (t < start + 1.5)
+    tn = t[note] - start
+    f0[note] = (lo + (hi - lo) * tn / 1.5) * 2 ** (0.3 * np.sin(2 * np.pi * 5.5 * tn) / 12)
+  phase = 2 * np.pi * np.cumsum(f0) / SR
+  audio = sum(np.where(k * f0 < SR / 2, np.sin(k * phase) / k, 0.) for k in range(1, 40))
+  audio *= 0.3 / np.abs(audio).max()
+  audio += rng.standard_normal(t.shape[0]) * np.sqrt(np.mean(audio[f0 > 0] ** 2) / 10 ** (snr_db / 10))
+  return audio.astype(np.float32), f0[::HOP]
+
+
+def scores(ref, f0):
+  n = min(ref.shape[0], f0.shape[0])
+  ref, f0 = ref[:n], f0[:n]
+  voiced = ref > 0
+  both = voiced & (f0 > 0)
+  cents = np.abs(1200 * np.log2(f0[both] / ref[both]))
+  rpa = np.sum(cents <= 50) / max(np.sum(voiced), 1)
+  vde = np.mean(voiced != (f0 > 0))
+  return rpa, vde, np.median(cents) if cents.size else float("nan")
+
+
+def time_fn(fn, n_iter):
+  fn()  # warm-up, and loads the model
+  t0 = perf_counter()
+  for _ in range(n_iter):
+    out = fn()
+  return (perf_counter() - t0) / n_iter, out
+
+
+def main():
+  argparser = argparse.ArgumentParser()
+  argparser.add_argument('-m', '--methods', nargs='+', default=['fcpe', 'rmvpe', 'harvest'])
+  argparser.add_argument('-i', '--inputs', nargs='+', help='audio fpaths; a synthetic voice if not given')
+  argparser.add_argument('-r', '--reference', default='rmvpe', help='method taken as the truth for `--inputs`')
+  argparser.add_argument('-s', '--seconds', type=float, default=30., help='synthetic voice duration')
+  argparser.add_argument('--snr', type=float, default=20., help='synthetic voice SNR in dB')
+  argparser.add_argument('-b', '--batch_size', type=int, default=16, help='slices per FCPE forward')
+  argparser.add_argument('-d', '--device', default='cpu')
+  argparser.add_argument('-w', '--workers', type=int, help='threads for segmented harvest; all cores if not given')
+  argparser.add_argument('-n', '--n_iter', type=int, default=2)
+  args, _ = argparser.parse_known_args()  # the rest goes to `Config`
+
+  config = Config(known_only=True)
+  if args.device != config.device:
+    config.device, config.is_half = args.device, False
+  if args.workers:
+    config.n_cpu = args.workers
+  vc = VC(40000, config)
+
+  if args.inputs:
+    audio = np.concatenate([load_audio(fpath, SR) for fpath in args.inputs])
+    ref = vc.compute_f0(audio, audio.shape[0] // HOP, args.reference)
+  else:
+    audio, ref = synth_voice(args.seconds, args.snr)
+  duration = audio.shape[0] / SR
+  slice_len = int(SLICE_SECONDS * SR)
+  slices = [audio[i:i + slice_len] for i in range(0, audio.shape[0] - slice_len + 1, slice_len)]
+
+  def run_slices(method):
+    return np.concatenate([vc.compute_f0(x, x.shape[0] // HOP, method) for x in slices])
+
+  def run_batched():
+    f0s = get_fcpe_model(vc.device).batch(slices, SR, batch_size=args.batch_size)
+    return np.concatenate([f0[:x.shape[0] // HOP] for x, f0 in zip(slices, f0s)])
+
+  def run_single():
+    return world_f0(audio.astype(np.double), SR, 50, 1100, 1000 * HOP / SR)
+
+  print(f"{duration:.1f}s of audio on {vc.device}, {len(slices)} slices of {SLICE_SECONDS}s")
+  print(f"{'method':<10} {'mode':<8} {'seconds':>8} {'rtf':>7} {'rpa':>6} {'vde':>6} {'cents':>6}")
+  for method in args.methods:
+    runs = [("long", lambda: vc.compute_f0(audio, audio.shape[0] // HOP, method)),
+            ("slices", lambda: run_slices(method))]
+    if method == "fcpe":
+      runs.append(("batched", run_batched))
+    elif method == "harvest":
+      runs.append(("single", run_single))
+    f0s = {}
+    for mode, fn in runs:
+      t, f0s[mode] = time_fn(fn, args.n_iter)
+      rpa, vde, cents = scores(ref, f0s[mode])
+      print(f"{method:<10} {mode:<8} {t:7.2f}s {t / duration:7.3f} {rpa:6.3f} {vde:6.3f} {cents:6.1f}")
+    if method == "harvest":
+      single, segmented = f0s["single"], f0s["long"]
+      both = (single > 0) & (segmented > 0)
+      cents = np.abs(1200 * np.log2(segmented[both] / single[both]))
+      print(f"segmented vs single-pass harvest over {vc.n_cpu} workers: voicing differs on "
+            f"{np.mean((single > 0) != (segmented > 0)):.2%} of frames, {np.mean(cents > 1):.2%} of voiced frames off "
+            f"by over 1 cent (max {cents.max() if cents.size else 0.:.1f})")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,74 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 6:20 AM
+"""parity + latency of `FrozenSynthesizer.infer` vs `SynthesizerTrnMs768NSFsid.infer` on a random-weight synthesizer"""
+import argparse
+import logging
+from time import perf_counter
+
+import torch
+
+from model.loaders import build_synthesizer
+from model.models import FrozenSynthesizer
+
+logger = logging.getLogger(__name__)
+
+
+def synth_inputs(n_frames, batch_size, device, dtype):
+  phone = torch.randn(batch_size, n_frames, 768, device=device, dtype=dtype)
+  lengths = torch.full((batch_size,), n_frames, device=device).long()
+  pitch = torch.randint(1, 255, (batch_size, n_frames), device=device).long()
+  pitchf = torch.rand(batch_size, n_frames, device=device) * 300 + 80
+  sid = torch.arange(batch_size, device=device).long()
+  return phone, lengths, pitch, pitchf, sid
+
+
+def time_infer(net_g, inputs, n_iter, device):
+  with torch.no_grad():
+    net_g.infer(*inputs)  # warm-up
+    if device.startswith("cuda"):
+      torch.cuda.synchronize()
+    t0 = perf_counter()
+    for _ in range(n_iter):
+      net_g.infer(*inputs)
+    if device.startswith("cuda"):
+      torch.cuda.synchronize()
+  return (perf_counter() - t0) / n_iter
+
+
+def main():
+  argparser = argparse.ArgumentParser()
+  argparser.add_argument('-c', '--config', default='configs/40k.json', help='model config fpath')
+  argparser.add_argument('-d', '--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+  argparser.add_argument('--half', action='store_true', help='run in fp16')
+  argparser.add_argument('-s', '--seconds', type=float, nargs='+', default=[2., 10.], help='chunk durations to time')
+  argparser.add_argument('-b', '--batch_size', type=int, default=1)
+  argparser.add_argument('-n', '--n_iter', type=int, default=5)
+  args = argparser.parse_args()
+
+  dtype = torch.float16 if args.half else torch.float32
+  net_g = build_synthesizer(args.config, is_half=args.half)[0]
+  frozen = build_synthesizer(args.config, is_half=args.half)[0]
+  frozen.load_state_dict(net_g.state_dict())
+  frozen = FrozenSynthesizer(frozen).eval().to(args.device).to(dtype)
+  net_g = net_g.to(args.device).to(dtype)
+  n_params = lambda m: sum(p.numel() for p in m.parameters())
+  print(f"params: {n_params(net_g) / 1e6:.2f}M -> {n_params(frozen) / 1e6:.2f}M")
+
+  for seconds in args.seconds:
+    inputs = synth_inputs(int(seconds * 100), args.batch_size, args.device, dtype)
+    with torch.no_grad():
+      torch.manual_seed(0)  # same noise draws in both
+      ref = net_g.infer(*inputs)[0]
+      torch.manual_seed(0)
+      out = frozen.infer(*inputs)[0]
+    diff = (ref.float() - out.float()).abs()
+    t_ref = time_infer(net_g, inputs, args.n_iter, args.device)
+    t_frozen = time_infer(frozen, inputs, args.n_iter, args.device)
+    print(f"{seconds:6.1f}s x{args.batch_size}: {t_ref * 1000:8.1f}ms -> {t_frozen * 1000:8.1f}ms "
+          f"(x{t_ref / t_frozen:.2f}), max |diff| {diff.max().item():.3g} / 32768 (mean {diff.mean().item():.3g})")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,120 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 8:05 AM
+"""numerical parity + real-time factor of the onnxruntime CPU backend vs PyTorch, for the synthesizer and RMVPE
+
+both models use random weights unless `--model` / `--rmvpe` are given. parity runs with the NSF source noise off and
+the same prior noise on both sides, at several lengths so the dynamic time axes are exercised; exits non-zero if any
+difference goes above `--atol`
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+import numpy as np
+import torch
+
+from bench_freeze import synth_inputs
+from model.loaders import build_synthesizer, load_synthesizer
+from model.models import FrozenSynthesizer
+from model.onnx_backend import OnnxSynthesizer, SynthesizerExport, export_rmvpe, export_synthesizer, make_session
+from model.rmvpe import E2E
+
+logger = logging.getLogger(__name__)
+
+
+def time_fn(fn, n_iter):
+  fn()  # warm-up
+  t0 = perf_counter()
+  for _ in range(n_iter):
+    fn()
+  return (perf_counter() - t0) / n_iter
+
+
+def check_synthesizer(net_g, onnx_fpath, seconds, n_threads, n_iter, atol):
+  session = make_session(onnx_fpath, n_threads=n_threads)
+  model = SynthesizerExport(net_g).eval()
+  ok = True
+  for sec in seconds:
+    phone, lengths, pitch, pitchf, sid = synth_inputs(int(sec * 100), 1, "cpu", torch.float32)
+    rnd = torch.randn(1, net_g.enc_p.out_channels, phone.shape[1])
+    with torch.no_grad():
+      ref = model(phone, lengths, pitch, pitchf, sid, rnd).numpy()
+    feed = {"phone": phone.numpy(), "phone_lengths": lengths.numpy(), "pitch": pitch.numpy(), "pitchf": pitchf.numpy(),
+            "sid": sid.numpy(), "rnd": rnd.numpy()}
+    out = session.run(["audio"], feed)[0]
+    diff = np.abs(ref - out)
+    ok &= bool(diff.max() <= atol) and ref.shape == out.shape
+
+    with torch.no_grad():
+      t_torch = time_fn(lambda: model(phone, lengths, pitch, pitchf, sid, rnd), n_iter)
+    t_onnx = time_fn(lambda: session.run(["audio"], feed), n_iter)
+    print(f"synthesizer {sec:6.1f}s: max |diff| {diff.max():.3g} / 32768 (mean {diff.mean():.3g}); "
+          f"rtf torch {t_torch / sec:.3f}, onnx {t_onnx / sec:.3f} (x{t_torch / t_onnx:.2f})")
+  return ok
+
+
+def check_rmvpe(model, onnx_fpath, seconds, n_threads, n_iter, atol):
+  session = make_session(onnx_fpath, n_threads=n_threads)
+  ok = True
+  for sec in seconds:
+    n_frames = 32 * (int(sec * 100) // 32 + 1)
+    mel = torch.randn(1, 128, n_frames)
+    with torch.no_grad():
+      ref = model(mel).numpy()
+    out = session.run(["hidden"], {"mel": mel.numpy()})[0]
+    diff = np.abs(ref - out)
+    ok &= bool(diff.max() <= atol) and ref.shape == out.shape
+
+    with torch.no_grad():
+      t_torch = time_fn(lambda: model(mel), n_iter)
+    t_onnx = time_fn(lambda: session.run(["hidden"], {"mel": mel.numpy()}), n_iter)
+    print(f"rmvpe E2E   {sec:6.1f}s: max |diff| {diff.max():.3g} (mean {diff.mean():.3g}); "
+          f"rtf torch {t_torch / sec:.3f}, onnx {t_onnx / sec:.3f} (x{t_torch / t_onnx:.2f})")
+  return ok
+
+
+def main():
+  argparser = argparse.ArgumentParser()
+  argparser.add_argument('-m', '--model', help='voice checkpoint (.pth); random weights from `--config` if not given')
+  argparser.add_argument('-c', '--config', default='configs/40k.json', help='model config fpath for random weights')
+  argparser.add_argument('--rmvpe', help='RMVPE state dict fpath; random weights if not given')
+  argparser.add_argument('-s', '--seconds', type=float, nargs='+', default=[1., 5., 10.], help='input durations')
+  argparser.add_argument('-t', '--n_threads', type=int, default=0, help='onnxruntime intra-op threads (0: default)')
+  argparser.add_argument('-n', '--n_iter', type=int, default=3)
+  argparser.add_argument('--atol', type=float, default=1., help='max abs audio difference on the int16 scale')
+  argparser.add_argument('--atol_rmvpe', type=float, default=1e-3, help='max abs salience difference')
+  args = argparser.parse_args()
+  if args.n_threads > 0:
+    torch.set_num_threads(args.n_threads)
+
+  if args.model:
+    net_g, cpt = load_synthesizer(args.model, "cpu", False)
+  else:
+    net_g = FrozenSynthesizer(build_synthesizer(args.config)[0]).eval()
+    cpt = {"config": [], "version": "v2", "f0": 1}
+  net_g.dec.m_source.l_sin_gen.add_noise = False  # before export, so neither side draws source noise
+  rmvpe = E2E(4, 1, (2, 2))
+  if args.rmvpe:
+    rmvpe.load_state_dict(torch.load(args.rmvpe, map_location="cpu"))
+  rmvpe.eval()
+
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    synth_fpath = os.path.join(tmp_dir, "synthesizer.onnx")
+    rmvpe_fpath = os.path.join(tmp_dir, "rmvpe.onnx")
+    export_synthesizer(net_g, cpt, synth_fpath)
+    export_rmvpe(rmvpe, rmvpe_fpath)
+    OnnxSynthesizer(synth_fpath)  # metadata round trip
+    ok = check_synthesizer(net_g, synth_fpath, args.seconds, args.n_threads, args.n_iter, args.atol)
+    ok &= check_rmvpe(rmvpe, rmvpe_fpath, args.seconds, args.n_threads, args.n_iter, args.atol_rmvpe)
+
+  print("parity ok" if ok else "parity FAILED")
+  sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,79 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 9:55 AM
+"""speed of `utils.resample` (numpy and torch) vs `librosa.resample`, on the rate pairs the pipeline uses
+
+each pair is timed on one long signal and on the same audio cut into 3.3s slices (as `scripts/preprocess.py` writes
+them), and the outputs are compared with librosa's as an SNR in dB
+"""
+import argparse
+import logging
+from time import perf_counter
+
+import librosa
+import numpy as np
+import torch
+
+from utils.resample import QUALITIES, resample, resample_torch
+
+logger = logging.getLogger(__name__)
+
+RATE_PAIRS = ["40000:16000", "48000:16000", "44100:16000", "32000:48000", "40000:44100"]
+
+
+def time_fn(fn, n_iter):
+  fn()  # warm-up, and builds any cached kernel
+  t0 = perf_counter()
+  for _ in range(n_iter):
+    out = fn()
+  return (perf_counter() - t0) / n_iter, out
+
+
+def snr(ref, out):
+  n = min(ref.shape[-1], out.shape[-1])
+  noise = np.sum(np.square(ref[..., :n] - out[..., :n]))
+  return 10 * np.log10(np.sum(np.square(ref[..., :n])) / max(noise, 1e-20))
+
+
+def main():
+  argparser = argparse.ArgumentParser()
+  argparser.add_argument('-r', '--rates', nargs='+', default=RATE_PAIRS, help='orig_sr:target_sr pairs')
+  argparser.add_argument('-s', '--seconds', type=float, default=60., help='signal duration')
+  argparser.add_argument('-q', '--quality', default='default', choices=list(QUALITIES))
+  argparser.add_argument('--res_type', default='kaiser_best', help='librosa `res_type` to compare with')
+  argparser.add_argument('-d', '--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+  argparser.add_argument('-n', '--n_iter', type=int, default=3)
+  args = argparser.parse_args()
+
+  print(f"{'rates':<12} {'mode':<7} {'librosa':>9} {'numpy':>9} {'torch':>9} {'numpy x':>8} {'torch x':>8} "
+        f"{'snr dB':>7}")
+  for pair in args.rates:
+    orig_sr, target_sr = map(int, pair.split(":"))
+    rng = np.random.default_rng(0)
+    # a band-limited signal, so the SNR measures the passband rather than how each filter treats its stopband
+    x = librosa.tone(440, sr=orig_sr, duration=args.seconds) + 0.1 * rng.standard_normal(int(orig_sr * args.seconds))
+    x = resample(resample(x.astype(np.float32), orig_sr, min(orig_sr, target_sr) // 2), min(orig_sr, target_sr) // 2,
+                 orig_sr)
+    slice_len = int(3.3 * orig_sr)
+    slices = [x[i:i + slice_len] for i in range(0, x.shape[0], slice_len)]
+
+    for mode, signals in [("long", [x]), ("slices", slices)]:
+      t_librosa, ref = time_fn(
+        lambda: [librosa.resample(s, orig_sr=orig_sr, target_sr=target_sr, res_type=args.res_type) for s in signals],
+        args.n_iter)
+      t_numpy, out = time_fn(lambda: [resample(s, orig_sr, target_sr, args.quality) for s in signals], args.n_iter)
+
+      def run_torch():
+        outs = [resample_torch(torch.from_numpy(s).to(args.device), orig_sr, target_sr, args.quality) for s in signals]
+        if args.device.startswith("cuda"):
+          torch.cuda.synchronize()
+        return outs
+
+      t_torch, _ = time_fn(run_torch, args.n_iter)
+      print(f"{pair:<12} {mode:<7} {t_librosa:8.3f}s {t_numpy:8.3f}s {t_torch:8.3f}s {t_librosa / t_numpy:7.1f}x "
+            f"{t_librosa / t_torch:7.1f}x {snr(np.concatenate(ref), np.concatenate(out)):7.1f}")
+
+
+if __name__ == '__main__':
+  main()
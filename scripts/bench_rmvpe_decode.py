@@ -0,0 +1,77 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 1:30 AM
+"""micro-benchmark for RMVPE local-average cents decoding: original per-frame loop vs vectorized numpy/torch"""
+import argparse
+import logging
+from time import perf_counter
+
+import numpy as np
+import torch
+
+from model.rmvpe import to_local_average_cents
+
+logger = logging.getLogger(__name__)
+
+
+def to_local_average_cents_loop(salience, cents_mapping, thred=0.05):
+  """the original per-frame implementation, kept here as reference"""
+  center = np.argmax(salience, axis=1)
+  salience = np.pad(salience, ((0, 0), (4, 4)))
+  center += 4
+  todo_salience = []
+  todo_cents_mapping = []
+  starts = center - 4
+  ends = center + 5
+  for idx in range(salience.shape[0]):
+    todo_salience.append(salience[:, starts[idx]: ends[idx]][idx])
+    todo_cents_mapping.append(cents_mapping[starts[idx]: ends[idx]])
+  todo_salience = np.array(todo_salience)
+  todo_cents_mapping = np.array(todo_cents_mapping)
+  product_sum = np.sum(todo_salience * todo_cents_mapping, 1)
+  weight_sum = np.sum(todo_salience, 1)
+  devided = product_sum / weight_sum
+  maxx = np.max(salience, axis=1)
+  devided[maxx <= thred] = 0
+  return devided
+
+
+def timeit(fn, n_iter):
+  fn()  # warm-up
+  t0 = perf_counter()
+  for _ in range(n_iter):
+    out = fn()
+  return (perf_counter() - t0) / n_iter, out
+
+
+def main():
+  argparser = argparse.ArgumentParser()
+  argparser.add_argument('-s', '--seconds', type=float, default=600., help='audio duration to simulate (100 frames/s)')
+  argparser.add_argument('-n', '--n_iter', type=int, default=5, help='number of timed iterations')
+  argparser.add_argument('--thred', type=float, default=0.03, help='voicing threshold')
+  args = argparser.parse_args()
+
+  n_frames = int(args.seconds * 100)
+  rng = np.random.default_rng(0)
+  salience = rng.random((n_frames, 360), dtype=np.float32) ** 8
+  # make some frames peak at the edges of the cents table to exercise the zero padding
+  salience[::97, 0] = 1.
+  salience[::89, -1] = 1.
+  cents_mapping = np.pad(20 * np.arange(360) + 1997.3794084376191, (4, 4))
+
+  t_loop, ref = timeit(lambda: to_local_average_cents_loop(salience, cents_mapping, args.thred), args.n_iter)
+  print(f"loop       : {t_loop * 1000:8.2f}ms")
+
+  t_np, out = timeit(lambda: to_local_average_cents(salience, cents_mapping, args.thred), args.n_iter)
+  print(f"numpy      : {t_np * 1000:8.2f}ms  x{t_loop / t_np:.1f}  bit-exact={np.array_equal(ref, out)}")
+
+  devices = ['cpu'] + (['cuda'] if torch.cuda.is_available() else [])
+  for device in devices:
+    salience_t = torch.from_numpy(salience).to(device)
+    t_torch, out = timeit(lambda: to_local_average_cents(salience_t, cents_mapping, args.thred), args.n_iter)
+    print(f"torch-{device:5s}: {t_torch * 1000:8.2f}ms  x{t_loop / t_torch:.1f}  bit-exact={np.array_equal(ref, out)}")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,106 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 3:10 AM
+"""benchmark for `VC.pipeline` split-point search: original 160-shift loop vs `find_split_points`
+
+the split points must be identical to the loop's, so besides the timed input they are compared on inputs with digital
+silence (pauses and zero padding), high-passed like the pipeline's input, over `--n_seeds` seeds. exits with 1 on any
+mismatch
+"""
+import argparse
+import logging
+import tracemalloc
+from time import perf_counter
+
+import numpy as np
+
+from model.vc_infer_pipeline import find_split_points, highpass_filter
+
+logger = logging.getLogger(__name__)
+
+
+def find_split_points_loop(audio, window, t_center, t_query):
+  """the original implementation, kept here as reference"""
+  audio_pad = np.pad(audio, (window // 2, window // 2), mode="reflect")
+  opt_ts = []
+  audio_sum = np.zeros_like(audio)
+  for i in range(window):
+    audio_sum += audio_pad[i: i - window]
+  for t in range(t_center, audio.shape[0], t_center):
+    opt_ts.append(
+      t
+      - t_query
+      + np.where(
+        np.abs(audio_sum[t - t_query: t + t_query])
+        == np.abs(audio_sum[t - t_query: t + t_query]).min()
+      )[0][0]
+    )
+  return opt_ts
+
+
+def measure(fn, n_iter):
+  fn()  # warm-up
+  t0 = perf_counter()
+  for _ in range(n_iter):
+    out = fn()
+  elapsed = (perf_counter() - t0) / n_iter
+  tracemalloc.start()
+  fn()
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return elapsed, peak, out
+
+
+def make_audio(seconds, sr=16000, seed=0, silence=False):
+  """speech-like noise bursts separated by short pauses, high-passed like the pipeline input. with `silence`, the
+  pauses are digital silence and the signal is zero-padded by a second on either end"""
+  from scipy import signal
+
+  rng = np.random.default_rng(seed)
+  n = int(seconds * sr)
+  audio = rng.standard_normal(n) * 0.1
+  envelope = np.repeat(rng.random(n // 1600 + 1) > 0.2, 1600)[:n]
+  if silence:
+    audio = np.pad(audio * envelope, (sr, sr))
+  else:
+    audio = audio * envelope + rng.standard_normal(n) * 1e-4
+  return signal.filtfilt(*highpass_filter(), audio)
+
+
+def main():
+  argparser = argparse.ArgumentParser()
+  argparser.add_argument('-s', '--seconds', type=float, default=600., help='audio duration (16k)')
+  argparser.add_argument('-n', '--n_iter', type=int, default=3, help='number of timed iterations')
+  argparser.add_argument('--x_query', type=int, default=6, help='Config.x_query (seconds)')
+  argparser.add_argument('--x_center', type=int, default=38, help='Config.x_center (seconds)')
+  argparser.add_argument('--n_seeds', type=int, default=10, help='seeds of the inputs with digital silence')
+  args = argparser.parse_args()
+
+  sr, window = 16000, 160
+  t_query, t_center = sr * args.x_query, sr * args.x_center
+  audio = make_audio(args.seconds, sr)
+
+  t_loop, mem_loop, ref = measure(lambda: find_split_points_loop(audio, window, t_center, t_query), args.n_iter)
+  print(f"loop      : {t_loop * 1000:8.2f}ms  peak {mem_loop / 1024 ** 2:7.2f}MB")
+  t_new, mem_new, out = measure(lambda: find_split_points(audio, window, t_center, t_query), args.n_iter)
+  print(f"vectorized: {t_new * 1000:8.2f}ms  peak {mem_new / 1024 ** 2:7.2f}MB  x{t_loop / t_new:.1f}")
+
+  n_mismatches = 0
+  cases = [("noise floor", out, ref)] + [
+    (f"silence seed {seed}", find_split_points(x, window, t_center, t_query),
+     find_split_points_loop(x, window, t_center, t_query))
+    for seed in range(args.n_seeds) for x in [make_audio(args.seconds, sr, seed=seed, silence=True)]]
+  for name, out, ref in cases:
+    ref, out = np.asarray(ref), np.asarray(out)
+    identical = np.array_equal(ref, out)
+    n_mismatches += not identical
+    if not identical:
+      print(f"MISMATCH {name}: {ref.tolist()} (loop) vs {out.tolist()}")
+  print(f"{len(cases) - n_mismatches}/{len(cases)} inputs with identical split points")
+  if n_mismatches:
+    raise SystemExit(1)
+
+
+if __name__ == '__main__':
+  main()
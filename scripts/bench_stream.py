@@ -0,0 +1,87 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 12:50 PM
+"""per-block latency and real-time factor of `model.vc_stream.StreamVC`, fed one block at a time as a live input would
+
+the input is an audio file (`-i`), decoded a second at a time with `utils.misc_utils.iter_audio` as a live source
+would deliver it, or the synthetic voice of `scripts/bench_f0.py`. the first `--warmup` blocks are left out of the
+stats. reported: the algorithmic latency (block + crossfade + SOLA search), mean / p95 / max compute time per block with
+its stages, and the real-time factor (compute time / block time); the stream keeps up while the max stays
+below 1. `-o` writes the converted stream
+"""
+import argparse
+import logging
+
+import numpy as np
+from scipy.io import wavfile
+
+from bench_f0 import synth_voice
+from model.loaders import load_hubert_model, load_synthesizer
+from model.vc_infer_pipeline import VC
+from model.vc_stream import STREAM_F0_METHODS, StreamVC
+from utils.config import Config
+from utils.misc_utils import iter_audio
+
+logger = logging.getLogger(__name__)
+
+
+def input_blocks(fpath, seconds, block_frame):
+  """the 16k input in pieces of `block_frame` samples (the last partial one dropped)"""
+  pending = np.zeros(0, dtype=np.float32)
+  for audio in iter_audio(fpath, 16000, block_seconds=1.) if fpath else [synth_voice(seconds, 30.)[0]]:
+    pending = np.concatenate([pending, audio])
+    n = pending.shape[0] // block_frame * block_frame
+    for start in range(0, n, block_frame):
+      yield pending[start:start + block_frame]
+    pending = pending[n:]
+
+
+def main():
+  argparser = argparse.ArgumentParser()
+  argparser.add_argument('model', help='voice checkpoint (.pth) in `weights`')
+  argparser.add_argument('-i', '--input', help='input audio fpath; a synthetic voice of `--seconds` if not given')
+  argparser.add_argument('-s', '--seconds', type=float, default=20.)
+  argparser.add_argument('-o', '--output', help='optional wav fpath for the converted stream')
+  argparser.add_argument('-f', '--f0_method', default='rmvpe', choices=STREAM_F0_METHODS)
+  argparser.add_argument('-k', '--f0_up_key', type=int, default=0, help='pitch translation in semi-tones')
+  argparser.add_argument('--index', default='', help='faiss index fpath')
+  argparser.add_argument('--index_rate', type=float, default=0.)
+  argparser.add_argument('--block_time', type=float, default=0.25, help='seconds per block')
+  argparser.add_argument('--crossfade_time', type=float, default=0.05)
+  argparser.add_argument('--extra_time', type=float, default=2.0, help='seconds of past context HuBERT sees')
+  argparser.add_argument('--warmup', type=int, default=2, help='blocks left out of the stats')
+  args, _ = argparser.parse_known_args()  # the rest goes to `Config`
+
+  config = Config(known_only=True)
+  net_g, cpt = load_synthesizer(args.model, config.device, config.is_half)  # torch: decodes `z_p` tails via `rate`
+  hubert_model = load_hubert_model(config.device, config.is_half)
+  tgt_sr = cpt["config"][-2]
+  index, big_npy = VC(tgt_sr, config).load_index(args.index, args.index_rate)
+  stream = StreamVC(hubert_model, net_g, tgt_sr, config, f0_up_key=args.f0_up_key, f0_method=args.f0_method,
+                    block_time=args.block_time, crossfade_time=args.crossfade_time, extra_time=args.extra_time,
+                    index=index, big_npy=big_npy, index_rate=args.index_rate, version=cpt.get("version", "v2"))
+
+  outs = []
+  for n_blocks, block in enumerate(input_blocks(args.input, args.seconds, stream.block_frame), 1):
+    outs.append(stream.process(block))
+    if n_blocks == args.warmup:
+      stream.timings = []
+  assert n_blocks > args.warmup, f"input too short for {args.warmup} warm-up blocks of {args.block_time}s"
+
+  stats = stream.stats()
+  totals = np.array([t["total"] for t in stream.timings])
+  print(f"{n_blocks} blocks of {stats['block_time']:.3f}s on {config.device} ({args.f0_method}), "
+        f"algorithmic latency {stats['latency'] * 1000:.0f}ms")
+  print(f"per block: mean {stats['mean_total'] * 1000:.1f}ms, p95 {stats['p95_total'] * 1000:.1f}ms, "
+        f"max {totals.max() * 1000:.1f}ms  (" +
+        ", ".join(f"{k} {stats[f'mean_{k}'] * 1000:.1f}ms" for k in ["hubert", "f0", "synth", "sola"]) + ")")
+  print(f"rtf: mean {stats['mean_rtf']:.3f}, max {stats['max_rtf']:.3f} -> "
+        f"{'keeps up with' if stats['max_rtf'] < 1 else 'falls behind'} real time")
+  if args.output:
+    wavfile.write(args.output, tgt_sr, np.concatenate(outs))
+    print(f"wrote {args.output}")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,304 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 11:40 AM
+"""end-to-end `VC.pipeline` benchmark on randomly initialized models, with JSON baselines for regression checks
+
+a voice is built per `--srs` from `configs/<sr>.json` with random weights and loaded like an exported one (frozen
+synthesizer). HuBERT and RMVPE are the real ones if found in `pretrain/` (unless `--random_models`), otherwise random
+models of the same architecture (HuBERT: a stand-in with hubert_base's conv front end and 12-layer encoder); likewise
+FCPE. with `--index_rows`, retrieval runs against a random flat index of that many rows
+
+every combination of `--srs`, `--precisions`, `--threads`, `--f0_methods` and `--durations` converts a synthetic voice
+(see `scripts/bench_f0.py`) `--n_iter` times after a warm-up, with neither f0 nor features cached across runs.
+reported: median real-time factor, peak RSS (and peak CUDA memory) during the runs and the median seconds per stage
+(see `utils.tracing`). precisions: `fp32`, `fp16` (the `is_half` path, GPU only) and `bf16` (fp32 models whose
+forwards run under `torch.autocast`, returning fp32 to the pipeline). `--save` writes the results as a baseline, `--baseline` compares with one and exits with 1 if any
+real-time factor got worse by more than `--tolerance`
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import platform
+import resource
+import tempfile
+from time import perf_counter, strftime
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from bench_f0 import synth_voice
+from model.loaders import build_synthesizer, get_shared_model, load_hubert_model, load_synthesizer
+from model.vc_infer_pipeline import VC, f0_cache
+from utils.config import Config
+from utils.misc_utils import FCPE_FPATH, HUBERT_FPATH, RMVPE_FPATH
+from utils.tracing import Tracer
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = ["fp32", "fp16", "bf16"]
+KEY_FIELDS = ["sr", "precision", "threads", "f0_method", "duration"]
+FCPE_CONFIG = {
+  "mel": {"sampling_rate": 16000, "num_mels": 128, "n_fft": 1024, "win_size": 1024, "hop_size": 160, "fmin": 0,
+          "fmax": 8000},
+  "model": {"input_channel": 128, "out_dims": 360, "n_layers": 12, "n_chans": 512, "use_siren": False,
+            "use_full": False, "f0_max": 1975.5, "f0_min": 32.70, "confidence": False},
+  "loss": {"loss_mse_scale": 10, "loss_l2_regularization": False, "loss_l2_regularization_scale": 1,
+           "loss_grad1_mse": False, "loss_grad1_mse_scale": 1},
+}
+
+
+class RandomHubert(nn.Module):
+  """random hubert_base-shaped model with the surface of fairseq's `HubertModel` that `VC` uses"""
+  def __init__(self, n_layers=12, dim=768):
+    super().__init__()
+    convs = [(512, 10, 5)] + [(512, 3, 2)] * 4 + [(512, 2, 2)] * 2
+    layers, in_channels = [], 1
+    for i, (channels, kernel_size, stride) in enumerate(convs):
+      layers += [nn.Conv1d(in_channels, channels, kernel_size, stride=stride, bias=False)]
+      layers += [nn.GroupNorm(channels, channels)] if i == 0 else []
+      layers += [nn.GELU()]
+      in_channels = channels
+    self.feature_extractor = nn.Sequential(*layers)
+    self.layer_norm = nn.LayerNorm(512)
+    self.post_extract_proj = nn.Linear(512, dim)
+    self.dropout_input = nn.Identity()
+    self.pos_conv = nn.Sequential(nn.Conv1d(dim, dim, 128, padding=64, groups=16), nn.GELU())
+    self.layers = nn.ModuleList([
+      nn.TransformerEncoderLayer(dim, 12, 4 * dim, dropout=0., activation="gelu", batch_first=True)
+      for _ in range(n_layers)])
+    self.final_proj = nn.Linear(dim, 256)
+
+  def forward_features(self, source):
+    return self.feature_extractor(source[:, None])
+
+  def encoder(self, x, padding_mask=None, layer=None):
+    x = x + self.pos_conv(x.transpose(1, 2))[..., :-1].transpose(1, 2)
+    for encoder_layer in self.layers[:None if layer is None else layer + 1]:
+      x = encoder_layer(x, src_key_padding_mask=padding_mask)
+    return x, None
+
+  def extract_features(self, source, padding_mask=None, output_layer=12):
+    x = self.post_extract_proj(self.layer_norm(self.forward_features(source).transpose(1, 2)))
+    return self.encoder(x, layer=output_layer - 1)[0], padding_mask
+
+
+def random_voice(sr, dirpath):
+  """fpath of a voice checkpoint with random weights for `configs/<sr>.json`, like `utils.process_ckpt` exports"""
+  torch.manual_seed(0)
+  net_g, config = build_synthesizer(f"configs/{sr}.json")
+  weight = {k: v.half() for k, v in net_g.state_dict().items()}
+  fpath = os.path.join(dirpath, f"random_{sr}.pth")
+  torch.save({"weight": weight, "config": config, "info": "random", "sr": sr, "f0": 1, "version": "v2"}, fpath)
+  return fpath
+
+
+def autocast_methods(module, methods, device):
+  """runs `module.<method>` for each of `methods` under bf16 autocast, casting its bf16 outputs back to fp32"""
+  def to_float(x):
+    if isinstance(x, torch.Tensor) and x.dtype == torch.bfloat16:
+      return x.float()
+    if isinstance(x, (tuple, list)):
+      return type(x)(to_float(y) for y in x)
+    return x
+
+  for name in methods:
+    def method(*args, fn=getattr(module, name), **kwargs):
+      with torch.autocast(str(device).split(":")[0], dtype=torch.bfloat16):
+        return to_float(fn(*args, **kwargs))
+
+    setattr(module, name, method)
+  return module
+
+
+def register_random_f0_models(device, is_half, dirpath, random_rmvpe, random_fcpe):
+  """puts random RMVPE / FCPE models where `model.loaders` looks for the shared ones"""
+  if random_rmvpe:
+    from model.rmvpe import E2E, RMVPE
+
+    rmvpe_fpath = os.path.join(dirpath, "rmvpe.pt")
+    if not os.path.exists(rmvpe_fpath):
+      torch.save(E2E(4, 1, (2, 2)).state_dict(), rmvpe_fpath)
+    get_shared_model("rmvpe", device, is_half, lambda: RMVPE(rmvpe_fpath, is_half=is_half, device=device))
+  if not random_fcpe:
+    return
+  from model.fcpe.model import FCPE, FCPEInfer
+
+  fcpe_fpath = os.path.join(dirpath, "fcpe.pt")
+  if not os.path.exists(fcpe_fpath):
+    torch.save({"config": FCPE_CONFIG, "model": FCPE(**FCPE_CONFIG["model"]).state_dict()}, fcpe_fpath)
+  get_shared_model("fcpe", device, False, lambda: FCPEInfer(fcpe_fpath, device=device))
+
+
+def random_index(rows, dirpath):
+  import faiss
+
+  fpath = os.path.join(dirpath, f"random_{rows}.index")
+  index = faiss.IndexFlatL2(768)
+  index.add(np.random.default_rng(0).standard_normal((rows, 768)).astype(np.float32))
+  faiss.write_index(index, fpath)
+  return fpath
+
+
+def reset_peak_rss():
+  try:
+    with open("/proc/self/clear_refs", "w") as f:
+      f.write("5")  # resets VmHWM
+  except OSError:
+    pass  # not linux: the peak stays the one of the whole process
+  if torch.cuda.is_available():
+    torch.cuda.reset_peak_memory_stats()
+
+
+def peak_rss_mb():
+  try:
+    with open("/proc/self/status") as f:
+      for line in f:
+        if line.startswith("VmHWM:"):
+          return int(line.split()[1]) / 1024
+  except OSError:
+    pass
+  maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  return maxrss / 1024 ** 2 if platform.system() == "Darwin" else maxrss / 1024
+
+
+def compare(results, baseline, tolerance):
+  """prints the real-time factor change of every result that is also in `baseline`; returns the regressed keys"""
+  base = {tuple(r[k] for k in KEY_FIELDS): r for r in baseline["results"] if "rtf" in r}
+  regressed = []
+  print(f"\n{'vs baseline':<44} {'base rtf':>9} {'rtf':>9} {'change':>8}")
+  for r in results:
+    key = tuple(r[k] for k in KEY_FIELDS)
+    if "rtf" not in r or key not in base:
+      continue
+    change = r["rtf"] / base[key]["rtf"] - 1
+    flag = "  REGRESSED" if change > tolerance else ""
+    if flag:
+      regressed.append(key)
+    print(f"{' '.join(map(str, key)):<44} {base[key]['rtf']:9.3f} {r['rtf']:9.3f} {change:+7.1%}{flag}")
+  return regressed
+
+
+def main():
+  argparser = argparse.ArgumentParser()
+  argparser.add_argument('--srs', nargs='+', default=['40k'], choices=['32k', '40k', '48k'])
+  argparser.add_argument('-d', '--durations', nargs='+', type=float, default=[5., 30., 120., 600.],
+                         help='input durations in seconds')
+  argparser.add_argument('-f', '--f0_methods', nargs='+', default=['rmvpe'])
+  argparser.add_argument('-p', '--precisions', nargs='+', default=['fp32'], choices=PRECISIONS)
+  argparser.add_argument('-t', '--threads', nargs='+', type=int, default=[torch.get_num_threads()],
+                         help='torch intra-op thread counts')
+  argparser.add_argument('-n', '--n_iter', type=int, default=3, help='timed runs per combination')
+  argparser.add_argument('--index_rows', type=int, default=0, help='rows of a random retrieval index (0: no retrieval)')
+  argparser.add_argument('--max_batch_samples', type=int, default=0, help='see `VC.pipeline`')
+  argparser.add_argument('--random_models', action='store_true', help='random HuBERT / RMVPE even if the real ones exist')
+  argparser.add_argument('--save', help='json fpath to write the results to, as a baseline')
+  argparser.add_argument('--baseline', help='json fpath of a baseline to compare with')
+  argparser.add_argument('--tolerance', type=float, default=0.1, help='relative rtf increase counted as a regression')
+  args, _ = argparser.parse_known_args()  # the rest goes to `Config`, e.g. `--backend onnx`
+
+  base_config = Config(known_only=True)
+  device = base_config.device
+  real_hubert = os.path.exists(HUBERT_FPATH) and not args.random_models
+  real_rmvpe = os.path.exists(RMVPE_FPATH) and not args.random_models
+  real_fcpe = os.path.exists(FCPE_FPATH) and not args.random_models
+  meta = {
+    "date": strftime("%Y-%m-%d %H:%M:%S"), "device": str(device), "torch": torch.__version__,
+    "cpu": platform.processor() or platform.machine(), "n_cpu": os.cpu_count(),
+    "hubert": "real" if real_hubert else "random", "rmvpe": "real" if real_rmvpe else "random",
+    "fcpe": "real" if real_fcpe else "random",
+    "index_rows": args.index_rows, "max_batch_samples": args.max_batch_samples, "n_iter": args.n_iter,
+  }
+  print(json.dumps(meta))
+  print(f"{'sr':<4} {'prec':<5} {'thr':>3} {'f0':<8} {'dur':>6} {'rtf':>7} {'rss MB':>8}  stages (s)")
+
+  results = []
+  with tempfile.TemporaryDirectory() as dirpath:
+    file_index = random_index(args.index_rows, dirpath) if args.index_rows > 0 else ""
+    for precision in args.precisions:
+      config = copy.copy(base_config)
+      config.is_half = precision == "fp16"
+      if config.is_half and not str(device).startswith("cuda"):
+        logger.warning("skipping fp16 on %s, which only runs fp32 / bf16", device)
+        continue
+      if real_hubert:
+        hubert_model = load_hubert_model(device, config.is_half)
+        hubert_model.feature_cache_id = None  # features are recomputed every run
+      else:
+        hubert_model = RandomHubert().to(device).eval()
+        hubert_model = hubert_model.half() if config.is_half else hubert_model
+      if precision == "bf16":
+        autocast_methods(hubert_model, ["extract_features", "forward_features", "encoder"], device)
+      register_random_f0_models(device, config.is_half, dirpath, not real_rmvpe, not real_fcpe)
+
+      for sr in args.srs:
+        net_g, cpt = load_synthesizer(random_voice(sr, dirpath), device, config.is_half)
+        if precision == "bf16":
+          autocast_methods(net_g, ["infer"], device)
+        tgt_sr = cpt["config"][-2]
+        vc = VC(tgt_sr, config)
+
+        def run(audio, f0_method, tracer=None):
+          f0_cache.clear()
+          vc.pipeline(hubert_model, net_g, 0, audio, None, [0, 0, 0], 0, f0_method, file_index,
+                      0.75 if file_index else 0, 1, 3, tgt_sr, 0, 0.25, "v2", 0.33,
+                      max_batch_samples=args.max_batch_samples, tracer=tracer)
+
+        for threads in args.threads:
+          torch.set_num_threads(threads)
+          for f0_method in args.f0_methods:
+            result = {"sr": sr, "precision": precision, "threads": threads, "f0_method": f0_method}
+            try:
+              run(synth_voice(5., 20.)[0], f0_method)  # warm-up
+            except Exception as e:
+              logger.exception("%s failed", result)
+              results += [dict(result, duration=d, error=repr(e)) for d in args.durations]
+              continue
+            for duration in args.durations:
+              result = dict(result, duration=duration)
+              audio = synth_voice(duration, 20.)[0]
+              seconds, stages = [], {}
+              reset_peak_rss()
+              try:
+                for _ in range(args.n_iter):
+                  tracer = Tracer(device)
+                  t0 = perf_counter()
+                  run(audio, f0_method, tracer)
+                  seconds.append(perf_counter() - t0)
+                  for name, x in tracer.summary().items():
+                    stages.setdefault(name, []).append(x["seconds"])
+              except Exception as e:
+                logger.exception("%s failed", result)
+                results.append(dict(result, error=repr(e)))
+                continue
+              result.update({
+                "seconds": float(np.median(seconds)),
+                "rtf": float(np.median(seconds)) / duration,
+                "peak_rss_mb": peak_rss_mb(),
+                "stages": {name: float(np.median(x)) for name, x in stages.items() if name != "pipeline"},
+              })
+              if torch.cuda.is_available():
+                result["peak_cuda_mb"] = torch.cuda.max_memory_allocated() / 1024 ** 2
+              results.append(result)
+              print(f"{sr:<4} {precision:<5} {threads:>3} {f0_method:<8} {duration:6.0f} {result['rtf']:7.3f} "
+                    f"{result['peak_rss_mb']:8.0f}  " + " ".join(f"{k} {v:.2f}" for k, v in result["stages"].items()))
+        del net_g, vc
+
+  if args.save:
+    with open(args.save, "w") as f:
+      json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"wrote {args.save}")
+  if args.baseline:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+    regressed = compare(results, baseline, args.tolerance)
+    if regressed:
+      print(f"{len(regressed)} regressions beyond {args.tolerance:.0%}")
+      raise SystemExit(1)
+
+
+if __name__ == '__main__':
+  main()
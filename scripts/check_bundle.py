@@ -0,0 +1,84 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 1:10 PM
+"""check that a voice bundle (see `utils.bundle`) can be re-exported while it is loaded, loading no model
+
+writes a bundle of random tensors and index, opens it as a server would (tensors and `big_npy` memory-mapped, nothing
+read yet), then re-exports a smaller one over it and only then reads the old mappings. they must still hold the old
+values (writing the files in place truncates them under the mappings, and the read dies of SIGBUS), a fresh open must
+see the new ones, and no temp file may be left behind. exits with 1 on any failure
+"""
+import argparse
+import logging
+import os
+import tempfile
+
+import numpy as np
+import torch
+
+from utils.bundle import VoiceBundle, write_bundle
+
+logger = logging.getLogger(__name__)
+
+
+def random_cpt(n_tensors, size, seed):
+  gen = torch.Generator().manual_seed(seed)
+  weight = {f"w{i}": torch.randn(size, generator=gen).half() for i in range(n_tensors)}
+  return {"weight": weight, "config": [], "info": f"seed {seed}", "sr": "40k", "f0": 1, "version": "v2"}
+
+
+def random_index(n_rows, seed):
+  import faiss
+
+  index = faiss.IndexFlatL2(768)
+  index.add(np.random.default_rng(seed).standard_normal((n_rows, 768)).astype(np.float32))
+  return index
+
+
+def same_tensors(state_dict, cpt):
+  weight = cpt["weight"]
+  return state_dict.keys() == weight.keys() and all(torch.equal(v, weight[k]) for k, v in state_dict.items())
+
+
+def main():
+  argparser = argparse.ArgumentParser()
+  argparser.add_argument('-n', '--n_tensors', type=int, default=16)
+  argparser.add_argument('-s', '--size', type=int, default=1 << 18, help='elements per tensor')
+  argparser.add_argument('-r', '--rows', type=int, default=20000, help='rows of the index')
+  args = argparser.parse_args()
+
+  failures = []
+  with tempfile.TemporaryDirectory() as dirpath:
+    bundle_dir = os.path.join(dirpath, "voice.rvc")
+    old_cpt, new_cpt = random_cpt(args.n_tensors, args.size, 0), random_cpt(args.n_tensors // 2, args.size, 1)
+    old_index, new_index = random_index(args.rows, 0), random_index(args.rows // 2, 1)
+    write_bundle(bundle_dir, old_cpt, index=old_index)
+
+    bundle = VoiceBundle(bundle_dir)
+    state_dict = bundle.state_dict()
+    big_npy = bundle.load_index()[1]
+    write_bundle(bundle_dir, new_cpt, index=new_index)
+    if not same_tensors(state_dict, old_cpt):
+      failures.append("the mapped tensors changed under the re-export")
+    if not np.array_equal(big_npy, old_index.reconstruct_n(0, old_index.ntotal)):
+      failures.append("the mapped big_npy changed under the re-export")
+
+    bundle = VoiceBundle(bundle_dir)
+    if not same_tensors(bundle.state_dict(), new_cpt) or bundle.meta["info"] != new_cpt["info"]:
+      failures.append("reopening didn't load the re-exported tensors")
+    if bundle.load_index()[0].ntotal != new_index.ntotal:
+      failures.append("reopening didn't load the re-exported index")
+    leftover = [fname for fname in os.listdir(bundle_dir) if fname.endswith(".tmp")]
+    if leftover:
+      failures.append(f"temp files left behind: {leftover}")
+
+  for failure in failures:
+    print(f"FAIL  {failure}")
+  print("re-export while loaded: " + ("failed" if failures else "ok"))
+  if failures:
+    raise SystemExit(1)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,84 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 12:30 PM
+"""smoke check of the command lines of the CLIs that share argv with `utils.config.Config`, loading no model
+
+every case is parsed by the CLI's own parser and by `Config`'s, each taking the arguments it knows, as happens when the
+CLI runs; it fails if either rejects the command line or reads another value than expected, or if an option is known to
+neither. exits with 1 on any failure
+"""
+import argparse
+import io
+import logging
+import shlex
+from contextlib import redirect_stderr
+
+from infer_batch import build_argparser as infer_batch_argparser
+from quantize_voice import build_argparser as quantize_voice_argparser
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# (CLI, its parser, command line, expected values of the CLI's args, expected values of `Config`'s)
+CASES = [
+  ("infer_batch", infer_batch_argparser, "v.pth in out --index x.index",
+   {"index": "x.index"}, {"index_nprobe": 0}),
+  ("infer_batch", infer_batch_argparser, "v.pth in out -i x.index --index_rate 0.5",
+   {"index": "x.index", "index_rate": 0.5}, {"index_nprobe": 0}),
+  ("infer_batch", infer_batch_argparser, "v.pth in out --backend onnx --index x.index --index_nprobe 8",
+   {"index": "x.index"}, {"backend": "onnx", "index_nprobe": 8}),
+  ("infer_batch", infer_batch_argparser, "v.pth in out --max_batch_samples 320000 --trace_dir t --feature_cache_dir ''",
+   {"max_batch_samples": 320000, "trace_dir": "t"}, {"feature_cache_dir": "", "trace_dir": "t"}),
+  ("infer_batch", infer_batch_argparser, "v.pth in out --quantize hubert,synth -i x.index",
+   {"index": "x.index"}, {"quantize": "hubert,synth"}),
+  ("infer_batch", infer_batch_argparser, "v.pth in out --f0_cache_dir cache/f0 --f0_cache_gb 2 -f harvest",
+   {"f0_method": "harvest"}, {"f0_cache_dir": "cache/f0", "f0_cache_gb": 2.}),
+  ("quantize_voice", quantize_voice_argparser, "v.pth a.wav b.wav --stages hubert dec --dry_run",
+   {"clips": ["a.wav", "b.wav"], "stages": ["hubert", "dec"], "dry_run": True}, {"quantize": ""}),
+  ("quantize_voice", quantize_voice_argparser, "v.pth clips --feature_cache_dir '' --report r.json",
+   {"clips": ["clips"], "report": "r.json"}, {"feature_cache_dir": ""}),
+]
+
+
+def parse(parser, argv):
+  """(namespace, leftover args, None) or (None, None, error message)"""
+  stderr = io.StringIO()
+  try:
+    with redirect_stderr(stderr):
+      return (*parser.parse_known_args(argv), None)
+  except SystemExit:
+    return None, None, stderr.getvalue().strip().splitlines()[-1]
+
+
+def check(args, expected):
+  wrong = {k: getattr(args, k, None) for k, v in expected.items() if getattr(args, k, None) != v}
+  return f"read {wrong}, expected {({k: expected[k] for k in wrong})}" if wrong else None
+
+
+def main():
+  argparser = argparse.ArgumentParser()
+  argparser.add_argument('-v', '--verbose', action='store_true', help='also print the cases that pass')
+  args = argparser.parse_args()
+
+  n_failed = 0
+  for name, build_argparser, cmd, expected, expected_config in CASES:
+    argv = shlex.split(cmd)
+    errors = {}
+    cli_args, rest, errors[name] = parse(build_argparser(), argv)
+    config_args, config_rest, errors["Config"] = parse(Config.build_parser(), argv)
+    if cli_args is not None and config_args is not None:
+      errors[name], errors["Config"] = check(cli_args, expected), check(config_args, expected_config)
+      unknown = [x for x in rest if x.startswith("-") and x in config_rest]
+      errors["both"] = f"unrecognized arguments: {' '.join(unknown)}" if unknown else None
+    errors = [f"{who}: {e}" for who, e in errors.items() if e is not None]
+    n_failed += bool(errors)
+    if errors or args.verbose:
+      print(f"{'FAIL' if errors else 'ok':<5} {name} {cmd}" + "".join(f"\n      {e}" for e in errors))
+  print(f"{len(CASES) - n_failed}/{len(CASES)} command lines ok")
+  if n_failed:
+    raise SystemExit(1)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,48 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 7:05 AM
+"""converts an exported `.pth` voice and its `.index` into a memory-mapped voice bundle (see `utils.bundle`)"""
+import argparse
+import logging
+import os
+from time import perf_counter
+
+import torch
+
+from utils.bundle import BUNDLE_EXT, VoiceBundle, export_bundle
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+  argparser = argparse.ArgumentParser()
+  argparser.add_argument('model', help='exported voice checkpoint (.pth), e.g. in `weights`')
+  argparser.add_argument('-i', '--index', help='matching faiss index fpath, e.g. `logs/<exp>/added_*.index`')
+  argparser.add_argument('-o', '--output', help=f'output bundle dirpath (default: model fpath with `{BUNDLE_EXT}`)')
+  argparser.add_argument('--verify', action='store_true', help='reload the bundle and compare it against the model')
+  args = argparser.parse_args()
+
+  out_dir = args.output or os.path.splitext(args.model)[0] + BUNDLE_EXT
+  export_bundle(args.model, out_dir, index_fpath=args.index)
+  print(f"wrote {out_dir}")
+
+  if args.verify:
+    t0 = perf_counter()
+    cpt = torch.load(args.model, map_location="cpu")
+    t_pickle = perf_counter() - t0
+    t0 = perf_counter()
+    bundle = VoiceBundle(out_dir)
+    bundle_cpt = bundle.cpt()
+    t_bundle = perf_counter() - t0
+    assert cpt["config"] == bundle_cpt["config"]
+    for key, value in cpt["weight"].items():
+      assert torch.equal(value, bundle_cpt["weight"][key]), key
+    if args.index:
+      index, big_npy = bundle.load_index()
+      print(f"index: ntotal={index.ntotal}, big_npy={big_npy.shape}")
+    print(f"verified {len(cpt['weight'])} tensors; open: torch.load {t_pickle * 1000:.1f}ms, bundle {t_bundle * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+  main()
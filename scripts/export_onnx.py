@@ -0,0 +1,42 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 7:45 AM
+"""exports a voice's synthesizer (and optionally RMVPE) to onnx for the onnxruntime CPU backend (`--backend onnx`)
+
+the voice is written next to its checkpoint as `<name>.onnx`, which is where `load_synthesizer` looks for it
+"""
+import argparse
+import logging
+import os
+
+from model.loaders import load_synthesizer
+from model.onnx_backend import DEFAULT_OPSET, ONNX_EXT, export_rmvpe, export_synthesizer
+from utils.misc_utils import RMVPE_FPATH, RMVPE_ONNX_FPATH
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+  argparser = argparse.ArgumentParser()
+  argparser.add_argument('model', nargs='?', help='exported voice checkpoint (.pth) or bundle, e.g. in `weights`')
+  argparser.add_argument('-o', '--output', help=f'output fpath (default: model fpath with `{ONNX_EXT}`)')
+  argparser.add_argument('--rmvpe', action='store_true', help=f'also export `{RMVPE_FPATH}` to `{RMVPE_ONNX_FPATH}`')
+  argparser.add_argument('--opset', type=int, default=DEFAULT_OPSET, help='onnx opset version')
+  args = argparser.parse_args()
+  if args.model is None and not args.rmvpe:
+    argparser.error('nothing to export: pass a model and/or `--rmvpe`')
+
+  if args.model is not None:
+    net_g, cpt = load_synthesizer(args.model, "cpu", False)
+    out_fpath = args.output or os.path.splitext(args.model.rstrip("/"))[0] + ONNX_EXT
+    export_synthesizer(net_g, cpt, out_fpath, opset=args.opset)
+    print(f"wrote {out_fpath}")
+
+  if args.rmvpe:
+    export_rmvpe(RMVPE_FPATH, RMVPE_ONNX_FPATH, opset=args.opset)
+    print(f"wrote {RMVPE_ONNX_FPATH}")
+
+
+if __name__ == '__main__':
+  main()
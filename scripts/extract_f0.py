@@ -8,12 +8,10 @@ import traceback
 from multiprocessing import Process
 
 import numpy as np
-import parselmouth
-import pyworld
 import torch
-import torchcrepe
 
-from utils.misc_utils import get_device, load_audio, RMVPE_FPATH
+from model.world_f0 import segmented_f0
+from utils.misc_utils import get_device, load_audio, FCPE_FPATH, RMVPE_FPATH
 
 logging.getLogger("numba").setLevel(logging.WARNING)
 
@@ -22,9 +20,10 @@ argparser = argparse.ArgumentParser()
 argparser.add_argument('exp_dir', help='experiment dirpath')
 argparser.add_argument('-n', '--num_proc', type=int, default=4, help='number of processes to use')
 argparser.add_argument('-f', '--f0_method', type=str.lower, default='rmvpe', help='which f0 extraction algorithm to use',
-                       choices=['pm', 'harvest', 'dio', 'crepe', 'mangio', 'mangio-crepe', 'rmvpe'])
+                       choices=['pm', 'harvest', 'dio', 'crepe', 'mangio', 'mangio-crepe', 'rmvpe', 'fcpe'])
 argparser.add_argument('--crepe_batch_size', type=int, default=512, help='batch size when using CREPE')
 argparser.add_argument('--mangio_hop_length', type=int, default=160, help='hop length when using MANGIO-CREPE')
+argparser.add_argument('--fcpe_batch_size', type=int, default=16, help='clips per forward when using FCPE')
 
 args= argparser.parse_args()
 exp_dir = args.exp_dir
@@ -38,8 +37,13 @@ if f0method == 'crepe':
 elif 'mangio' in f0method:
   crepe_batch_size_or_hop_length = args.mangio_hop_length
   print("Mangio-CREPE Hop Length:", crepe_batch_size_or_hop_length)
+elif f0method == 'fcpe':
+  crepe_batch_size_or_hop_length = args.fcpe_batch_size
+  print("FCPE Batch Size:", crepe_batch_size_or_hop_length)
 
 device = get_device()
+# pyworld methods split long clips over threads (see `model.world_f0`), the cores shared among the processes
+n_world_workers = max(1, (os.cpu_count() or 1) // n_p)
 
 class FeatureInput(object):
   def __init__(self, samplerate=16000, hop_size=160, is_half=False):
@@ -53,6 +57,7 @@ class FeatureInput(object):
     self.f0_mel_max = 1127 * np.log(1 + self.f0_max / 700)
 
     self.rmvpe = None
+    self.fcpe = None
     self.is_half = is_half  # TODO: make this customizable
 
 
@@ -60,7 +65,10 @@ class FeatureInput(object):
   def compute_f0(self, path, f0_method, batch_size_or_hop_length):
     x = load_audio(path, self.fs)
     p_len = x.shape[0] // self.hop
+    # each method's dependency is imported only when it's used
     if f0_method == "pm":
+      import parselmouth
+
       time_step = 160 / 16000 * 1000
       f0_min = 50
       f0_max = 1100
@@ -77,26 +85,13 @@ class FeatureInput(object):
       pad_size = (p_len - len(f0) + 1) // 2
       if pad_size > 0 or p_len - len(f0) - pad_size > 0:
         f0 = np.pad(f0, [[pad_size, p_len - len(f0) - pad_size]], mode="constant")
-    elif f0_method == "harvest":
-      f0, t = pyworld.harvest(
-        x.astype(np.double),
-        fs=self.fs,
-        f0_ceil=self.f0_max,
-        f0_floor=self.f0_min,
-        frame_period=1000 * self.hop / self.fs,
-      )
-      f0 = pyworld.stonemask(x.astype(np.double), f0, t, self.fs)
-    elif f0_method == "dio":
-      f0, t = pyworld.dio(
-        x.astype(np.double),
-        fs=self.fs,
-        f0_ceil=self.f0_max,
-        f0_floor=self.f0_min,
-        frame_period=1000 * self.hop / self.fs,
-      )
-      f0 = pyworld.stonemask(x.astype(np.double), f0, t, self.fs)
+    elif f0_method in ["harvest", "dio"]:
+      f0 = segmented_f0(x.astype(np.double), self.fs, self.f0_min, self.f0_max, 1000 * self.hop / self.fs,
+                        method=f0_method, n_workers=n_world_workers)
 
     elif f0_method == 'crepe':
+      import torchcrepe
+
       # Pick a batch size that doesn't cause memory errors on your gpu
 
       model = "full"
@@ -121,6 +116,8 @@ class FeatureInput(object):
       f0 = f0[0].cpu().numpy()
 
     elif f0_method in ['mangio', 'mangio-crepe']:
+      import torchcrepe
+
       # print("Performing crepe pitch extraction. (EXPERIMENTAL)")
       # print("CREPE PITCH EXTRACTION HOP LENGTH: " + str(crepe_hop_length))
       x = x.astype(np.float32)
@@ -166,11 +163,23 @@ class FeatureInput(object):
 
       f0 = self.rmvpe.infer_from_audio(x, thred=0.03)
 
+    elif f0_method == 'fcpe':
+      f0 = self.compute_f0_fcpe([x], batch_size_or_hop_length)[0]
+
     else:
       raise ValueError(f'f0 method `{f0_method}` not understood')
 
     return f0
 
+  def compute_f0_fcpe(self, xs, batch_size):
+    """FCPE f0 of each 16k clip in `xs`, `batch_size` clips of equal length per forward"""
+    if self.fcpe is None:
+      from model.fcpe.model import FCPEInfer
+      print("loading fcpe model")
+      self.fcpe = FCPEInfer(FCPE_FPATH, device=device)
+
+    return self.fcpe.batch(xs, self.fs, batch_size=batch_size)
+
   def coarse_f0(self, f0):
     f0_mel = 1127 * np.log(1 + f0 / 700)
     f0_mel[f0_mel > 0] = (f0_mel[f0_mel > 0] - self.f0_mel_min) * (self.f0_bin - 2) / (self.f0_mel_max - self.f0_mel_min) + 1
@@ -188,6 +197,9 @@ class FeatureInput(object):
     else:
       print("todo-f0-%s" % len(paths))
       n = max(len(paths) // 5, 1)  # 每个进程最多打印5条
+      if f0_method == 'fcpe':
+        self.go_batched(paths, batch_size_or_hop_length)
+        return
       for idx, (inp_path, opt_path1, opt_path2) in enumerate(paths):
         try:
           if idx % n == 0:
@@ -201,9 +213,25 @@ class FeatureInput(object):
         except:
           print("f0fail-%s-%s-%s" % (idx, inp_path, traceback.format_exc()))
 
+  def go_batched(self, paths, batch_size):
+    # slices of the same source mostly share a length and sort next to each other, so a few batches' worth of clips
+    # are loaded at a time for `FCPEInfer.batch` to group
+    paths = [p for p in paths if not (os.path.exists(p[1] + ".npy") and os.path.exists(p[2] + ".npy"))]
+    chunk_size = batch_size * 8
+    for start in range(0, len(paths), chunk_size):
+      chunk = paths[start:start + chunk_size]
+      try:
+        print("f0ing,now-%s,all-%s,-%s" % (start, len(paths), chunk[0][0]))
+        xs = [load_audio(inp_path, self.fs) for inp_path, _, _ in chunk]
+        for (_, opt_path1, opt_path2), featur_pit in zip(chunk, self.compute_f0_fcpe(xs, batch_size)):
+          np.save(opt_path2, featur_pit, allow_pickle=False,)  # nsf
+          np.save(opt_path1, self.coarse_f0(featur_pit), allow_pickle=False,)  # ori
+      except:
+        print("f0fail-%s-%s-%s" % (start, chunk[0][0], traceback.format_exc()))
+
 
 if __name__ == "__main__":
-  if 'mangio' in f0method or 'rmvpe' in f0method:
+  if 'mangio' in f0method or f0method in ['rmvpe', 'fcpe']:
     torch.multiprocessing.set_start_method('spawn')
   # exp_dir=r"E:\codes\py39\dataset\mi-test"
   # n_p=16
@@ -9,8 +9,6 @@ import numpy as np
 import soundfile as sf
 import torch
 import torch.nn.functional as F
-from fairseq import checkpoint_utils
-from transformers import HubertModel
 
 from utils.misc_utils import get_device, HUBERT_FPATH
 
@@ -46,16 +44,21 @@ def readwave(wav_path, normalize=False):
   return feats
 
 
-# HuBERT model
+# HuBERT model; fairseq and transformers are each imported only for the model that uses them
 if args.kor:
+  from transformers import HubertModel
+
   model = HubertModel.from_pretrained("team-lucid/hubert-base-korean")
   model = model.to(device)
   print("move model to %s" % device)
   if device not in ["mps", "cpu"]:
     model = model.half()
   model.eval()
+  normalize = False
 
 else:
+  from fairseq import checkpoint_utils
+
   print("load model(s) from {}".format(HUBERT_FPATH))
   # if hubert model is exist
   if os.access(HUBERT_FPATH, os.F_OK) == False:
@@ -68,6 +71,7 @@ else:
   if device not in ["mps", "cpu"]:
     model = model.half()
   model.eval()
+  normalize = saved_cfg.task.normalize
 
 todo = sorted(list(os.listdir(wavPath)))
 n = max(1, len(todo) // 10)  # 最多打印十条
@@ -84,7 +88,7 @@ else:
         if os.path.exists(out_path):
           continue
 
-        feats = readwave(wav_path, normalize=saved_cfg.task.normalize)
+        feats = readwave(wav_path, normalize=normalize)
         feats = feats.half().to(device) if device not in ["mps", "cpu"] else feats.to(device)
 
         if args.kor:
@@ -0,0 +1,216 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 3:55 AM
+"""headless batch conversion of a directory (or manifest) of audio files with a single loaded voice
+
+the voice, HuBERT and the index are loaded once. a background thread decodes the next `--prefetch` inputs while the
+current one is converted, and outputs are written from a separate thread. prints a per-file real-time factor (compute
+time / audio duration) and the overall throughput in hours of audio per hour. with `--trace_dir`, each file's stages
+(decode included) are also written there as a Chrome trace, and summed per stage in the report
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import numpy as np
+from scipy.io import wavfile
+
+from model.loaders import load_hubert_model, load_synthesizer
+from model.retrieval import index_registry
+from model.vc_infer_pipeline import VC
+from utils.config import Config
+from utils.misc_utils import load_audio
+from utils.tracing import Tracer
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTS = (".wav", ".flac", ".mp3", ".ogg", ".m4a", ".aac", ".opus")
+
+
+def collect_inputs(inputs):
+  """returns [(input path, output path relative to the output dir)] for a directory or a manifest file
+
+  a manifest lists one input path per line; empty lines and lines starting with `#` are skipped
+  """
+  if os.path.isdir(inputs):
+    out = []
+    for root, _, fnames in os.walk(inputs):
+      for fname in fnames:
+        if fname.lower().endswith(AUDIO_EXTS):
+          fpath = os.path.join(root, fname)
+          out.append((fpath, os.path.splitext(os.path.relpath(fpath, inputs))[0] + ".wav"))
+    return sorted(out)
+
+  with open(inputs) as f:
+    fpaths = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+  out, seen = [], {}
+  for fpath in fpaths:
+    name = os.path.splitext(os.path.basename(fpath))[0]
+    seen[name] = seen.get(name, 0) + 1
+    if seen[name] > 1:  # same basename from different dirs
+      name = f"{name}_{seen[name] - 1}"
+    out.append((fpath, name + ".wav"))
+  return out
+
+
+def prefetch_audio(items, q, new_tracer=None):
+  """decodes inputs ahead of the converter; puts (fpath, out_name, audio or exception, decode time, tracer or None),
+  then None. the tracer of each input comes from `new_tracer()` and already holds its `decode` span"""
+  for fpath, out_name in items:
+    tracer = new_tracer() if new_tracer is not None else None
+    t0 = perf_counter()
+    try:
+      audio = load_audio(fpath, 16000)
+      audio_max = np.abs(audio).max() / 0.95
+      if audio_max > 1:
+        audio /= audio_max
+    except Exception as e:
+      audio = e
+    t1 = perf_counter()
+    if tracer is not None and not isinstance(audio, Exception):
+      tracer.add("decode", t0, t1, samples=audio.shape[0])
+    q.put((fpath, out_name, audio, t1 - t0, tracer))
+  q.put(None)
+
+
+def write_audio(fpath, sr, audio):
+  os.makedirs(os.path.dirname(fpath) or ".", exist_ok=True)
+  wavfile.write(fpath, sr, audio)
+
+
+def build_argparser():
+  argparser = argparse.ArgumentParser()
+  argparser.add_argument('model', help='voice checkpoint (.pth) in `weights`')
+  argparser.add_argument('inputs', help='input dirpath, or a manifest file with one audio path per line')
+  argparser.add_argument('output_dir', help='output dirpath; directory inputs keep their relative layout')
+  argparser.add_argument('-i', '--index', default='', help='faiss index fpath')
+  argparser.add_argument('--index_rate', type=float, default=0.33, help='feature ratio')
+  argparser.add_argument('-k', '--f0_up_key', type=int, default=0, help='pitch translation in semi-tones')
+  argparser.add_argument('-f', '--f0_method', default='rmvpe', help='pitch extraction algorithm')
+  argparser.add_argument('--filter_radius', type=int, default=3, help='median filter radius for harvest')
+  argparser.add_argument('--resample_sr', type=int, default=0, help='target sample rate (0 if no resampling)')
+  argparser.add_argument('--rms_mix_rate', type=float, default=0., help='volume envelope mix rate')
+  argparser.add_argument('--protect', type=float, default=0.33, help='voiceless consonant protection')
+  argparser.add_argument('--sid', type=int, default=0, help='speaker id')
+  argparser.add_argument('--max_batch_samples', type=int, default=0,
+                         help='if > 0, synthesizes chunks in padded batches of at most this many 16k samples')
+  argparser.add_argument('--prefetch', type=int, default=4, help='number of decoded inputs to keep ahead')
+  argparser.add_argument('--skip_existing', action='store_true', help='skip inputs whose output already exists')
+  argparser.add_argument('--report', help='optional json fpath for the per-file throughput report')
+  argparser.add_argument('--trace_dir', help='dirpath for a Chrome trace of the stages of each file')
+  argparser.add_argument('--profile', action='store_true',
+                         help='also capture `torch.profiler` per file, as `<output name>.profile.json` in `--trace_dir`')
+  return argparser
+
+
+def main():
+  argparser = build_argparser()
+  args, rest = argparser.parse_known_args()  # the rest goes to `Config`, e.g. `--backend onnx`
+  unknown = Config.build_parser().parse_known_args(rest)[1]
+  if unknown:
+    argparser.error(f"unrecognized arguments: {' '.join(unknown)}")
+  if args.profile and not args.trace_dir:
+    argparser.error('`--profile` needs `--trace_dir`')
+
+  config = Config(known_only=True)
+  net_g, cpt = load_synthesizer(args.model, config.device, config.is_half, backend=config.backend,
+                                quantize="synth" in config.quantize)
+  tgt_sr = cpt["config"][-2]
+  version = cpt.get("version", "v2")
+  hubert_model = load_hubert_model(config.device, config.is_half, quantize="hubert" in config.quantize)
+  vc = VC(tgt_sr, config)
+  if args.index and args.index_rate != 0:
+    index_registry.get(args.index)  # load once up front rather than inside the first conversion
+  out_sr = args.resample_sr if tgt_sr != args.resample_sr >= 16000 else tgt_sr
+
+  items = collect_inputs(args.inputs)
+  if args.skip_existing:
+    items = [x for x in items if not os.path.exists(os.path.join(args.output_dir, x[1]))]
+  logger.info("converting %d files with %s", len(items), args.model)
+
+  q = queue.Queue(maxsize=max(args.prefetch, 1))
+  new_tracer = (lambda: Tracer(config.device, profile=args.profile)) if args.trace_dir else None
+  threading.Thread(target=prefetch_audio, args=(items, q, new_tracer), daemon=True).start()
+  writer = ThreadPoolExecutor(max_workers=1)
+
+  report, writes = [], []
+  t_start = perf_counter()
+  while True:
+    item = q.get()
+    if item is None:
+      break
+    fpath, out_name, audio, t_decode, tracer = item
+    if isinstance(audio, Exception):
+      logger.error("failed to decode %s: %s", fpath, audio)
+      continue
+
+    times = [0, 0, 0]
+    t0 = perf_counter()
+    try:
+      audio_opt = vc.pipeline(
+        hubert_model, net_g, args.sid, audio, fpath, times, args.f0_up_key, args.f0_method, args.index,
+        args.index_rate, 1, args.filter_radius, tgt_sr, args.resample_sr, args.rms_mix_rate, version, args.protect,
+        max_batch_samples=args.max_batch_samples, tracer=tracer,
+      )
+    except Exception:
+      logger.error("failed to convert %s:\n%s", fpath, traceback.format_exc())
+      continue
+    t_convert = perf_counter() - t0
+
+    out_fpath = os.path.join(args.output_dir, out_name)
+    writes.append((out_fpath, writer.submit(write_audio, out_fpath, out_sr, audio_opt)))
+
+    duration = audio.shape[0] / 16000
+    report.append({
+      "input": fpath,
+      "output": out_fpath,
+      "duration": duration,
+      "decode": t_decode,
+      "convert": t_convert,
+      "npy": times[0],
+      "f0": times[1],
+      "infer": times[2],
+      "rtf": t_convert / duration,
+    })
+    if tracer is not None:
+      trace_fpath = os.path.join(args.trace_dir, out_name + ".trace.json")
+      os.makedirs(os.path.dirname(trace_fpath) or ".", exist_ok=True)
+      tracer.save(trace_fpath)
+      if args.profile:
+        tracer.save_profile(os.path.join(args.trace_dir, out_name + ".profile.json"))
+      report[-1]["stages"] = {name: x["seconds"] for name, x in tracer.summary().items()}
+    print(f"{fpath}: {duration:.1f}s audio in {t_convert:.2f}s (rtf {t_convert / duration:.3f})")
+
+  writer.shutdown(wait=True)
+  for out_fpath, future in writes:
+    if future.exception() is not None:
+      logger.error("failed to write %s: %s", out_fpath, future.exception())
+  wall = perf_counter() - t_start
+
+  total_audio = sum(x["duration"] for x in report)
+  total_convert = sum(x["convert"] for x in report)
+  summary = {
+    "files": len(report),
+    "failed": len(items) - len(report),
+    "audio_hours": total_audio / 3600,
+    "wall_seconds": wall,
+    "mean_rtf": total_convert / total_audio if total_audio else 0.,
+    "hours_per_hour": total_audio / wall if wall else 0.,
+    "overhead_seconds": wall - total_convert,  # waiting on decode, writes and failed files
+  }
+  print(f"converted {summary['files']} files ({summary['failed']} failed), {total_audio / 60:.1f}min of audio "
+        f"in {wall:.1f}s: mean rtf {summary['mean_rtf']:.3f}, {summary['hours_per_hour']:.2f} hours/hour")
+  if args.report:
+    with open(args.report, "w") as f:
+      json.dump({"summary": summary, "files": report}, f, indent=2)
+
+
+if __name__ == '__main__':
+  main()
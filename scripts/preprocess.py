@@ -5,7 +5,6 @@ import argparse
 import logging
 import multiprocessing
 
-import librosa
 import numpy as np
 import os
 import traceback
@@ -13,6 +12,7 @@ from scipy import signal
 from scipy.io import wavfile
 
 from utils.misc_utils import load_audio
+from utils.resample import resample
 from utils.slicer2 import Slicer
 
 numba_logger = logging.getLogger('numba')
@@ -91,7 +91,7 @@ class PreProcess:
       msg2 = "%s/%s_%s.wav" % (self.wavs16k_dir, idx0, idx1)
 
     wavfile.write(msg1, self.sr, tmp_audio.astype(np.float32),)
-    tmp_audio = librosa.resample(tmp_audio, orig_sr=self.sr, target_sr=16000 )  # , res_type="soxr_vhq"
+    tmp_audio = resample(tmp_audio, self.sr, 16000)  # the filter for `self.sr` is designed once, not per slice
     wavfile.write(msg2, 16000, tmp_audio.astype(np.float32),)
 
   def pipeline(self, path, idx0):
@@ -0,0 +1,163 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+# Author: karljeon44
+# Date: 10/18/26 9:10 AM
+"""calibrates int8 CPU inference for a voice on a few reference clips and reports per-stage speed / quality
+
+every stage (`hubert`, `enc_p`, `flow`, `dec`) is quantized on its own, then all of them together, and compared with
+fp32 on the same clips: real-time factor, seconds spent in each stage and the log-mel distance of the output to the fp32
+output (see `model.quantize.mel_distance`). noise draws are identical across runs, so the distance only reflects
+quantization. stages whose own distance is within `--max_mel_distance` are kept; the synthesizer stages among them are
+calibrated together and saved next to the voice as `<name>.int8.pt`, ready for `--quantize synth` (or
+`--quantize hubert,synth` if HuBERT was kept too)
+"""
+import argparse
+import json
+import logging
+import os
+from time import perf_counter
+
+import numpy as np
+import torch
+
+from model.loaders import load_hubert_model, load_synthesizer
+from model.quantize import INT8_EXT, SYNTH_STAGES, calibrate_synthesizer, mel_distance, save_int8
+from model.vc_infer_pipeline import VC, feature_cache
+from utils.config import Config
+from utils.misc_utils import load_audio
+
+logger = logging.getLogger(__name__)
+
+STAGES = ["hubert"] + SYNTH_STAGES
+
+
+def load_clips(inputs):
+  fpaths = []
+  for x in inputs:
+    fpaths.extend(sorted(os.path.join(x, f) for f in os.listdir(x)) if os.path.isdir(x) else [x])
+  clips = []
+  for fpath in fpaths:
+    audio = load_audio(fpath, 16000)
+    audio_max = np.abs(audio).max() / 0.95
+    if audio_max > 1:
+      audio /= audio_max
+    clips.append(audio)
+  return clips
+
+
+def stage_timer(net_g, stage_times):
+  """forward hooks accumulating the seconds spent in each synthesizer stage into `stage_times`"""
+  handles = []
+  for stage in SYNTH_STAGES:
+    module = getattr(net_g, stage)
+    start = {}
+
+    def pre_hook(module, inputs, start=start):
+      start["t"] = perf_counter()
+
+    def hook(module, inputs, outputs, stage=stage, start=start):
+      stage_times[stage] = stage_times.get(stage, 0.) + perf_counter() - start["t"]
+
+    handles += [module.register_forward_pre_hook(pre_hook), module.register_forward_hook(hook)]
+  return handles
+
+
+def build_argparser():
+  argparser = argparse.ArgumentParser()
+  argparser.add_argument('model', help='voice checkpoint (.pth) in `weights`')
+  argparser.add_argument('clips', nargs='+', help='reference audio fpaths or dirpaths, a few seconds to a minute total')
+  argparser.add_argument('-f', '--f0_method', default='rmvpe', help='pitch extraction algorithm')
+  argparser.add_argument('-k', '--f0_up_key', type=int, default=0, help='pitch translation in semi-tones')
+  argparser.add_argument('--sid', type=int, default=0, help='speaker id')
+  argparser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES, help='stages to consider')
+  argparser.add_argument('--max_mel_distance', type=float, default=0.05,
+                         help='largest log-mel distance to fp32 at which a stage is kept')
+  argparser.add_argument('--dry_run', action='store_true', help=f'report only, don\'t write `{INT8_EXT}`')
+  argparser.add_argument('--report', help='optional json fpath for the report')
+  return argparser
+
+
+def main():
+  argparser = build_argparser()
+  args, rest = argparser.parse_known_args()  # the rest goes to `Config`
+  unknown = Config.build_parser().parse_known_args(rest)[1]
+  if unknown:
+    argparser.error(f"unrecognized arguments: {' '.join(unknown)}")
+
+  config = Config(known_only=True)
+  config.device, config.is_half = "cpu", False  # int8 quantization is CPU fp32 only, even with a GPU around
+  clips = load_clips(args.clips)
+  duration = sum(clip.shape[0] for clip in clips) / 16000
+  hubert = {False: load_hubert_model("cpu", False)}
+  if "hubert" in args.stages:
+    hubert[True] = load_hubert_model("cpu", False, quantize=True)
+  for hubert_model in hubert.values():
+    hubert_model.feature_cache_id = None  # features are recomputed every run, so the hubert times compare
+  feature_cache.clear()
+
+  def load_net_g():
+    net_g, cpt = load_synthesizer(args.model, "cpu", False)
+    net_g.dec.m_source.l_sin_gen.add_noise = False  # the prior noise is seeded per clip below
+    return net_g, cpt
+
+  net_g, cpt = load_net_g()
+  tgt_sr = cpt["config"][-2]
+  version = cpt.get("version", "v2")
+  vc = VC(tgt_sr, config)
+
+  def run(hubert_model, net_g, timed=False):
+    stage_times = {}
+    handles = stage_timer(net_g, stage_times) if timed else []
+    times = [0, 0, 0]
+    outs = []
+    t0 = perf_counter()
+    for clip in clips:
+      torch.manual_seed(0)
+      outs.append(vc.pipeline(
+        hubert_model, net_g, args.sid, clip, None, times, args.f0_up_key, args.f0_method, "", 0, 1, 3, tgt_sr, 0, 1,
+        version, 0.33))
+    total = perf_counter() - t0
+    for handle in handles:
+      handle.remove()
+    stage_times["hubert"] = times[0]
+    return outs, {"rtf": total / duration, "seconds": total, "stages": stage_times}
+
+  def calibrated(stages):
+    net_g = load_net_g()[0]
+    return calibrate_synthesizer(net_g, lambda net_g: run(hubert[False], net_g), stages)
+
+  run(hubert[False], net_g)  # warm-up, and caches the f0 of every clip
+  ref, fp32 = run(hubert[False], net_g, timed=True)
+  fp32["mel_distance"] = 0.
+  report = {"fp32": fp32}
+  runs = [[stage] for stage in args.stages] + ([args.stages] if len(args.stages) > 1 else [])
+  for stages in runs:
+    synth_stages = [stage for stage in stages if stage != "hubert"]
+    outs, result = run(hubert["hubert" in stages], calibrated(synth_stages) if synth_stages else net_g, timed=True)
+    result["mel_distance"] = float(np.mean([mel_distance(r, o, tgt_sr) for r, o in zip(ref, outs)]))
+    report["+".join(stages)] = result
+
+  print(f"{len(clips)} clips, {duration:.1f}s of audio")
+  print(f"{'int8 stages':<24} {'rtf':>7} {'speedup':>8} {'mel dist':>9}  " + " ".join(f"{s:>7}" for s in STAGES))
+  for name, result in report.items():
+    print(f"{name:<24} {result['rtf']:7.3f} {fp32['rtf'] / result['rtf']:7.2f}x {result['mel_distance']:9.4f}  " +
+          " ".join(f"{result['stages'].get(s, 0.):6.2f}s" for s in STAGES))
+
+  kept = [stage for stage in args.stages if report[stage]["mel_distance"] <= args.max_mel_distance]
+  report["kept"] = kept
+  print(f"kept (mel distance <= {args.max_mel_distance}): {', '.join(kept) or 'none'}")
+  synth_stages = [stage for stage in kept if stage != "hubert"]
+  if synth_stages and not args.dry_run:
+    int8_fpath = os.path.splitext(args.model)[0] + INT8_EXT
+    save_int8(calibrated(synth_stages), cpt, synth_stages, int8_fpath)
+    print(f"wrote {int8_fpath}")
+  quantize = ([] if "hubert" not in kept else ["hubert"]) + (["synth"] if synth_stages else [])
+  if quantize:
+    print(f"run with `--quantize {','.join(quantize)}`")
+  if args.report:
+    with open(args.report, "w") as f:
+      json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+  main()
@@ -13,8 +13,23 @@ from sklearn.cluster import MiniBatchKMeans
 
 logger = logging.getLogger(__name__)
 
+INDEX_TYPES = ["ivf-flat", "ivf-pq", "opq-ivf-pq", "hnsw"]
 
-def train_index(log_dir, kmeans=False):
+
+def index_factory_string(index_type, n_ivf, pq_m=64, hnsw_m=32):
+  """faiss factory string; `pq_m` bytes per vector for the PQ types (must divide 768), `hnsw_m` graph links per node"""
+  if index_type == "ivf-flat":
+    return "IVF%s,Flat" % n_ivf
+  if index_type == "ivf-pq":
+    return "IVF%s,PQ%s" % (n_ivf, pq_m)
+  if index_type == "opq-ivf-pq":
+    return "OPQ%s,IVF%s,PQ%s" % (pq_m, n_ivf, pq_m)
+  if index_type == "hnsw":
+    return "HNSW%s,Flat" % hnsw_m
+  raise ValueError(f"unknown index type `{index_type}`, expected one of {INDEX_TYPES}")
+
+
+def train_index(log_dir, kmeans=False, index_type="ivf-flat", nprobe=1, pq_m=64, hnsw_m=32):
   os.makedirs(log_dir, exist_ok=True)
   feature_dir = f"{log_dir}/3_feature768"
   assert os.path.exists(feature_dir)
@@ -50,20 +65,24 @@ def train_index(log_dir, kmeans=False):
   n_ivf = min(int(16 * np.sqrt(big_npy.shape[0])), big_npy.shape[0] // 39)
   print("%s,%s" % (big_npy.shape, n_ivf))
 
-  index = faiss.index_factory(768, "IVF%s,Flat" % n_ivf)
+  factory = index_factory_string(index_type, n_ivf, pq_m=pq_m, hnsw_m=hnsw_m)
+  name = factory.replace(",", "_")
+  index = faiss.index_factory(768, factory)
   # index = faiss.index_factory(256if version19=="v1"else 768, "IVF%s,PQ128x4fs,RFlat"%n_ivf)
-  print("training")
-  index_ivf = faiss.extract_index_ivf(index)  #
-  index_ivf.nprobe = 1
-  index.train(big_npy)
-  faiss.write_index(index, "%s/trained_IVF%s_Flat_nprobe_%s.index" % (log_dir, n_ivf, index_ivf.nprobe))
+  print("training %s" % factory)
+  if index_type != "hnsw":
+    index_ivf = faiss.extract_index_ivf(index)  #
+    index_ivf.nprobe = nprobe  # default for searches; `VC` can override it per process (`--index_nprobe`)
+    name = "%s_nprobe_%s" % (name, nprobe)
+  index.train(big_npy)  # no-op for hnsw
+  faiss.write_index(index, "%s/trained_%s.index" % (log_dir, name))
 
   # faiss.write_index(index, '%s/trained_IVF%s_Flat_FastScan_%s.index'%(exp_dir,n_ivf,version19))
   print("adding")
   batch_size_add = 8192
   for i in range(0, big_npy.shape[0], batch_size_add):
     index.add(big_npy[i: i + batch_size_add])
-  faiss.write_index(index, "%s/added_IVF%s_Flat_nprobe_%s.index" % (log_dir, n_ivf, index_ivf.nprobe))
+  faiss.write_index(index, "%s/added_%s.index" % (log_dir, name))
   print("Done.")
 
 
@@ -71,6 +90,12 @@ if __name__ == '__main__':
   argparser = argparse.ArgumentParser()
   argparser.add_argument('log_dir', help='dirpath to current log')
   argparser.add_argument('--kmeans', action='store_true', help='whether to apply K-Means if feature matrix is too big')
+  argparser.add_argument('--index_type', default='ivf-flat', choices=INDEX_TYPES,
+                         help='ivf-flat: exact vectors; ivf-pq / opq-ivf-pq: `--pq_m` bytes per vector; hnsw: graph')
+  argparser.add_argument('--nprobe', type=int, default=1, help='default number of IVF lists visited per search')
+  argparser.add_argument('--pq_m', type=int, default=64, help='PQ sub-quantizers (bytes per vector), divides 768')
+  argparser.add_argument('--hnsw_m', type=int, default=32, help='HNSW links per node')
   args = argparser.parse_args()
 
-  train_index(args.log_dir, kmeans=args.kmeans)
+  train_index(args.log_dir, kmeans=args.kmeans, index_type=args.index_type, nprobe=args.nprobe, pq_m=args.pq_m,
+              hnsw_m=args.hnsw_m)